@@ -0,0 +1,32 @@
+import asyncio
+from typing import Any, Awaitable, Optional
+
+from fastapi import Request
+
+DISCONNECT_POLL_INTERVAL = 0.5
+
+# Non-standard status (nginx) for requests the client closed before the response was ready
+CLIENT_CLOSED_REQUEST = 499
+
+
+async def wait_for_disconnect(request: Request) -> None:
+    while not await request.is_disconnected():
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+
+async def run_until_disconnected(request: Request, work: Awaitable[Any]) -> Optional[Any]:
+    """Await `work`, cancelling it (and so its Claude calls) if the client goes away first; None then."""
+    task = asyncio.ensure_future(work)
+    watcher = asyncio.ensure_future(wait_for_disconnect(request))
+    try:
+        await asyncio.wait({task, watcher}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for pending in (task, watcher):
+            if not pending.done():
+                pending.cancel()
+        # The work may still await something while it is cancelled; it is only inspected once it is done
+        await asyncio.gather(task, watcher, return_exceptions=True)
+
+    if task.cancelled():
+        return None
+    return task.result()
@@ -0,0 +1,15 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from core.metrics import registry, render_snapshots
+from services import worker_supervisor
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    supervisor = worker_supervisor.active_supervisor
+    # Under the supervisor, the sum over the worker processes
+    content = render_snapshots(supervisor.metric_snapshots()) if supervisor is not None else registry.render()
+    return PlainTextResponse(content, media_type="text/plain; version=0.0.4")
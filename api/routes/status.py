@@ -1,13 +1,26 @@
 from fastapi import APIRouter
 
 from models.schemas import StatusResponse
+from services import worker_supervisor
+from services.rate_limiter import claude_rate_limiter
 
 router = APIRouter()
 
 
 @router.get("/status", response_model=StatusResponse)
 async def get_status():
+    supervisor = worker_supervisor.active_supervisor
+    if supervisor is not None:
+        workers = supervisor.worker_stats()
+        return StatusResponse(
+            status="ok" if all(worker["alive"] for worker in workers) else "degraded",
+            version="1.0.0",
+            llm=supervisor.llm_stats(),
+            workers=workers
+        )
+
     return StatusResponse(
         status="ok",
-        version="1.0.0"
+        version="1.0.0",
+        llm=claude_rate_limiter.stats()
     )
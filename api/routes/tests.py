@@ -0,0 +1,92 @@
+import asyncio
+import json
+import logging
+from typing import Any, AsyncIterator, Dict, Optional
+
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from api.disconnect import CLIENT_CLOSED_REQUEST, run_until_disconnected
+from models.schemas import TestGenerationRequest, TestGenerationResponse
+from services.job_scheduler import start_flow
+from services.test_generator import BookTextError, generate_test, generate_test_coalesced
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.post("/tests", response_model=TestGenerationResponse)
+async def create_test(body: TestGenerationRequest, request: Request):
+    logger.info(f"HTTP test generation request for book: {body.fileName}")
+    start_flow(body.model_dump())
+    try:
+        questions = await run_until_disconnected(
+            request,
+            generate_test_coalesced(body.fileName, body.startPage, body.endPage, body.questionCount, body.testId)
+        )
+    except BookTextError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to process test generation request: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to process test generation request: {e}")
+
+    if questions is None:
+        logger.info(f"Client disconnected, test generation for {body.fileName} cancelled")
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+    return TestGenerationResponse(fileName=body.fileName, testId=body.testId, questions=questions)
+
+
+def format_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/tests/stream")
+async def create_test_stream(body: TestGenerationRequest):
+    """Server-Sent Events: a `question` event per question as soon as it is ready, then `completed` or `error`."""
+    logger.info(f"HTTP streaming test generation request for book: {body.fileName}")
+
+    async def events() -> AsyncIterator[str]:
+        ready: asyncio.Queue = asyncio.Queue()
+        start_flow(body.model_dump())
+
+        async def on_question(index: int, total: int, question: Dict[str, Any]) -> None:
+            await ready.put(format_event("question", {"index": index, "total": total, "question": question}))
+
+        generation = asyncio.create_task(generate_test(
+            body.fileName, body.startPage, body.endPage, body.questionCount, body.testId, on_question
+        ))
+        getter: Optional[asyncio.Future] = None
+        # The response task is cancelled when the client disconnects, which lands in the finally below
+        try:
+            while not generation.done() or not ready.empty():
+                getter = asyncio.ensure_future(ready.get())
+                await asyncio.wait({getter, generation}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                else:
+                    getter.cancel()
+
+            try:
+                questions = generation.result()
+            except BookTextError as e:
+                yield format_event("error", {"error": str(e)})
+            except Exception as e:
+                logger.error(f"Failed to process test generation request: {e}")
+                yield format_event("error", {"error": f"Failed to process test generation request: {e}"})
+            else:
+                yield format_event("completed", {"fileName": body.fileName, "testId": body.testId, "total": len(questions)})
+        finally:
+            if getter is not None and not getter.done():
+                getter.cancel()
+            if not generation.done():
+                logger.info(f"Client disconnected, test generation for {body.fileName} cancelled")
+                generation.cancel()
+                await asyncio.gather(generation, return_exceptions=True)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,73 @@
+import logging
+from typing import AsyncIterator, Optional
+
+import httpx
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+
+from api.disconnect import CLIENT_CLOSED_REQUEST, run_until_disconnected
+from services import worker_supervisor
+from services.worker_supervisor import SHUTDOWN_GRACE
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Headers about one connection rather than the request or response, which httpx and uvicorn set themselves
+HOP_BY_HOP_HEADERS = {"connection", "keep-alive", "transfer-encoding", "host", "content-length"}
+
+client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    global client
+    if client is None:
+        # Generation takes as long as it takes; only connecting to the worker is bounded
+        client = httpx.AsyncClient(timeout=httpx.Timeout(None, connect=SHUTDOWN_GRACE))
+    return client
+
+
+async def close_client() -> None:
+    global client
+    if client is not None:
+        await client.aclose()
+        client = None
+
+
+@router.post("/tests")
+@router.post("/tests/stream")
+async def forward_to_worker(request: Request):
+    """
+    The test generation routes of the supervisor: the request goes to the HTTP server of a worker
+    process in turn, and its response, SSE included, is streamed back as it arrives.
+    """
+    supervisor = worker_supervisor.active_supervisor
+    port = supervisor.http_port() if supervisor is not None else None
+    if port is None:
+        raise HTTPException(status_code=503, detail="No worker process is ready")
+
+    upstream = get_client().build_request(
+        "POST",
+        f"http://127.0.0.1:{port}{request.url.path}",
+        content=await request.body(),
+        headers={name: value for name, value in request.headers.items() if name not in HOP_BY_HOP_HEADERS},
+    )
+    try:
+        # Until the worker answers, a client that goes away cancels the request, and so the job
+        response = await run_until_disconnected(request, get_client().send(upstream, stream=True))
+    except httpx.HTTPError as e:
+        logger.error(f"Failed to forward {request.url.path} to the worker on port {port}: {e}")
+        raise HTTPException(status_code=502, detail="Worker process is not reachable")
+    if response is None:
+        return Response(status_code=CLIENT_CLOSED_REQUEST)
+
+    async def body() -> AsyncIterator[bytes]:
+        # Closing the upstream response when the client disconnects cancels the job in the worker
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await response.aclose()
+
+    headers = {name: value for name, value in response.headers.items() if name.lower() not in HOP_BY_HOP_HEADERS}
+    return StreamingResponse(body(), status_code=response.status_code, headers=headers)
@@ -0,0 +1,53 @@
+"""
+Compare get_book_text in cache and stream download modes against the in-process MinIO stub.
+
+    python -m benchmarks.book_download --pages 200 --requests 5
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "fake")
+os.environ.setdefault("TEMP_DIR", tempfile.mkdtemp(prefix="reader-ai-bench-"))
+
+from benchmarks.fake_minio import FakeMinio
+from benchmarks.synthetic_pdf import build_pdf
+from core.config import settings
+from services import minio_service, test_generator
+
+
+async def run(args) -> None:
+    fake = FakeMinio(latency=args.latency, bandwidth=args.bandwidth_mb * 1024 * 1024)
+    fake.put("book", build_pdf(args.pages))
+    minio_service.minio_client = fake
+    settings.page_store_preextract = False
+
+    reference = None
+    for mode in ("stream", "cache"):
+        settings.minio_download_mode = mode
+        timings = []
+        for _ in range(args.requests):
+            started = time.perf_counter()
+            text = await test_generator.get_book_text("book", 1, args.pages)
+            timings.append(time.perf_counter() - started)
+            assert text, "empty book text"
+            reference = reference or text
+            assert text == reference, f"{mode} mode returned different text"
+        print(f"{mode:>6}: first={timings[0] * 1000:7.1f}ms  "
+              f"repeat avg={sum(timings[1:]) / max(1, len(timings) - 1) * 1000:7.1f}ms")
+    print(f"MinIO calls: {fake.calls}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--bandwidth-mb", type=float, default=50)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Run bulk jobs end to end through the Message Batches path against local fakes.
+
+    python -m benchmarks.bulk_generation --jobs 20 --questions 10
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from pydantic import BaseModel
+
+from benchmarks.fake_anthropic import FakeAnthropicServer
+
+server = FakeAnthropicServer(batch_latency=1.0).start()
+os.environ["ANTHROPIC_BASE_URL"] = server.base_url
+os.environ.setdefault("ANTHROPIC_API_KEY", "fake")
+os.environ.setdefault("TEMP_DIR", tempfile.mkdtemp(prefix="reader-ai-bench-"))
+
+from benchmarks.fake_minio import FakeMinio
+from benchmarks.synthetic_pdf import build_pdf
+from core.config import settings
+from services import bulk_generator, minio_service, test_generator
+
+
+async def run(args) -> None:
+    fake_minio = FakeMinio()
+    fake_minio.put("book", build_pdf(args.pages))
+    minio_service.minio_client = fake_minio
+    settings.page_store_preextract = False
+    settings.bulk_submit_delay = 0.2
+    settings.bulk_poll_interval = 0.2
+
+    published = []
+    done = asyncio.Event()
+
+    async def capture(response):
+        published.append(response.model_dump() if isinstance(response, BaseModel) else response)
+        if len(published) == args.jobs:
+            done.set()
+        return True
+
+    bulk_generator.send_response = capture
+    bulk_generator.send_error_response = lambda file_name, error, test_id=None: capture(
+        {"fileName": file_name, "testId": test_id, "error": error}
+    )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        test_generator.process_test_generation_request({
+            "fileName": "book", "testId": f"test-{job}", "mode": "bulk",
+            "startPage": 1, "endPage": args.pages, "questionCount": args.questions,
+        })
+        for job in range(args.jobs)
+    ))
+    submitted = time.perf_counter() - started
+    await asyncio.wait_for(done.wait(), timeout=60)
+    elapsed = time.perf_counter() - started
+    await bulk_generator.bulk_generator.stop()
+    server.stop()
+
+    errors = [response for response in published if response.get("error")]
+    assert not errors, errors
+    assert all(len(response["questions"]) == args.questions for response in published)
+    assert not bulk_generator.bulk_generator.store.load_all(), "batch records left behind"
+    print(f"jobs={args.jobs} questions/job={args.questions} batches={len(server.batches)} "
+          f"submitted in {submitted:.2f}s, published in {elapsed:.2f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--pages", type=int, default=30)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
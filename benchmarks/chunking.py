@@ -0,0 +1,102 @@
+"""
+Balance and speed of the part splitter on book-sized text, with randomized property checks.
+
+    python -m benchmarks.chunking --pages 400 --parts 10 20 50
+"""
+import argparse
+import math
+import random
+import re
+import statistics
+import time
+
+from benchmarks.synthetic_pdf import WORDS
+from utils.chunking import estimate_tokens, split_text_balanced
+
+
+def split_by_lines(text: str, num_parts: int):
+    """The previous newline-count splitter, kept here for comparison."""
+    paragraphs = re.split('\n', text.strip())
+    paragraphs_per_part = math.ceil(len(paragraphs) / num_parts)
+    parts = []
+    current_part = ""
+    for i, paragraph in enumerate(paragraphs):
+        current_part += paragraph + "\n"
+        if (i + 1) % paragraphs_per_part == 0 or (i + 1) == len(paragraphs):
+            parts.append(current_part.strip())
+            current_part = ""
+    return parts
+
+
+def book_text(pages: int, rng: random.Random) -> str:
+    """PyPDF2-like output: wrapped lines of very uneven length, pages joined by blank lines."""
+    page_texts = []
+    for _ in range(pages):
+        lines = []
+        for _ in range(rng.randint(5, 45)):
+            words = rng.choices(WORDS, k=rng.choice([1, 2, 8, 12, 14, 40]))
+            line = " ".join(words)
+            if rng.random() < 0.4:
+                line += rng.choice([".", "!", "?", "…", '."'])
+            lines.append(line)
+        page_texts.append("\n".join(lines))
+    return "\n\n".join(page_texts) + "\n\n"
+
+
+def check_properties(text: str, parts, num_parts: int) -> None:
+    assert len(parts) == num_parts, f"expected {num_parts} parts, got {len(parts)}"
+    words = text.split()
+    if len(words) >= num_parts:
+        assert all(part.strip() for part in parts), "empty part"
+        assert " ".join(parts).split() == words, "parts do not cover the text in order"
+
+
+def run_property_checks(iterations: int, rng: random.Random) -> None:
+    samples = ["", "one", "one two three", "Short. Sentences. Only.", "x" * 50]
+    for sample in samples:
+        for num_parts in (1, 2, 5):
+            check_properties(sample, split_text_balanced(sample, num_parts), num_parts)
+    for _ in range(iterations):
+        text = book_text(rng.randint(1, 20), rng)
+        num_parts = rng.randint(1, 60)
+        check_properties(text, split_text_balanced(text, num_parts), num_parts)
+    print(f"property checks passed ({iterations} random texts)")
+
+
+def describe(name: str, parts, num_parts: int, elapsed: float) -> None:
+    tokens = [estimate_tokens(part) for part in parts]
+    spread = max(tokens) / max(min(tokens), 1)
+    print(f"  {name:>8}: parts={len(parts):>3}/{num_parts:<3} tokens min={min(tokens):7.0f} "
+          f"max={max(tokens):7.0f} stdev={statistics.pstdev(tokens):7.0f} max/min={spread:6.2f} "
+          f"time={elapsed * 1000:7.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--parts", type=int, nargs="+", default=[10, 20, 50])
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    run_property_checks(args.iterations, rng)
+
+    text = book_text(args.pages, rng)
+    print(f"book: {args.pages} pages, {len(text)} characters, ~{estimate_tokens(text):.0f} tokens")
+    for num_parts in args.parts:
+        print(f"{num_parts} parts")
+        for name, splitter in (("lines", split_by_lines), ("balanced", split_text_balanced)):
+            started = time.perf_counter()
+            parts = splitter(text, num_parts)
+            describe(name, parts, num_parts, time.perf_counter() - started)
+
+    for scale in (1, 2, 4, 8):
+        scaled = text * scale
+        started = time.perf_counter()
+        split_text_balanced(scaled, 20)
+        print(f"{len(scaled):>10} characters: {(time.perf_counter() - started) * 1000:7.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""
+End-to-end load test: requests are published to the in-memory broker, consumed by the real
+RabbitMQConsumer and process_test_generation_request, with books from the MinIO fake and questions
+from the fake Anthropic server, and the responses are read back from the response queue.
+
+    python -m benchmarks.end_to_end --jobs 40 --rate 2 --output results.json
+    python -m benchmarks.end_to_end --jobs 40 --rate 2 --baseline results.json
+
+Reports jobs/min, latency percentiles from publish to response, peak RSS and the time per stage.
+With --baseline, the run is compared with a saved result and exits with 1 on a regression beyond
+--tolerance.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.fake_anthropic import FakeAnthropicServer
+
+server = FakeAnthropicServer().start()
+os.environ["ANTHROPIC_BASE_URL"] = server.base_url
+os.environ.setdefault("ANTHROPIC_API_KEY", "fake")
+os.environ.setdefault("TEMP_DIR", tempfile.mkdtemp(prefix="reader-ai-bench-"))
+os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "100000")
+os.environ.setdefault("LLM_OUTPUT_TOKENS_PER_MINUTE", "100000000")
+os.environ.setdefault("LLM_MAX_CONCURRENCY", "32")
+
+import aio_pika
+
+from benchmarks.fake_amqp import FakeBroker, install
+from benchmarks.fake_minio import FakeMinio
+from benchmarks.synthetic_pdf import build_pdf
+from core.config import settings
+from core.metrics import stage_duration
+from services import minio_service, test_generator
+from services.message_codec import message_codec
+from services.rabbitmq_consumer import rabbitmq_consumer
+from services.response_publisher import rabbitmq_producer
+
+LATENCY_KEYS = ("p50", "p95", "p99")
+# Options that do not change what is measured, left out of the saved config
+RUN_OPTIONS = ("output", "baseline", "tolerance", "timeout")
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def peak_rss_mb() -> dict:
+    # ru_maxrss is in KiB on Linux; children are the PDF extraction processes
+    return {
+        "service": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "extraction_workers": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def stage_breakdown() -> dict:
+    return {
+        key[0]: {"count": sum(counts), "total_seconds": round(total, 3), "avg_seconds": round(total / max(1, sum(counts)), 4)}
+        for key, (counts, total) in sorted(stage_duration.collect().items())
+    }
+
+
+async def publish_requests(broker: FakeBroker, args, published: dict) -> None:
+    rng = random.Random(args.seed)
+    for job in range(args.jobs):
+        request = {
+            "fileName": f"book-{job % args.books}",
+            "testId": f"test-{job}",
+            "startPage": 1,
+            "endPage": args.pages,
+            "questionCount": args.questions,
+        }
+        published[request["testId"]] = time.perf_counter()
+        broker.route("", settings.rabbitmq_request_queue, aio_pika.Message(body=json.dumps(request).encode()))
+        if args.rate > 0:
+            await asyncio.sleep(rng.expovariate(args.rate))
+
+
+async def collect_responses(broker: FakeBroker, args, published: dict, latencies: dict, failed: list) -> None:
+    responses = broker.queue(settings.rabbitmq_response_queue)
+    while len(latencies) + len(failed) < args.jobs:
+        message, _ = await responses.messages.get()
+        response = message_codec.decode(message.body, message.content_encoding)
+        if response.get("type") == "question":
+            continue
+        if response.get("error"):
+            failed.append(response)
+        else:
+            latencies[response["testId"]] = time.perf_counter() - published[response["testId"]]
+
+
+async def run(args) -> dict:
+    server.latency = args.claude_latency
+    server.overload_rate = args.error_rate
+    server.output_tokens = args.output_tokens
+
+    fake = FakeMinio(latency=args.minio_latency, bandwidth=args.bandwidth_mb * 1024 * 1024)
+    for book in range(args.books):
+        fake.put(f"book-{book}", build_pdf(args.pages, seed=args.seed * 1000 + book))
+    minio_service.minio_client = fake
+
+    broker = FakeBroker()
+    install(broker)
+    await rabbitmq_consumer.start_consuming(callback=test_generator.process_test_generation_request)
+
+    published, latencies, failed = {}, {}, []
+    started = time.perf_counter()
+    collector = asyncio.create_task(collect_responses(broker, args, published, latencies, failed))
+    await publish_requests(broker, args, published)
+    await asyncio.wait_for(collector, timeout=args.timeout)
+    elapsed = time.perf_counter() - started
+
+    await rabbitmq_consumer.stop_consuming()
+    await test_generator.test_pipeline.stop()
+    await rabbitmq_producer.close()
+    server.stop()
+
+    values = list(latencies.values())
+    return {
+        "config": {key: value for key, value in vars(args).items() if key not in RUN_OPTIONS},
+        "jobs": args.jobs,
+        "failed": len(failed),
+        "elapsed_seconds": round(elapsed, 3),
+        "jobs_per_minute": round(len(values) / elapsed * 60, 2),
+        "latency_seconds": {
+            "p50": round(percentile(values, 0.5), 3),
+            "p95": round(percentile(values, 0.95), 3),
+            "p99": round(percentile(values, 0.99), 3),
+        },
+        "peak_rss_mb": peak_rss_mb(),
+        "stages": stage_breakdown(),
+        "claude_calls": server.calls,
+    }
+
+
+def print_result(result: dict) -> None:
+    latency = result["latency_seconds"]
+    print(f"jobs={result['jobs']} failed={result['failed']} elapsed={result['elapsed_seconds']:.2f}s "
+          f"throughput={result['jobs_per_minute']:.1f} jobs/min claude_calls={result['claude_calls']}")
+    print(f"latency p50={latency['p50']:.2f}s p95={latency['p95']:.2f}s p99={latency['p99']:.2f}s")
+    rss = result["peak_rss_mb"]
+    print(f"peak RSS: service={rss['service']:.0f} MiB extraction workers={rss['extraction_workers']:.0f} MiB")
+    for stage, timing in result["stages"].items():
+        print(f"  {stage:<16} count={timing['count']:<6} total={timing['total_seconds']:8.2f}s avg={timing['avg_seconds']:.4f}s")
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> bool:
+    """Print the change against `baseline`; returns False when a metric regressed beyond `tolerance`."""
+    checks = [("jobs_per_minute", baseline["jobs_per_minute"], result["jobs_per_minute"], True)]
+    checks += [
+        (f"latency {key}", baseline["latency_seconds"][key], result["latency_seconds"][key], False)
+        for key in LATENCY_KEYS
+    ]
+    checks.append(("peak RSS", baseline["peak_rss_mb"]["service"], result["peak_rss_mb"]["service"], False))
+
+    ok = True
+    if baseline["config"] != result["config"]:
+        changed = sorted(key for key in result["config"] if baseline["config"].get(key) != result["config"][key])
+        print(f"warning: baseline was run with different options: {', '.join(changed)}")
+    print("compared with baseline:")
+    for name, before, after, higher_is_better in checks:
+        change = (after - before) / before if before else 0.0
+        regressed = -change > tolerance if higher_is_better else change > tolerance
+        ok = ok and not regressed
+        print(f"  {name:<16} {before:10.2f} -> {after:10.2f} ({change:+.1%}){'  REGRESSION' if regressed else ''}")
+    for stage, timing in result["stages"].items():
+        before = baseline["stages"].get(stage)
+        if before:
+            change = (timing["avg_seconds"] - before["avg_seconds"]) / before["avg_seconds"] if before["avg_seconds"] else 0.0
+            print(f"  {stage:<16} {before['avg_seconds']:10.4f} -> {timing['avg_seconds']:10.4f} ({change:+.1%}) avg")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--rate", type=float, default=0, help="requests per second, 0 publishes all at once")
+    parser.add_argument("--books", type=int, default=10, help="distinct books, shared round-robin by the jobs")
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--claude-latency", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of Claude calls answered with 529")
+    parser.add_argument("--output-tokens", type=int, default=400)
+    parser.add_argument("--minio-latency", type=float, default=0.05)
+    parser.add_argument("--bandwidth-mb", type=float, default=20)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=600)
+    parser.add_argument("--output", help="save the result as JSON")
+    parser.add_argument("--baseline", help="JSON result of an earlier run to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    result = asyncio.run(run(args))
+    print_result(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"saved to {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if not compare(result, baseline, args.tolerance):
+            sys.exit(1)
+    if result["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
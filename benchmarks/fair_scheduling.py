@@ -0,0 +1,149 @@
+"""
+Simulate mixed load through the consumer slots, `test_pipeline` and the Claude rate limiter, FIFO
+against weighted fair queuing: a backlog of large jobs is already queued when small interactive jobs
+start to arrive, some of them (--http-share) on the HTTP route instead of the queue. The last run
+is fair with the pipeline disabled, each job running its stages inline, for reference.
+
+    python -m benchmarks.fair_scheduling --large 6 --small 40 --claude-latency 0.2
+
+Books come from the MinIO fake and questions from the fake Anthropic server; the slots, the pipeline
+stages and the limiter are the real FairSlots, JobPipeline and AdaptiveRateLimiter.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from pydantic import BaseModel
+
+from benchmarks.fake_anthropic import FakeAnthropicServer
+
+server = FakeAnthropicServer().start()
+os.environ["ANTHROPIC_BASE_URL"] = server.base_url
+os.environ.setdefault("ANTHROPIC_API_KEY", "fake")
+os.environ.setdefault("TEMP_DIR", tempfile.mkdtemp(prefix="reader-ai-bench-"))
+os.environ.setdefault("CHECKPOINT_ENABLED", "0")
+os.environ.setdefault("PAGE_STORE_PREEXTRACT", "0")
+
+from benchmarks.fake_minio import FakeMinio
+from benchmarks.synthetic_pdf import build_pdf
+from core.config import settings
+from services import claude_service, minio_service, response_publisher, test_generator
+from services.job_scheduler import FairSlots, estimate_job_size, job_priority, priority_weight, start_flow
+from services.rate_limiter import AdaptiveRateLimiter
+
+
+def percentile(values, fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+MODES = {"fifo": (False, True), "fair": (True, True), "inline": (True, False)}
+
+
+async def run_mode(args, mode: str) -> None:
+    fair, pipelined = MODES[mode]
+    slots = FairSlots(settings.consumer_max_in_flight, enabled=fair)
+    claude_service.claude_rate_limiter = AdaptiveRateLimiter(
+        requests_per_minute=1_000_000,
+        output_tokens_per_minute=1_000_000_000,
+        max_concurrency=args.llm_concurrency,
+        fair=fair,
+    )
+    test_generator.test_pipeline.fair = fair
+    test_generator.test_pipeline.enabled = pipelined
+    completion = {"large": [], "small": []}
+    failed = []
+
+    async def capture(response):
+        response = response.model_dump() if isinstance(response, BaseModel) else response
+        if response.get("error"):
+            failed.append(response)
+        return True
+
+    response_publisher.send_response = capture
+    test_generator.send_response = capture
+    test_generator.send_error_response = lambda file_name, error, test_id=None: capture({"error": error})
+
+    async def consume(request: dict):
+        # Same as the consumer: a delivery holds a slot, taken by priority and size, until its job is done
+        async with slots.slot(estimate_job_size(request), priority_weight(job_priority(request))):
+            await test_generator.process_test_generation_request(request)
+
+    async def http(request: dict):
+        # Same as POST /tests
+        start_flow(request)
+        await test_generator.generate_test_coalesced(
+            request["fileName"], request["startPage"], request["endPage"], request["questionCount"], request["testId"]
+        )
+
+    async def job(kind: str, request: dict, delay: float, route):
+        await asyncio.sleep(delay)
+        arrived = time.perf_counter()
+        await route(request)
+        completion[kind].append(time.perf_counter() - arrived)
+
+    rng = random.Random(args.seed)
+    jobs = []
+    for index in range(args.large):
+        request = {"fileName": f"{mode}-large-{index}", "testId": f"{mode}-large-{index}",
+                   "startPage": 1, "endPage": args.large_pages, "questionCount": 50}
+        jobs.append(job("large", request, 0.0, consume))
+    arrival = 0.0
+    for index in range(args.small):
+        arrival += rng.expovariate(1 / args.small_interval)
+        request = {"fileName": f"{mode}-small-{index % args.small_books}", "testId": f"{mode}-small-{index}",
+                   "startPage": 1, "endPage": args.small_pages, "questionCount": 5, "priority": args.small_priority}
+        jobs.append(job("small", request, arrival, http if rng.random() < args.http_share else consume))
+
+    started = time.perf_counter()
+    await asyncio.gather(*jobs)
+    elapsed = time.perf_counter() - started
+    await test_generator.test_pipeline.stop()
+    assert not failed, failed[:3]
+
+    small, large = completion["small"], completion["large"]
+    print(f"{mode:>6}: small p50={percentile(small, 0.5):6.2f}s p99={percentile(small, 0.99):6.2f}s  "
+          f"large p50={percentile(large, 0.5):6.2f}s max={max(large):6.2f}s  "
+          f"mean small={statistics.mean(small):5.2f}s  total={elapsed:5.2f}s")
+
+
+async def run(args) -> None:
+    server.latency = args.claude_latency
+    fake = FakeMinio(latency=args.minio_latency)
+    for seed, mode in enumerate(MODES):
+        # Distinct books per mode, otherwise the second run hits the book cache and page store
+        for index in range(args.large):
+            fake.put(f"{mode}-large-{index}", build_pdf(args.large_pages, seed=seed * 1000 + index))
+        for index in range(args.small_books):
+            fake.put(f"{mode}-small-{index}", build_pdf(args.small_pages, seed=seed * 1000 + 500 + index))
+    minio_service.minio_client = fake
+
+    for mode in MODES:
+        await run_mode(args, mode)
+    await claude_service.close_clients()
+    server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--large", type=int, default=6)
+    parser.add_argument("--small", type=int, default=40)
+    parser.add_argument("--large-pages", type=int, default=100)
+    parser.add_argument("--small-pages", type=int, default=10)
+    parser.add_argument("--small-books", type=int, default=10)
+    parser.add_argument("--small-interval", type=float, default=0.5, help="mean seconds between small jobs")
+    parser.add_argument("--small-priority", type=int, default=0)
+    parser.add_argument("--http-share", type=float, default=0.5, help="share of small jobs sent to POST /tests")
+    parser.add_argument("--llm-concurrency", type=int, default=8)
+    parser.add_argument("--claude-latency", type=float, default=0.2)
+    parser.add_argument("--minio-latency", type=float, default=0.01)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
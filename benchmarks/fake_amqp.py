@@ -0,0 +1,154 @@
+"""
+In-memory stand-in for the parts of aio-pika used by the service.
+
+`install(broker)` replaces `aio_pika.connect_robust`, so the real RabbitMQConsumer and
+RabbitMQProducer run unchanged against the fake broker.
+"""
+import asyncio
+import itertools
+from typing import Callable, Dict, List, Optional
+
+import aio_pika
+
+
+class FakeBroker:
+    def __init__(self, confirm_latency: float = 0.002):
+        """`confirm_latency` is the round trip between a publish and its confirm."""
+        self.confirm_latency = confirm_latency
+        self.queues: Dict[str, "FakeQueue"] = {}
+        self.bindings: Dict[tuple, str] = {}
+        self.published = 0
+
+    def queue(self, name: str) -> "FakeQueue":
+        if name not in self.queues:
+            self.queues[name] = FakeQueue(self, name)
+        return self.queues[name]
+
+    def route(self, exchange_name: str, routing_key: str, message: aio_pika.Message) -> None:
+        self.published += 1
+        queue_name = routing_key if not exchange_name else self.bindings.get((exchange_name, routing_key))
+        if queue_name:
+            self.queue(queue_name).put(message)
+
+    async def connect_robust(self, url: str = "", **kwargs) -> "FakeConnection":
+        return FakeConnection(self)
+
+
+class FakeIncomingMessage:
+    def __init__(self, queue: "FakeQueue", message: aio_pika.Message, redelivered: bool = False):
+        self.queue = queue
+        self.body = message.body
+        self.headers = message.headers or {}
+        self.priority = message.priority
+        self.content_encoding = message.content_encoding
+        self.redelivered = redelivered
+        self._message = message
+        self.processed = False
+
+    async def ack(self, multiple: bool = False) -> None:
+        self.processed = True
+        self.queue.acked += 1
+        self.queue.release()
+
+    async def nack(self, multiple: bool = False, requeue: bool = True) -> None:
+        self.processed = True
+        self.queue.release()
+        if requeue:
+            self.queue.put(self._message, redelivered=True)
+
+    async def reject(self, requeue: bool = False) -> None:
+        self.processed = True
+        self.queue.rejected += 1
+        self.queue.release()
+        if requeue:
+            self.queue.put(self._message, redelivered=True)
+
+
+class FakeQueue:
+    def __init__(self, broker: FakeBroker, name: str):
+        self.broker = broker
+        self.name = name
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.acked = 0
+        self.rejected = 0
+        self._prefetch: Optional[asyncio.Semaphore] = None
+        self._consumers: Dict[str, asyncio.Task] = {}
+        self._tags = itertools.count(1)
+
+    def put(self, message: aio_pika.Message, redelivered: bool = False) -> None:
+        self.messages.put_nowait((message, redelivered))
+
+    def release(self) -> None:
+        if self._prefetch is not None:
+            self._prefetch.release()
+
+    async def bind(self, exchange, routing_key: str = "", **kwargs) -> None:
+        self.broker.bindings[(exchange.name, routing_key)] = self.name
+
+    async def consume(self, callback: Callable, **kwargs) -> str:
+        tag = f"ctag{next(self._tags)}"
+
+        async def deliver():
+            while True:
+                if self._prefetch is not None:
+                    await self._prefetch.acquire()
+                message, redelivered = await self.messages.get()
+                # Like aiormq, every delivery is handed to the callback in its own task
+                asyncio.create_task(callback(FakeIncomingMessage(self, message, redelivered)))
+
+        self._consumers[tag] = asyncio.create_task(deliver())
+        return tag
+
+    async def cancel(self, consumer_tag: str, **kwargs) -> None:
+        task = self._consumers.pop(consumer_tag, None)
+        if task:
+            task.cancel()
+
+
+class FakeExchange:
+    def __init__(self, channel: "FakeChannel", name: str):
+        self.channel = channel
+        self.name = name
+
+    async def publish(self, message: aio_pika.Message, routing_key: str, **kwargs) -> None:
+        self.channel.broker.route(self.name, routing_key, message)
+        await asyncio.sleep(self.channel.broker.confirm_latency)
+
+
+class FakeChannel:
+    def __init__(self, connection: "FakeConnection"):
+        self.connection = connection
+        self.broker = connection.broker
+        self.default_exchange = FakeExchange(self, "")
+        self.prefetch_count = 0
+
+    async def set_qos(self, prefetch_count: int = 0, **kwargs) -> None:
+        self.prefetch_count = prefetch_count
+
+    async def declare_exchange(self, name: str, type=None, durable: bool = False, **kwargs) -> FakeExchange:
+        return FakeExchange(self, name)
+
+    async def declare_queue(self, name: str, durable: bool = False, arguments: dict = None, **kwargs) -> FakeQueue:
+        queue = self.broker.queue(name)
+        if self.prefetch_count and queue._prefetch is None:
+            queue._prefetch = asyncio.Semaphore(self.prefetch_count)
+        return queue
+
+
+class FakeConnection:
+    def __init__(self, broker: FakeBroker):
+        self.broker = broker
+        self.is_closed = False
+        self.channels: List[FakeChannel] = []
+
+    async def channel(self, publisher_confirms: bool = True, **kwargs) -> FakeChannel:
+        channel = FakeChannel(self)
+        self.channels.append(channel)
+        return channel
+
+    async def close(self) -> None:
+        self.is_closed = True
+
+
+def install(broker: FakeBroker) -> None:
+    aio_pika.connect_robust = broker.connect_robust
@@ -0,0 +1,181 @@
+"""Local stand-in for the Anthropic Messages and Message Batches APIs that injects latency and throttling."""
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+EXCERPT = re.compile(r"<book_excerpt>\s*(.*?)\s*</book_excerpt>", re.DOTALL)
+PART = re.compile(r'<part index="(\d+)">\s*(.*?)\s*</part>', re.DOTALL)
+PART_REFERENCE = re.compile(r"only part (\d+)")
+
+
+def _request_text(body: dict) -> str:
+    blocks = []
+    for message in body.get("messages", []):
+        content = message["content"]
+        blocks.extend([content] if isinstance(content, str) else [block.get("text", "") for block in content])
+    return "\n".join(blocks)
+
+
+def _question(text: str, valid: bool = True) -> dict:
+    quote = " ".join(text.split()[:8]) if valid else "a sentence that is not in the excerpt"
+    return {"question": "Who is the main character?", "quote": quote, "answers": [
+        {"answer": "A", "correct": True}, {"answer": "B", "correct": False},
+        {"answer": "C", "correct": False}, {"answer": "D", "correct": False}]}
+
+
+class FakeAnthropicServer:
+    def __init__(self, latency: float = 0.05, throttle_rate: float = 0.0, retry_after: float = 0.2,
+                 overload_rate: float = 0.0, output_tokens: int = 400, batch_latency: float = 0.5,
+                 invalid_rate: float = 0.0):
+        """`invalid_rate` is the share of questions whose quote does not come from the excerpt."""
+        self.latency = latency
+        self.invalid_rate = invalid_rate
+        self.batch_latency = batch_latency
+        self.batches = {}
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.overload_rate = overload_rate
+        self.output_tokens = output_tokens
+        self.calls = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def response_text(self, request_body: dict) -> str:
+        """A question quoting the start of the requested excerpt, or one question per part for batches."""
+        text = _request_text(request_body)
+        excerpt = EXCERPT.search(text)
+        excerpt = excerpt.group(1) if excerpt else text
+        parts = {int(index): part for index, part in PART.findall(excerpt)}
+
+        reference = PART_REFERENCE.search(text)
+        if parts and reference:
+            answer = _question(parts[int(reference.group(1))], random.random() >= self.invalid_rate)
+        elif parts:
+            answer = [
+                dict(_question(part, random.random() >= self.invalid_rate), part=index)
+                for index, part in sorted(parts.items())
+            ]
+        else:
+            answer = _question(excerpt, random.random() >= self.invalid_rate)
+        return f"<question_development>reasoning</question_development>\n<json_format>\n{json.dumps(answer)}\n</json_format>"
+
+    def message(self, body: dict) -> dict:
+        return {
+            "id": f"msg_{uuid.uuid4().hex}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "fake"),
+            "content": [{"type": "text", "text": self.response_text(body)}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 1000, "output_tokens": self.output_tokens},
+        }
+
+    def batch_object(self, batch_id: str) -> dict:
+        batch = self.batches[batch_id]
+        ended = time.time() - batch["created"] >= self.batch_latency
+        count = len(batch["requests"])
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else count,
+                "succeeded": count if ended else 0,
+                "errored": 0,
+                "canceled": 0,
+                "expired": 0,
+            },
+            "created_at": "2024-01-01T00:00:00Z",
+            "expires_at": "2024-01-02T00:00:00Z",
+            "ended_at": "2024-01-01T00:01:00Z" if ended else None,
+            "archived_at": None,
+            "cancel_initiated_at": None,
+            "results_url": f"{self.base_url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: dict, headers: dict = None):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("content-type", "application/json")
+                self.send_header("content-length", str(len(payload)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                parts = self.path.split("?")[0].strip("/").split("/")
+                if parts[:3] != ["v1", "messages", "batches"] or len(parts) < 4 or parts[3] not in fake.batches:
+                    self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+                    return
+                batch_id = parts[3]
+                if len(parts) == 4:
+                    self._send(200, fake.batch_object(batch_id))
+                    return
+
+                lines = []
+                for request in fake.batches[batch_id]["requests"]:
+                    lines.append(json.dumps({
+                        "custom_id": request["custom_id"],
+                        "result": {"type": "succeeded", "message": fake.message(request["params"])},
+                    }))
+                payload = "\n".join(lines).encode()
+                self.send_response(200)
+                self.send_header("content-type", "application/binary")
+                self.send_header("content-length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+                if self.path.startswith("/v1/messages/batches"):
+                    batch_id = f"msgbatch_{uuid.uuid4().hex}"
+                    with fake._lock:
+                        fake.batches[batch_id] = {"requests": body["requests"], "created": time.time()}
+                    self._send(200, fake.batch_object(batch_id))
+                    return
+
+                with fake._lock:
+                    fake.calls += 1
+                roll = random.random()
+                if roll < fake.throttle_rate:
+                    with fake._lock:
+                        fake.throttled += 1
+                    self._send(429, {"type": "error", "error": {"type": "rate_limit_error", "message": "throttled"}},
+                               {"retry-after": str(fake.retry_after)})
+                    return
+                if roll < fake.throttle_rate + fake.overload_rate:
+                    self._send(529, {"type": "error", "error": {"type": "overloaded_error", "message": "overloaded"}})
+                    return
+
+                time.sleep(fake.latency)
+                self._send(200, fake.message(body))
+
+        return Handler
+
+    def start(self) -> "FakeAnthropicServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,76 @@
+"""In-process stand-in for the parts of the `minio.Minio` client used by the service."""
+import hashlib
+import io
+import threading
+import time
+from types import SimpleNamespace
+from typing import Dict
+
+from minio.error import S3Error
+
+
+class FakeObjectResponse:
+    def __init__(self, data: bytes, latency: float, bandwidth: float):
+        self._data = io.BytesIO(data)
+        self._latency = latency
+        self._bandwidth = bandwidth
+
+    def stream(self, amt: int = 1024 * 1024):
+        time.sleep(self._latency)
+        while True:
+            chunk = self._data.read(amt)
+            if not chunk:
+                return
+            if self._bandwidth:
+                time.sleep(len(chunk) / self._bandwidth)
+            yield chunk
+
+    def close(self):
+        pass
+
+    def release_conn(self):
+        pass
+
+
+class FakeMinio:
+    def __init__(self, latency: float = 0.01, bandwidth: float = 0.0):
+        """`latency` is added to every call, `bandwidth` (bytes/s, 0 = unlimited) throttles object reads."""
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.objects: Dict[str, bytes] = {}
+        self.calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def put(self, name: str, data: bytes) -> None:
+        self.objects[name] = data
+
+    def _count(self, method: str) -> None:
+        with self._lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+    def _get(self, name: str) -> bytes:
+        if name not in self.objects:
+            raise S3Error("NoSuchKey", "Object does not exist", name, "request", "host", None)
+        return self.objects[name]
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        self._count("bucket_exists")
+        time.sleep(self.latency)
+        return True
+
+    def stat_object(self, bucket_name: str, object_name: str):
+        self._count("stat_object")
+        time.sleep(self.latency)
+        data = self._get(object_name)
+        return SimpleNamespace(etag=f'"{hashlib.md5(data).hexdigest()}"', size=len(data))
+
+    def get_object(self, bucket_name: str, object_name: str):
+        self._count("get_object")
+        return FakeObjectResponse(self._get(object_name), self.latency, self.bandwidth)
+
+    def fget_object(self, bucket_name: str, object_name: str, file_path: str):
+        self._count("fget_object")
+        response = self.get_object(bucket_name, object_name)
+        with open(file_path, "wb") as out:
+            for chunk in response.stream():
+                out.write(chunk)
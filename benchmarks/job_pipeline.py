@@ -0,0 +1,105 @@
+"""
+Run test generation jobs end to end against local MinIO and Claude fakes, with the stages of a job
+run inline (each consumer slot holds a job from download to publish) and through the job pipeline.
+
+    python -m benchmarks.job_pipeline --jobs 24 --questions 5 --claude-latency 0.3
+
+Every job uses its own book, so each one pays for the download and the extraction.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from pydantic import BaseModel
+
+from benchmarks.fake_anthropic import FakeAnthropicServer
+
+server = FakeAnthropicServer(latency=0.3).start()
+os.environ["ANTHROPIC_BASE_URL"] = server.base_url
+os.environ.setdefault("ANTHROPIC_API_KEY", "fake")
+os.environ.setdefault("TEMP_DIR", tempfile.mkdtemp(prefix="reader-ai-bench-"))
+os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "100000")
+os.environ.setdefault("LLM_OUTPUT_TOKENS_PER_MINUTE", "100000000")
+os.environ.setdefault("LLM_MAX_CONCURRENCY", "64")
+os.environ.setdefault("CHECKPOINT_ENABLED", "0")
+os.environ.setdefault("PAGE_STORE_PREEXTRACT", "0")
+
+from benchmarks.fake_minio import FakeMinio
+from benchmarks.synthetic_pdf import build_pdf
+from core.config import settings
+from core.metrics import stage_duration
+from services import minio_service, response_publisher, test_generator
+
+
+async def run_jobs(args, mode: str, in_flight: int) -> float:
+    test_generator.test_pipeline.enabled = mode == "pipeline"
+    slots = asyncio.Semaphore(in_flight)
+    published = []
+
+    async def capture(response):
+        published.append(response.model_dump() if isinstance(response, BaseModel) else response)
+        return True
+
+    response_publisher.send_response = capture
+    test_generator.send_response = capture
+    test_generator.send_error_response = lambda file_name, error, test_id=None: capture({"error": error})
+
+    async def consume(job: int):
+        # Same as the consumer: a delivery holds a worker slot until its job is finished
+        async with slots:
+            await test_generator.process_test_generation_request({
+                "fileName": f"{mode}-book-{job}", "testId": f"{mode}-test-{job}",
+                "startPage": 1, "endPage": args.pages, "questionCount": args.questions,
+            })
+
+    stage_duration._values.clear()
+    started = time.perf_counter()
+    await asyncio.gather(*(consume(job) for job in range(args.jobs)))
+    elapsed = time.perf_counter() - started
+    await test_generator.test_pipeline.stop()
+
+    failed = [response for response in published if response.get("error")]
+    assert not failed, failed[:3]
+    assert len(published) == args.jobs, f"{len(published)} responses for {args.jobs} jobs"
+
+    stages = ", ".join(
+        f"{key[0]}={total / max(1, sum(counts)):.2f}s"
+        for key, (counts, total) in sorted(stage_duration._values.items())
+    )
+    print(f"{mode:>8} (in flight {in_flight:2}): {elapsed:6.2f}s  {args.jobs / elapsed * 60:7.1f} jobs/min  "
+          f"avg per stage: {stages}")
+    return elapsed
+
+
+async def run(args) -> None:
+    fake = FakeMinio(latency=args.minio_latency, bandwidth=args.bandwidth_mb * 1024 * 1024)
+    for offset, mode in enumerate(("inline", "pipeline")):
+        for job in range(args.jobs):
+            # Distinct content per book, otherwise the second run hits the book cache and page store
+            fake.put(f"{mode}-book-{job}", build_pdf(args.pages, seed=offset * args.jobs + job))
+    minio_service.minio_client = fake
+    server.latency = args.claude_latency
+
+    # Inline, as many jobs as the pipeline has generate workers hold the consumer slots; the pipeline
+    # keeps the same number of jobs generating while the extra slots feed the earlier stages
+    inline = await run_jobs(args, "inline", settings.pipeline_generate_workers)
+    pipelined = await run_jobs(args, "pipeline", settings.consumer_max_in_flight)
+    print(f"speedup: {inline / pipelined:.2f}x")
+    server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--jobs", type=int, default=24)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--claude-latency", type=float, default=0.3)
+    parser.add_argument("--minio-latency", type=float, default=0.05)
+    parser.add_argument("--bandwidth-mb", type=float, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
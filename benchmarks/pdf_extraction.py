@@ -0,0 +1,59 @@
+"""
+Pages/sec of the PDF extraction engine for different process pool sizes.
+
+    python -m benchmarks.pdf_extraction --pages 300 --workers 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from benchmarks.synthetic_pdf import build_pdf
+from core.config import settings
+from services import pdf_extractor
+
+
+async def measure(pdf_path: str, pages: int, workers: int, repeat: int) -> float:
+    settings.pdf_extraction_workers = workers
+    pdf_extractor.shutdown_executor()
+    # Warm the pool so process start-up is not counted
+    await pdf_extractor.extract_pages_parallel(pdf_path, list(range(min(pages, settings.pdf_parallel_min_pages))))
+
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        texts = await pdf_extractor.extract_pages_parallel(pdf_path, list(range(pages)))
+        best = min(best, time.perf_counter() - started)
+        assert len(texts) == pages
+    pdf_extractor.shutdown_executor()
+    return pages / best
+
+
+async def run(args) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "book.pdf")
+        with open(pdf_path, "wb") as pdf_file:
+            pdf_file.write(build_pdf(args.pages, lines_per_page=args.lines))
+
+        started = time.perf_counter()
+        pdf_extractor.extract_pages(pdf_path, list(range(args.pages)))
+        baseline = args.pages / (time.perf_counter() - started)
+        print(f"{'in-process':>12}: {baseline:8.1f} pages/s")
+
+        for workers in args.workers:
+            rate = await measure(pdf_path, args.pages, workers, args.repeat)
+            print(f"{workers:>4} workers: {rate:8.1f} pages/s  ({rate / baseline:.2f}x)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--lines", type=int, default=45)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--repeat", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Publishing throughput of RabbitMQProducer against the in-memory broker stand-in.
+
+Compares one channel publishing one message at a time (the old behaviour) with the channel pool
+and pipelined confirms.
+
+    python -m benchmarks.producer_throughput --messages 5000 --confirm-latency 0.002
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.fake_amqp import FakeBroker, install
+from core.config import settings
+from services.rabbitmq_producer import RabbitMQProducer
+
+
+async def measure(broker: FakeBroker, messages: int, senders: int, channels: int, batch_size: int) -> float:
+    settings.rabbitmq_publisher_channels = channels
+    settings.rabbitmq_publish_batch_size = batch_size
+    producer = RabbitMQProducer()
+    await producer.connect()
+    body = '{"fileName": "book", "testId": "test", "questions": []}'
+
+    async def sender(count: int):
+        for _ in range(count):
+            await producer.send_message(exchange_name="", routing_key="responses", message=body)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender(messages // senders) for _ in range(senders)))
+    elapsed = time.perf_counter() - started
+    await producer.close()
+    return (messages // senders * senders) / elapsed
+
+
+async def run(args) -> None:
+    broker = FakeBroker(confirm_latency=args.confirm_latency)
+    install(broker)
+
+    configurations = [(1, 1)] + [(channels, args.batch_size) for channels in args.channels]
+    for channels, batch_size in configurations:
+        rate = await measure(broker, args.messages, args.senders, channels, batch_size)
+        print(f"channels={channels:<3} batch={batch_size:<4} {rate:10.0f} messages/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--senders", type=int, default=64)
+    parser.add_argument("--channels", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--confirm-latency", type=float, default=0.002)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
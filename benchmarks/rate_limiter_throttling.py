@@ -0,0 +1,77 @@
+"""
+Drive AdaptiveRateLimiter against a local fake Anthropic endpoint that injects 429/529 responses.
+
+    python -m benchmarks.rate_limiter_throttling --calls 200 --throttle-rate 0.2
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "fake")
+
+import anthropic
+
+from benchmarks.fake_anthropic import FakeAnthropicServer
+from services.rate_limiter import AdaptiveRateLimiter
+
+
+async def run(args) -> None:
+    server = FakeAnthropicServer(
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        overload_rate=args.overload_rate,
+        retry_after=args.retry_after,
+    ).start()
+    client = anthropic.AsyncAnthropic(base_url=server.base_url, max_retries=0)
+    limiter = AdaptiveRateLimiter(
+        requests_per_minute=args.rpm,
+        output_tokens_per_minute=args.otpm,
+        max_concurrency=args.concurrency,
+        base_backoff=0.05,
+        max_retries=20,
+    )
+
+    async def call():
+        return await limiter.run(
+            lambda: client.messages.create(
+                model="fake", max_tokens=2000, messages=[{"role": "user", "content": "hi"}]
+            ),
+            max_tokens=2000,
+        )
+
+    async def report():
+        while True:
+            await asyncio.sleep(0.5)
+            print(f"  {limiter.stats()}")
+
+    reporter = asyncio.create_task(report())
+    started = time.perf_counter()
+    results = await asyncio.gather(*(call() for _ in range(args.calls)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    reporter.cancel()
+    server.stop()
+
+    failed = sum(isinstance(result, Exception) for result in results)
+    print(f"calls={args.calls} failed={failed} server_calls={server.calls} throttled={server.throttled}")
+    print(f"elapsed={elapsed:.2f}s throughput={args.calls / elapsed:.1f} calls/s")
+    print(f"final limiter state: {limiter.stats()}")
+    if failed:
+        raise SystemExit(1)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rpm", type=float, default=6000)
+    parser.add_argument("--otpm", type=float, default=10_000_000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--throttle-rate", type=float, default=0.2)
+    parser.add_argument("--overload-rate", type=float, default=0.05)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Cost and size of serializing a test generation response: encoding with the standard json module,
+orjson and pydantic, decoding the same ways, and compressing the body with gzip and zstd.
+
+    python -m benchmarks.serialization --questions 50 --repeat 200
+
+Questions carry quotes of `--quote-words` words, as long as the ones Claude returns for a page.
+"""
+import argparse
+import gzip
+import json
+import os
+import random
+import time
+
+os.environ.setdefault("ANTHROPIC_API_KEY", "fake")
+
+from models.schemas import TestGenerationResponse
+from services.message_codec import MessageCodec, orjson, zstandard
+
+WORDS = ("the", "river", "garden", "letter", "captain", "morning", "silence", "window", "promise", "road",
+         "mother", "village", "winter", "answer", "shadow", "question", "книга", "сторінка", "ранок", "лист")
+
+
+def build_response(questions: int, quote_words: int, seed: int) -> dict:
+    rng = random.Random(seed)
+
+    def sentence(words: int) -> str:
+        return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    return {
+        "fileName": "books/war-and-peace.pdf",
+        "testId": "5f0c2a8e-4a1b-4c55-9d1e-3b7f6c1d2e90",
+        "questions": [
+            {
+                "question": sentence(14)[:-1] + "?",
+                "quote": sentence(quote_words),
+                "answers": [{"answer": sentence(6), "correct": answer == 0} for answer in range(4)],
+            }
+            for _ in range(questions)
+        ],
+    }
+
+
+def timed(function, repeat: int) -> float:
+    """Median seconds per call."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=50)
+    parser.add_argument("--quote-words", type=int, default=60)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    payload = build_response(args.questions, args.quote_words, args.seed)
+    model = TestGenerationResponse.model_validate(payload)
+    baseline = json.dumps(payload).encode()
+    compact = MessageCodec.dumps(payload)
+
+    print(f"response with {args.questions} questions, median of {args.repeat} runs")
+    print("encode:")
+    encoders = [
+        ("json.dumps", lambda: json.dumps(payload).encode(), baseline),
+        ("json.dumps compact", lambda: json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode(), None),
+        ("pydantic model_dump_json", lambda: model.model_dump_json().encode(), None),
+        ("MessageCodec.dumps(model)", lambda: MessageCodec.dumps(model), None),
+    ]
+    if orjson is not None:
+        encoders.append(("orjson.dumps", lambda: orjson.dumps(payload), None))
+    for name, encode, body in encoders:
+        body = body or encode()
+        print(f"  {name:<28} {timed(encode, args.repeat) * 1e6:8.1f}us  {len(body):7d} bytes")
+
+    print("decode:")
+    decoders = [
+        ("json.loads", lambda: json.loads(compact)),
+        ("pydantic model_validate_json", lambda: TestGenerationResponse.model_validate_json(compact)),
+    ]
+    if orjson is not None:
+        decoders.append(("orjson.loads", lambda: orjson.loads(compact)))
+    for name, decode in decoders:
+        print(f"  {name:<28} {timed(decode, args.repeat) * 1e6:8.1f}us")
+
+    print(f"compression of the {len(compact)} byte body:")
+    compressors = [("gzip -1", lambda: gzip.compress(compact, compresslevel=1), gzip.decompress),
+                   ("gzip -6", lambda: gzip.compress(compact, compresslevel=6), gzip.decompress)]
+    if zstandard is not None:
+        compressors.append(("zstd -3", lambda: zstandard.ZstdCompressor().compress(compact),
+                            zstandard.ZstdDecompressor().decompress))
+    else:
+        print("  zstandard is not installed, skipping zstd")
+    for name, compress, decompress in compressors:
+        body = compress()
+        print(f"  {name:<10} {len(body):7d} bytes ({len(body) / len(compact):5.1%})  "
+              f"compress={timed(compress, args.repeat) * 1e6:8.1f}us  "
+              f"decompress={timed(lambda: decompress(body), args.repeat) * 1e6:8.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+Cold start of the service: the time to import `main` in a fresh interpreter, and the time from process
+start to the first response, with a request already waiting in the (in-memory) queue.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --runs 5 --cold
+
+--cold skips the warm-up of the lifespan, so the clients and the extraction pool are created by the
+first job instead. Each run is a new process; MinIO and Claude are the local fakes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+IMPORT_SNIPPET = "import time; started = time.perf_counter(); import main; print(time.perf_counter() - started)"
+
+
+def measure_import(runs: int) -> None:
+    timings = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SNIPPET], capture_output=True, text=True, check=True)
+        timings.append(float(output.stdout.strip().splitlines()[-1]))
+    print(f"import main: median={statistics.median(timings) * 1000:7.1f}ms  min={min(timings) * 1000:7.1f}ms")
+
+    # Slowest modules by their own import time, from the last run
+    importtime = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], capture_output=True, text=True)
+    rows = []
+    for line in importtime.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = [field.strip() for field in line[len("import time:"):].split("|")]
+        rows.append((int(own), int(cumulative), name))
+    for own, cumulative, name in sorted(rows, reverse=True)[:8]:
+        print(f"  {name:<40} self={own / 1000:7.1f}ms  cumulative={cumulative / 1000:7.1f}ms")
+
+
+async def first_message(args, process_started: float) -> dict:
+    """Runs in the child process."""
+    from benchmarks.fake_anthropic import FakeAnthropicServer
+
+    server = FakeAnthropicServer(latency=args.claude_latency).start()
+    os.environ["ANTHROPIC_BASE_URL"] = server.base_url
+
+    imported_at = time.time()
+    import aio_pika
+
+    import main
+    from benchmarks.fake_amqp import FakeBroker, install
+    from benchmarks.fake_minio import FakeMinio
+    from core.config import settings
+    from services import minio_service
+    from services.message_codec import message_codec
+
+    imported = time.time() - imported_at
+
+    fake = FakeMinio()
+    with open(args.pdf, "rb") as f:
+        fake.put("book", f.read())
+    minio_service.minio_client = fake
+    broker = FakeBroker()
+    install(broker)
+    if args.cold:
+        main.warm_up = main.ensure_bucket
+
+    request = {"fileName": "book", "testId": "test", "startPage": 1, "endPage": args.pages, "questionCount": args.questions}
+    broker.route("", settings.rabbitmq_request_queue, aio_pika.Message(body=json.dumps(request).encode()))
+
+    started_at = time.time()
+    await main.start_services()
+    ready = time.time()
+    message, _ = await broker.queue(settings.rabbitmq_response_queue).messages.get()
+    responded = time.time()
+    assert not message_codec.decode(message.body, message.content_encoding).get("error"), message.body
+
+    await main.stop_services()
+    server.stop()
+    return {
+        "interpreter": imported_at - process_started,
+        "import": imported,
+        "startup": ready - started_at,
+        "first_job": responded - ready,
+        "to_first_message": responded - process_started,
+    }
+
+
+def measure_first_message(args) -> None:
+    from benchmarks.synthetic_pdf import build_pdf
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+        f.write(build_pdf(args.pages))
+    results = []
+    try:
+        for _ in range(args.runs):
+            command = [
+                sys.executable, "-m", "benchmarks.startup", "--child", str(time.time()), "--pdf", f.name,
+                "--pages", str(args.pages), "--questions", str(args.questions), "--claude-latency", str(args.claude_latency),
+            ] + (["--cold"] if args.cold else [])
+            env = dict(os.environ, TEMP_DIR=tempfile.mkdtemp(prefix="reader-ai-bench-"), ANTHROPIC_API_KEY="fake")
+            output = subprocess.run(command, capture_output=True, text=True, env=env)
+            if output.returncode:
+                raise SystemExit(output.stderr)
+            results.append(json.loads(output.stdout.strip().splitlines()[-1]))
+    finally:
+        os.remove(f.name)
+
+    print(f"time to first message ({'cold' if args.cold else 'warmed'}, median of {args.runs}):")
+    for key in ("interpreter", "import", "startup", "first_job", "to_first_message"):
+        print(f"  {key:<18} {statistics.median(result[key] for result in results) * 1000:8.1f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--questions", type=int, default=5)
+    parser.add_argument("--claude-latency", type=float, default=0.05)
+    parser.add_argument("--cold", action="store_true")
+    parser.add_argument("--child", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--pdf", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        print(json.dumps(asyncio.run(first_message(args, args.child))))
+        return
+    measure_import(args.runs)
+    measure_first_message(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Build text-only PDFs of arbitrary size without extra dependencies."""
+import random
+
+WORDS = (
+    "the girl walked through the old forest towards her grandmother's house carrying a basket "
+    "of bread and butter while the wolf watched quietly from behind the tall trees and thought "
+    "about how he could reach the house first"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def page_lines(page_number: int, lines_per_page: int, rng: random.Random):
+    lines = [f"Chapter {page_number // 10 + 1}, page {page_number + 1}."]
+    for _ in range(lines_per_page - 1):
+        words = rng.choices(WORDS, k=rng.randint(3, 14))
+        lines.append(" ".join(words).capitalize() + ".")
+    return lines
+
+
+def build_pdf(pages: int, lines_per_page: int = 40, seed: int = 0) -> bytes:
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in once the page object numbers are known
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_refs = []
+    for page_number in range(pages):
+        commands = ["BT", "/F1 10 Tf", "12 TL", "50 800 Td"]
+        for line in page_lines(page_number, lines_per_page, rng):
+            commands.append(f"({_escape(line)}) Tj T*")
+        commands.append("ET")
+        stream = "\n".join(commands).encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_ref = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_ref
+        )
+        page_refs.append(len(objects))
+    kids = b" ".join(b"%d 0 R" % ref for ref in page_refs)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref_offset)
+    return bytes(out)
@@ -1,38 +1,167 @@
 import os
+from functools import lru_cache
+from typing import Dict, Optional
 
-from dotenv import load_dotenv
+from dotenv import dotenv_values
 from pydantic import Field
 from pydantic_settings import BaseSettings
 
-load_dotenv()
+from core.lazy import Lazy
+
+
+@lru_cache(maxsize=None)
+def _dotenv() -> Dict[str, Optional[str]]:
+    # Values from .env fill in what the environment does not set; os.environ itself is left untouched
+    return dotenv_values()
+
+
+def _env(name: str, default=None):
+    return os.environ.get(name, _dotenv().get(name, default))
+
+
+APP_NAME = "Test Generation Service"
 
 
 class Settings(BaseSettings):
-    app_name: str = "Test Generation Service"
+    app_name: str = APP_NAME
+
+    # HTTP server; reload is for development only
+    http_host: str = Field(default_factory=lambda: _env("HTTP_HOST", "0.0.0.0"))
+    http_port: int = Field(default_factory=lambda: int(_env("HTTP_PORT", 8001)))
+    http_reload: bool = Field(default_factory=lambda: bool(int(_env("HTTP_RELOAD", "0"))))
+
+    # Worker processes started by supervisor.py (0 means one per CPU). The prefetch, in-flight, Claude
+    # and book cache budgets below are totals, split evenly between the workers
+    worker_processes: int = Field(default_factory=lambda: int(_env("WORKER_PROCESSES", 0)))
+    worker_stats_interval: float = Field(default_factory=lambda: float(_env("WORKER_STATS_INTERVAL", 2)))
+    worker_restart_max_backoff: float = Field(default_factory=lambda: float(_env("WORKER_RESTART_MAX_BACKOFF", 30)))
+    # Worker i serves the test generation routes on 127.0.0.1:WORKER_HTTP_BASE_PORT + i (0 means
+    # HTTP_PORT + 1) and the supervisor forwards them there. WORKER_HTTP_PORT is set for each worker
+    # by the supervisor; 0 runs no HTTP server in the process
+    worker_http_base_port: int = Field(default_factory=lambda: int(_env("WORKER_HTTP_BASE_PORT", 0)))
+    worker_http_port: int = Field(default_factory=lambda: int(_env("WORKER_HTTP_PORT", 0)))
+
+    # Claude settings; empty values fall back to the Anthropic SDK defaults
+    anthropic_api_key: str = Field(default_factory=lambda: _env("ANTHROPIC_API_KEY", ""))
+    anthropic_base_url: str = Field(default_factory=lambda: _env("ANTHROPIC_BASE_URL", ""))
+    claude_model: str = Field(default_factory=lambda: _env("MODEL_NAME", "claude-3-5-sonnet-20241022"))
 
     # RabbitMQ settings
-    rabbitmq_host: str = Field(default=os.getenv("RABBITMQ_HOST", "localhost"))
-    rabbitmq_port: int = Field(default=int(os.getenv("RABBITMQ_PORT", 5672)))
-    rabbitmq_user: str = Field(default=os.getenv("RABBITMQ_USER", "guest"))
-    rabbitmq_password: str = Field(default=os.getenv("RABBITMQ_PASSWORD", "guest"))
-    rabbitmq_request_queue: str = Field(default=os.getenv("RABBITMQ_REQUEST_QUEUE", "test_generation_request"))
-    rabbitmq_exchange: str = Field(default=os.getenv("RABBITMQ_EXCHANGE", "test_generation_exchange"))
-    rabbitmq_response_queue: str = Field(default=os.getenv("RABBITMQ_RESPONSE_QUEUE", "test_generation_response"))
-    rabbitmq_routing_key: str = Field(default=os.getenv("RABBITMQ_ROUTING_KEY", "generate_test"))
+    rabbitmq_host: str = Field(default_factory=lambda: _env("RABBITMQ_HOST", "localhost"))
+    rabbitmq_port: int = Field(default_factory=lambda: int(_env("RABBITMQ_PORT", 5672)))
+    rabbitmq_user: str = Field(default_factory=lambda: _env("RABBITMQ_USER", "guest"))
+    rabbitmq_password: str = Field(default_factory=lambda: _env("RABBITMQ_PASSWORD", "guest"))
+    rabbitmq_request_queue: str = Field(
+        default_factory=lambda: _env("RABBITMQ_REQUEST_QUEUE", "test_generation_request"))
+    rabbitmq_exchange: str = Field(default_factory=lambda: _env("RABBITMQ_EXCHANGE", "test_generation_exchange"))
+    rabbitmq_response_queue: str = Field(
+        default_factory=lambda: _env("RABBITMQ_RESPONSE_QUEUE", "test_generation_response"))
+    # Default for requests without "streamResponse": publish every question as soon as it is ready
+    stream_responses: bool = Field(default_factory=lambda: bool(int(_env("STREAM_RESPONSES", "0"))))
+    rabbitmq_routing_key: str = Field(default_factory=lambda: _env("RABBITMQ_ROUTING_KEY", "generate_test"))
+    # Enables message priorities (x-max-priority) on the request queues. Changing it needs the queues
+    # to be deleted and declared again, so 0 leaves them as they are
+    rabbitmq_max_priority: int = Field(default_factory=lambda: int(_env("RABBITMQ_MAX_PRIORITY", 0)))
+    rabbitmq_prefetch_count: int = Field(default_factory=lambda: int(_env("RABBITMQ_PREFETCH_COUNT", 12)))
+    consumer_max_in_flight: int = Field(default_factory=lambda: int(_env("CONSUMER_MAX_IN_FLIGHT", 8)))
+    consumer_drain_timeout: float = Field(default_factory=lambda: float(_env("CONSUMER_DRAIN_TIMEOUT", 30)))
+    rabbitmq_publisher_channels: int = Field(default_factory=lambda: int(_env("RABBITMQ_PUBLISHER_CHANNELS", 4)))
+    rabbitmq_publish_batch_size: int = Field(default_factory=lambda: int(_env("RABBITMQ_PUBLISH_BATCH_SIZE", 64)))
+    rabbitmq_publish_buffer_size: int = Field(default_factory=lambda: int(_env("RABBITMQ_PUBLISH_BUFFER_SIZE", 1000)))
+    rabbitmq_publish_max_attempts: int = Field(default_factory=lambda: int(_env("RABBITMQ_PUBLISH_MAX_ATTEMPTS", 5)))
+    # Responses of at least MESSAGE_COMPRESSION_MIN_BYTES are compressed: none | gzip | zstd (needs the
+    # zstandard package). Incoming messages are decoded by their content_encoding whatever this says
+    message_compression: str = Field(default_factory=lambda: _env("MESSAGE_COMPRESSION", "none"))
+    message_compression_min_bytes: int = Field(default_factory=lambda: int(_env("MESSAGE_COMPRESSION_MIN_BYTES", 1024)))
+    # Payloads are logged cut to this many characters
+    message_log_max_chars: int = Field(default_factory=lambda: int(_env("MESSAGE_LOG_MAX_CHARS", 200)))
+    # Requests on this queue always use the bulk mode; empty disables the queue
+    rabbitmq_bulk_queue: str = Field(default_factory=lambda: _env("RABBITMQ_BULK_QUEUE", ""))
+    rabbitmq_bulk_routing_key: str = Field(
+        default_factory=lambda: _env("RABBITMQ_BULK_ROUTING_KEY", "generate_test_bulk"))
+    # Cancel requests ({"type": "cancel", "testId": ...}) on this routing key reach every instance; empty disables
+    rabbitmq_control_routing_key: str = Field(
+        default_factory=lambda: _env("RABBITMQ_CONTROL_ROUTING_KEY", "cancel_test"))
 
     # MinIO settings
-    minio_endpoint: str = Field(default=os.getenv("MINIO_ENDPOINT", "localhost:9000"))
-    minio_access_key: str = Field(default=os.getenv("MINIO_ACCESS_KEY", "minioadmin"))
-    minio_secret_key: str = Field(default=os.getenv("MINIO_SECRET_KEY", "minioadmin"))
-    minio_bucket: str = Field(default=os.getenv("MINIO_BUCKET", "books"))
-    minio_secure: bool = Field(default=bool(int(os.getenv("MINIO_SECURE", "0"))))
+    minio_endpoint: str = Field(default_factory=lambda: _env("MINIO_ENDPOINT", "localhost:9000"))
+    minio_access_key: str = Field(default_factory=lambda: _env("MINIO_ACCESS_KEY", "minioadmin"))
+    minio_secret_key: str = Field(default_factory=lambda: _env("MINIO_SECRET_KEY", "minioadmin"))
+    minio_bucket: str = Field(default_factory=lambda: _env("MINIO_BUCKET", "books"))
+    minio_secure: bool = Field(default_factory=lambda: bool(int(_env("MINIO_SECURE", "0"))))
+    minio_download_mode: str = Field(default_factory=lambda: _env("MINIO_DOWNLOAD_MODE", "cache"))  # cache | stream
+    minio_stream_max_memory_mb: int = Field(default_factory=lambda: int(_env("MINIO_STREAM_MAX_MEMORY_MB", 64)))
 
     # Temporary file storage
-    temp_dir: str = Field(default=os.getenv("TEMP_DIR", "/tmp"))
+    temp_dir: str = Field(default_factory=lambda: _env("TEMP_DIR", "/tmp"))
+    book_cache_max_mb: int = Field(default_factory=lambda: int(_env("BOOK_CACHE_MAX_MB", 1024)))
+    page_store_preextract: bool = Field(default_factory=lambda: bool(int(_env("PAGE_STORE_PREEXTRACT", "1"))))
+
+    # PDF extraction settings (0 workers means one per CPU)
+    pdf_extraction_workers: int = Field(default_factory=lambda: int(_env("PDF_EXTRACTION_WORKERS", 0)))
+    pdf_parallel_min_pages: int = Field(default_factory=lambda: int(_env("PDF_PARALLEL_MIN_PAGES", 16)))
+
+    # Question generation settings
+    generation_mode: str = Field(
+        default_factory=lambda: _env("GENERATION_MODE", "concurrent"))  # concurrent | sequential
+    llm_max_concurrency: int = Field(default_factory=lambda: int(_env("LLM_MAX_CONCURRENCY", 8)))
+    llm_job_concurrency: int = Field(default_factory=lambda: int(_env("LLM_JOB_CONCURRENCY", 4)))
+    llm_requests_per_minute: int = Field(default_factory=lambda: int(_env("LLM_REQUESTS_PER_MINUTE", 50)))
+    llm_output_tokens_per_minute: int = Field(default_factory=lambda: int(_env("LLM_OUTPUT_TOKENS_PER_MINUTE", 80000)))
+    llm_max_retries: int = Field(default_factory=lambda: int(_env("LLM_MAX_RETRIES", 5)))
+    # Questions per Claude call: 1 keeps one call per question, 0 picks the size from the token budget
+    generation_batch_size: int = Field(default_factory=lambda: int(_env("GENERATION_BATCH_SIZE", 1)))
+    generation_batch_attempts: int = Field(default_factory=lambda: int(_env("GENERATION_BATCH_ATTEMPTS", 3)))
+    llm_batch_max_tokens: int = Field(default_factory=lambda: int(_env("LLM_BATCH_MAX_TOKENS", 8192)))
+    llm_tokens_per_question: int = Field(default_factory=lambda: int(_env("LLM_TOKENS_PER_QUESTION", 800)))
+    # Invalid questions (format, answers, quote not in the excerpt) are regenerated: attempts per part,
+    # and regenerations per test across all parts
+    question_max_attempts: int = Field(default_factory=lambda: int(_env("QUESTION_MAX_ATTEMPTS", 3)))
+    question_retry_budget: int = Field(default_factory=lambda: int(_env("QUESTION_RETRY_BUDGET", 10)))
+    # Prompt caching: document caches the instructions and the job's whole page range, and each call adds
+    # a part number; instructions caches the instructions alone. A prefix is cached only from 1024 tokens
+    # (claude-3-5-sonnet; 2048 for Haiku models): the instructions are about 650 tokens, or 540 for batch
+    # calls, which cache nothing else, so only document mode hits, once the page range adds ~400 tokens
+    prompt_cache_mode: str = Field(
+        default_factory=lambda: _env("PROMPT_CACHE_MODE", "document"))  # document | instructions | off
+    # Identical concurrent requests share one execution; a positive TTL also reuses recent results
+    dedupe_enabled: bool = Field(default_factory=lambda: bool(int(_env("DEDUPE_ENABLED", "1"))))
+    dedupe_result_ttl: float = Field(default_factory=lambda: float(_env("DEDUPE_RESULT_TTL", 0)))
+    checkpoint_enabled: bool = Field(default_factory=lambda: bool(int(_env("CHECKPOINT_ENABLED", "1"))))
+    checkpoint_ttl: float = Field(default_factory=lambda: float(_env("CHECKPOINT_TTL", 24 * 60 * 60)))
+    # Empty keeps checkpoints under TEMP_DIR; worker processes share one directory
+    checkpoint_dir: str = Field(default_factory=lambda: _env("CHECKPOINT_DIR", ""))
+
+    # Scheduling: consumer slots, pipeline stages and Claude calls go to jobs by weighted fair queuing instead of FIFO,
+    # with small jobs first; a job of priority p weighs PRIORITY_WEIGHT ** p
+    fair_scheduling: bool = Field(default_factory=lambda: bool(int(_env("FAIR_SCHEDULING", "1"))))
+    priority_weight: float = Field(default_factory=lambda: float(_env("PRIORITY_WEIGHT", 4)))
+
+    # Job pipeline: workers per stage and the queue in front of each stage; disabled runs stages inline
+    # With fair scheduling the generate stage takes every job and the Claude rate limiter orders the calls,
+    # so PIPELINE_GENERATE_WORKERS only applies with FAIR_SCHEDULING=0
+    pipeline_enabled: bool = Field(default_factory=lambda: bool(int(_env("PIPELINE_ENABLED", "1"))))
+    pipeline_queue_size: int = Field(default_factory=lambda: int(_env("PIPELINE_QUEUE_SIZE", 2)))
+    pipeline_fetch_workers: int = Field(default_factory=lambda: int(_env("PIPELINE_FETCH_WORKERS", 2)))
+    pipeline_extract_workers: int = Field(default_factory=lambda: int(_env("PIPELINE_EXTRACT_WORKERS", 2)))
+    pipeline_chunk_workers: int = Field(default_factory=lambda: int(_env("PIPELINE_CHUNK_WORKERS", 1)))
+    pipeline_generate_workers: int = Field(default_factory=lambda: int(_env("PIPELINE_GENERATE_WORKERS", 4)))
+    pipeline_publish_workers: int = Field(default_factory=lambda: int(_env("PIPELINE_PUBLISH_WORKERS", 2)))
+
+    # Bulk generation through the Message Batches API
+    bulk_submit_delay: float = Field(default_factory=lambda: float(_env("BULK_SUBMIT_DELAY", 30)))
+    bulk_max_requests: int = Field(default_factory=lambda: int(_env("BULK_MAX_REQUESTS", 10000)))
+    bulk_poll_interval: float = Field(default_factory=lambda: float(_env("BULK_POLL_INTERVAL", 60)))
+    # Records of submitted batches, which must outlive restarts; empty keeps them under TEMP_DIR. Worker
+    # processes each get a worker-<index> directory in it
+    bulk_job_dir: str = Field(default_factory=lambda: _env("BULK_JOB_DIR", ""))
 
     @property
     def rabbitmq_url(self) -> str:
         return f"amqp://{self.rabbitmq_user}:{self.rabbitmq_password}@{self.rabbitmq_host}:{self.rabbitmq_port}/"
 
 
-settings = Settings()
+
+
+# Built, and .env read, on first use rather than on import
+settings = Lazy(Settings)
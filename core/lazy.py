@@ -0,0 +1,57 @@
+import threading
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """
+    Stands in for the object `factory` returns, which is built on first attribute access rather than
+    when the module defining it is imported, so that reading settings, opening files or creating
+    clients waits until the service starts. Setting an attribute sets it on the object.
+    """
+
+    __slots__ = ("_factory", "_instance", "_lock")
+
+    def __init__(self, factory: Callable[[], T]):
+        object.__setattr__(self, "_factory", factory)
+        object.__setattr__(self, "_instance", None)
+        object.__setattr__(self, "_lock", threading.Lock())
+
+    def get(self) -> T:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    object.__setattr__(self, "_instance", self._factory())
+        return self._instance
+
+    def __getattr__(self, name: str):
+        return getattr(self.get(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self.get(), name, value)
+
+    def __repr__(self) -> str:
+        return f"Lazy({self._instance!r})" if self._instance is not None else f"Lazy({self._factory!r})"
+
+
+class DeferredSetup:
+    """
+    Base of the local stores: `_setup()` creates their directory or reads what is already in it, once,
+    from warm_up() or on first use.
+    """
+
+    _prepared = False
+    _prepare_lock = threading.Lock()
+
+    def prepare(self) -> None:
+        if self._prepared:
+            return
+        # warm_up() may run it in a thread while a job already needs the store
+        with self._prepare_lock:
+            if not self._prepared:
+                self._setup()
+                self._prepared = True
+
+    def _setup(self) -> None:
+        raise NotImplementedError
@@ -0,0 +1,230 @@
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{str(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(labels[name] for name in self.label_names)
+
+    def collect(self) -> Dict[Tuple[str, ...], Any]:
+        """Current values by label values."""
+        return self._values
+
+    def merge(self, values: Dict[Tuple[str, ...], Any], other: Dict[Tuple[str, ...], Any]) -> None:
+        """Add `other` (collected by another process) into `values`."""
+        for key, value in other.items():
+            values[key] = values.get(key, 0) + value
+
+    def snapshot(self) -> dict:
+        return {
+            "type": self.type,
+            "documentation": self.documentation,
+            "labels": list(self.label_names),
+            "values": [[list(key), value] for key, value in self.collect().items()],
+        }
+
+    @classmethod
+    def from_snapshot(cls, name: str, data: dict) -> "Metric":
+        return cls(name, data["documentation"], data["labels"])
+
+    def samples(self, values: Dict[Tuple[str, ...], Any]) -> List[str]:
+        raise NotImplementedError
+
+    def render(self, values: Optional[Dict[Tuple[str, ...], Any]] = None) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples(self.collect() if values is None else values))
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self, values: Dict[Tuple[str, ...], float]) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in values.items()]
+
+
+class Gauge(Metric):
+    """A gauge is either set explicitly or read from `function` at scrape time."""
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, label_names)
+        self.function = function
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str) -> None:
+        self.inc(-amount, **labels)
+
+    def collect(self) -> Dict[Tuple[str, ...], float]:
+        if self.function is not None:
+            return {(): self.function()}
+        return self._values
+
+    def samples(self, values: Dict[Tuple[str, ...], float]) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in values.items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (+Inf last), sum]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def time(self, **labels: str) -> "Timer":
+        return Timer(self, labels)
+
+    def snapshot(self) -> dict:
+        return {**super().snapshot(), "buckets": list(self.buckets)}
+
+    @classmethod
+    def from_snapshot(cls, name: str, data: dict) -> "Histogram":
+        return cls(name, data["documentation"], data["labels"], data["buckets"])
+
+    def merge(self, values: Dict[Tuple[str, ...], list], other: Dict[Tuple[str, ...], list]) -> None:
+        for key, (counts, total) in other.items():
+            state = values.setdefault(key, [[0] * len(counts), 0.0])
+            state[0] = [mine + theirs for mine, theirs in zip(state[0], counts)]
+            state[1] += total
+
+    def samples(self, values: Dict[Tuple[str, ...], list]) -> List[str]:
+        lines = []
+        for key, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                bucket_label = f'le="{le}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, bucket_label)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class Timer:
+    """`with histogram.time(stage="..."):` observes the duration of the block, also when it raises."""
+
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "Timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: List[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Picklable copy of all metrics, to be rendered by another process with render_snapshots."""
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self.metrics) + "\n"
+
+
+def render_snapshots(snapshots: List[Dict[str, dict]]) -> str:
+    """Render the sum of registry snapshots, e.g. one per worker process."""
+    merged: Dict[str, Tuple[Metric, dict]] = {}
+    for snapshot in snapshots:
+        for name, data in snapshot.items():
+            if name not in merged:
+                merged[name] = (_METRIC_TYPES[data["type"]].from_snapshot(name, data), {})
+            metric, values = merged[name]
+            metric.merge(values, {tuple(key): value for key, value in data["values"]})
+    return "\n".join(metric.render(values) for metric, values in merged.values()) + "\n"
+
+_METRIC_TYPES = {"counter": Counter, "gauge": Gauge, "histogram": Histogram}
+
+registry = Registry()
+
+stage_duration = registry.register(Histogram(
+    "reader_stage_duration_seconds",
+    "Duration of job stages",
+    ["stage"]
+))
+job_duration = registry.register(Histogram(
+    "reader_job_duration_seconds",
+    "Duration of test generation jobs",
+    ["status"]
+))
+claude_requests = registry.register(Counter(
+    "reader_claude_requests_total",
+    "Claude API calls by outcome",
+    ["status"]
+))
+claude_tokens = registry.register(Counter(
+    "reader_claude_tokens_total",
+    "Claude API tokens by kind (input, output, cache_read, cache_creation)",
+    ["kind"]
+))
+consumer_queue_wait = registry.register(Histogram(
+    "reader_consumer_queue_wait_seconds",
+    "Time a delivered message waits for a free consumer worker"
+))
+consumer_in_flight = registry.register(Gauge(
+    "reader_consumer_in_flight",
+    "Messages currently processed by the consumer",
+    ["queue"]
+))
+errors = registry.register(Counter(
+    "reader_errors_total",
+    "Errors by source",
+    ["source"]
+))
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 
@@ -5,10 +6,17 @@ import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from api.routes import status
-from core.config import settings
-from services.rabbitmq_consumer import rabbitmq_consumer
-from services.test_generator import process_test_generation_request
+from api.routes import metrics, status, tests
+from core.config import APP_NAME, settings
+from core.lazy import Lazy
+from services.bulk_generator import bulk_generator
+from services.claude_service import close_clients, get_async_client
+from services.message_codec import preview
+from services.minio_service import ensure_bucket
+from services.pdf_extractor import shutdown_executor, warm_executor
+from services.rabbitmq_consumer import RabbitMQConsumer, rabbitmq_consumer
+from services.response_publisher import rabbitmq_producer
+from services.test_generator import book_cache, cancel_test, page_store, process_test_generation_request, test_pipeline
 
 # Config logging
 logging.basicConfig(
@@ -19,23 +27,86 @@ logger = logging.getLogger(__name__)
 
 
 async def message_handler(payload):
-    logger.info(f"Gor request for test generation: {payload}")
-
     await process_test_generation_request(payload)
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
+async def bulk_message_handler(payload):
+    if isinstance(payload, dict):
+        payload['mode'] = 'bulk'
+
+    await message_handler(payload)
+
+
+async def control_message_handler(payload):
+    if isinstance(payload, dict) and payload.get('type') == 'cancel':
+        cancel_test(payload.get('testId'))
+    else:
+        logger.error(f"Unknown control request: {preview(payload)}")
+
+
+# Used only when their queue or routing key is configured
+bulk_consumer = Lazy(lambda: RabbitMQConsumer(settings.rabbitmq_bulk_queue, settings.rabbitmq_bulk_routing_key))
+control_consumer = Lazy(lambda: RabbitMQConsumer(routing_key=settings.rabbitmq_control_routing_key, exclusive=True))
+
+
+async def warm_up():
+    """
+    Create the clients, set up the storage directories (importing the modules leaves the filesystem
+    alone) and start the extraction pool before the first message arrives.
+    """
+    get_async_client()
+    # Indexing the book cache may delete partial downloads and evict books, so it is kept off the loop;
+    # the page store then drops the text of books that are no longer cached
+    await asyncio.to_thread(book_cache.prepare)
+    await asyncio.to_thread(page_store.prune, book_cache.etags())
+    bulk_generator.store.prepare()
+    await ensure_bucket()
+    await warm_executor()
+    try:
+        await rabbitmq_producer.connect()
+    except Exception as e:
+        # Not fatal: the producer connects again on the first response
+        logger.warning(f"Failed to connect the response producer: {e}")
+
+
+async def start_services():
+    """Connect to MinIO and RabbitMQ and start consuming; shared by the HTTP app and worker processes."""
+    await warm_up()
+    await bulk_generator.resume()
+
+    if settings.rabbitmq_control_routing_key:
+        await control_consumer.start_consuming(callback=control_message_handler)
+
     logger.info("Starting consuming test generation requests")
     await rabbitmq_consumer.start_consuming(callback=message_handler)
+    if settings.rabbitmq_bulk_queue:
+        await bulk_consumer.start_consuming(callback=bulk_message_handler)
 
-    yield
 
+async def stop_services():
+    """Stop consuming, drain the jobs in flight and close the connections."""
     logger.info("Stopping consuming test generation requests")
+    # Before draining, so bulk jobs do not wait out the submit window and get requeued
+    await bulk_generator.stop()
     await rabbitmq_consumer.stop_consuming()
+    if settings.rabbitmq_bulk_queue:
+        await bulk_consumer.stop_consuming()
+    if settings.rabbitmq_control_routing_key:
+        await control_consumer.stop_consuming()
+    await test_pipeline.stop()
+    await rabbitmq_producer.close()
+    await close_clients()
+    shutdown_executor()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await start_services()
+    yield
+    await stop_services()
 
 
-app = FastAPI(title=settings.app_name, lifespan=lifespan)
+app = FastAPI(title=APP_NAME, lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -46,6 +117,8 @@ app.add_middleware(
 )
 
 app.include_router(status.router, prefix="/api", tags=["status"])
+app.include_router(metrics.router, prefix="/api", tags=["metrics"])
+app.include_router(tests.router, prefix="/api", tags=["tests"])
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8001, reload=True)
+    uvicorn.run("main:app", host=settings.http_host, port=settings.http_port, reload=settings.http_reload)
@@ -1,6 +1,58 @@
-from pydantic import BaseModel
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import BaseModel, Field, field_validator
 
 
 class StatusResponse(BaseModel):
     status: str
     version: str
+    llm: Optional[Dict[str, Any]] = None
+    workers: Optional[List[Dict[str, Any]]] = None
+
+
+class TestGenerationRequest(BaseModel):
+    fileName: str
+    startPage: int = Field(gt=0)
+    endPage: int = Field(gt=0)
+    questionCount: int = Field(gt=0)
+    priority: int = Field(default=0, ge=0, le=9)
+    testId: Optional[Union[str, int]] = None
+
+
+class TestGenerationMessage(TestGenerationRequest):
+    """A request from the queue: the HTTP request plus the options only queued requests have."""
+
+    # Echoed back as sent; producers use both string and numeric ids
+    testId: Union[str, int]
+    # Taken from the AMQP message priority as well, which may go past 9; the scheduler caps it
+    priority: int = Field(default=0, ge=0)
+    streamResponse: Optional[bool] = None
+    deadline: Optional[Union[float, str]] = None
+    mode: Optional[str] = None
+
+
+class TestGenerationResponse(BaseModel):
+    fileName: str
+    testId: Optional[Union[str, int]] = None
+    questions: List[Dict[str, Any]]
+
+
+class Answer(BaseModel):
+    answer: str = Field(min_length=1)
+    correct: bool
+
+
+class Question(BaseModel):
+    """A generated question, as described by FORMAT in utils.prompt_utils."""
+
+    question: str = Field(min_length=1)
+    quote: str = Field(min_length=1)
+    answers: List[Answer] = Field(min_length=4, max_length=4)
+
+    @field_validator("answers")
+    @classmethod
+    def check_one_correct_answer(cls, answers: List[Answer]) -> List[Answer]:
+        correct = sum(answer.correct for answer in answers)
+        if correct != 1:
+            raise ValueError(f"exactly one answer must be correct, got {correct}")
+        return answers
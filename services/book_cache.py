@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import os
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, NamedTuple, Optional
+
+from minio import Minio
+
+from core.lazy import DeferredSetup
+from core.metrics import stage_duration
+
+logger = logging.getLogger(__name__)
+
+
+class CachedBook(NamedTuple):
+    path: str
+    etag: str
+
+
+class BookCache(DeferredSetup):
+    """
+    On-disk cache of books downloaded from MinIO.
+
+    Files are stored by object ETag, so a cached copy is reused as long as `stat_object` reports the
+    same ETag. Entries are evicted least-recently-used once the cache grows over `max_bytes`; books
+    currently opened by a job are never evicted; `on_evict` is called with the ETag of each evicted
+    book. The MinIO client is taken from `get_client` on use.
+    """
+
+    def __init__(
+            self,
+            get_client: Callable[[], Minio],
+            bucket: str,
+            cache_dir: str,
+            max_bytes: int,
+            on_evict: Optional[Callable[[str], None]] = None
+    ):
+        self.get_client = get_client
+        self.bucket = bucket
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.on_evict = on_evict
+
+        self._entries: "OrderedDict[str, int]" = OrderedDict()  # etag -> size, least recently used first
+        self._leases: Dict[str, int] = {}
+        self._downloads: Dict[str, asyncio.Future] = {}
+        self._total_bytes = 0
+
+    def _setup(self) -> None:
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._load_existing()
+
+    def _path(self, etag: str) -> str:
+        return os.path.join(self.cache_dir, f"{etag}.pdf")
+
+    def _load_existing(self) -> None:
+        files = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if ".part" in name:
+                os.remove(path)
+            elif name.endswith(".pdf"):
+                files.append((os.path.getmtime(path), name[:-len(".pdf")], os.path.getsize(path)))
+
+        for _, etag, size in sorted(files):
+            self._entries[etag] = size
+            self._total_bytes += size
+        self._evict()
+
+    async def _stat_etag(self, file_name: str) -> str:
+        stat = await asyncio.to_thread(self.get_client().stat_object, self.bucket, file_name)
+        return stat.etag.strip('"')
+
+    async def _download(self, file_name: str, etag: str) -> None:
+        part_path = os.path.join(self.cache_dir, f"{etag}.{uuid.uuid4().hex}.part")
+        try:
+            with stage_duration.time(stage="minio_download"):
+                await asyncio.to_thread(self.get_client().fget_object, self.bucket, file_name, part_path)
+            os.replace(part_path, self._path(etag))
+        finally:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+
+        size = os.path.getsize(self._path(etag))
+        self._entries[etag] = size
+        self._total_bytes += size
+        logger.info(f"Cached book {file_name} ({size} bytes, etag {etag})")
+
+    async def _ensure_cached(self, file_name: str, etag: str) -> None:
+        if etag in self._entries:
+            if os.path.exists(self._path(etag)):
+                self._entries.move_to_end(etag)
+                logger.info(f"Book {file_name} served from cache")
+                return
+            self._total_bytes -= self._entries.pop(etag)
+
+        # Collapse concurrent downloads of the same object into one
+        download = self._downloads.get(etag)
+        if download is None:
+            download = asyncio.ensure_future(self._download(file_name, etag))
+            self._downloads[etag] = download
+            download.add_done_callback(lambda _: self._downloads.pop(etag, None))
+        await asyncio.shield(download)
+
+    def _evict(self) -> None:
+        for etag in list(self._entries):
+            if self._total_bytes <= self.max_bytes:
+                break
+            if self._leases.get(etag):
+                continue
+            size = self._entries.pop(etag)
+            self._total_bytes -= size
+            try:
+                os.remove(self._path(etag))
+            except FileNotFoundError:
+                pass
+            logger.info(f"Evicted cached book {etag} ({size} bytes)")
+            if self.on_evict is not None:
+                self.on_evict(etag)
+
+    def etags(self) -> List[str]:
+        self.prepare()
+        return list(self._entries)
+
+    @asynccontextmanager
+    async def open(self, file_name: str) -> AsyncIterator[CachedBook]:
+        """Yield the local copy of the current version of `file_name`, valid until the context exits."""
+        self.prepare()
+        etag = await self._stat_etag(file_name)
+        self._leases[etag] = self._leases.get(etag, 0) + 1
+        try:
+            await self._ensure_cached(file_name, etag)
+            yield CachedBook(self._path(etag), etag)
+        finally:
+            self._leases[etag] -= 1
+            if not self._leases[etag]:
+                del self._leases[etag]
+            self._evict()
@@ -0,0 +1,295 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from core.config import settings
+from core.lazy import DeferredSetup, Lazy
+from models.schemas import TestGenerationResponse
+from services.claude_service import MAX_TOKENS, claude_generate_answer_async, get_async_client, get_model_name
+from services.question_validator import InvalidQuestion, check_question_count, keep_fallback, parse_question
+from services.response_publisher import send_error_response, send_response
+from utils.prompt_utils import get_excerpt_content, get_system_blocks, with_retry_feedback
+
+logger = logging.getLogger(__name__)
+
+
+class BulkJobStore(DeferredSetup):
+    """Durable records of submitted message batches, one JSON file per batch."""
+
+    def __init__(self, store_dir: str):
+        self.store_dir = store_dir
+
+    def _setup(self) -> None:
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def _path(self, batch_id: str) -> str:
+        return os.path.join(self.store_dir, f"{batch_id}.json")
+
+    def save(self, record: Dict[str, Any]) -> None:
+        self.prepare()
+        path = self._path(record["batchId"])
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as record_file:
+            json.dump(record, record_file)
+            record_file.flush()
+            os.fsync(record_file.fileno())
+        os.replace(tmp_path, path)
+
+    def load_all(self) -> List[Dict[str, Any]]:
+        self.prepare()
+        records = []
+        for name in sorted(os.listdir(self.store_dir)):
+            if name.endswith(".json"):
+                with open(os.path.join(self.store_dir, name)) as record_file:
+                    records.append(json.load(record_file))
+        return records
+
+    def delete(self, batch_id: str) -> None:
+        try:
+            os.remove(self._path(batch_id))
+        except FileNotFoundError:
+            pass
+
+
+class BulkGenerator:
+    """
+    Generates questions for low-priority jobs through the Message Batches API.
+
+    Jobs are collected for up to `bulk_submit_delay` seconds and submitted together as one batch.
+    The batch is recorded on disk before `submit` returns, so a restart resumes polling instead of
+    losing the work. Responses are published when the batch has ended.
+    """
+
+    def __init__(self, store: BulkJobStore):
+        self.store = store
+        self._pending: List[Dict[str, Any]] = []
+        self._pending_requests = 0
+        self._flush_task: Optional[asyncio.Task] = None
+        self._pollers: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+
+    async def submit(self, test_id: str, file_name: str, parts: List[str]) -> None:
+        """Wait until the job is part of a submitted and recorded batch."""
+        submitted = asyncio.get_running_loop().create_future()
+        job = {"testId": test_id, "fileName": file_name, "parts": parts, "submitted": submitted}
+        self._pending.append(job)
+        self._pending_requests += len(parts)
+
+        if self._stopping or self._pending_requests >= settings.bulk_max_requests:
+            await self._flush()
+        elif self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+        try:
+            await submitted
+        except asyncio.CancelledError:
+            # The message goes back to the queue, so the job must not be submitted with the next batch
+            if job in self._pending:
+                self._pending.remove(job)
+                self._pending_requests -= len(parts)
+            raise
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(settings.bulk_submit_delay)
+        self._flush_task = None
+        await self._flush()
+
+    async def _flush(self) -> None:
+        if self._flush_task is not None and self._flush_task is not asyncio.current_task():
+            self._flush_task.cancel()
+            self._flush_task = None
+
+        jobs, self._pending, self._pending_requests = self._pending, [], 0
+        if not jobs:
+            return
+
+        try:
+            record = await self._create_batch(jobs)
+        except Exception as e:
+            logger.error(f"Failed to submit message batch: {e}")
+            for job in jobs:
+                if not job["submitted"].done():
+                    job["submitted"].set_exception(e)
+            return
+
+        for job in jobs:
+            if not job["submitted"].done():
+                job["submitted"].set_result(None)
+        self._start_polling(record)
+
+    async def _create_batch(self, jobs: List[Dict[str, Any]]) -> Dict[str, Any]:
+        system = get_system_blocks()
+        requests = []
+        record_jobs = []
+        for job_number, job in enumerate(jobs):
+            prefix = f"job{job_number}"
+            for index, part in enumerate(job["parts"], start=1):
+                requests.append({
+                    "custom_id": f"{prefix}-q{index}",
+                    "params": {
+                        "model": get_model_name(),
+                        "max_tokens": MAX_TOKENS,
+                        "temperature": 0,
+                        "system": system,
+                        "messages": [{"role": "user", "content": get_excerpt_content(part)}],
+                    },
+                })
+            record_jobs.append({
+                "testId": job["testId"],
+                "fileName": job["fileName"],
+                "questionCount": len(job["parts"]),
+                "prefix": prefix,
+                # Kept to check the quotes of the answers and to regenerate invalid questions
+                "parts": job["parts"],
+            })
+
+        batch = await get_async_client().messages.batches.create(requests=requests)
+        record = {"batchId": batch.id, "createdAt": time.time(), "jobs": record_jobs}
+        self.store.save(record)
+        logger.info(f"Submitted message batch {batch.id} with {len(requests)} requests for {len(jobs)} tests")
+        return record
+
+    def _start_polling(self, record: Dict[str, Any]) -> None:
+        batch_id = record["batchId"]
+        if batch_id in self._pollers or self._stopping:
+            # After stop, the record stays on disk and is resumed by the next start
+            return
+        task = asyncio.create_task(self._poll(record))
+        self._pollers[batch_id] = task
+        task.add_done_callback(lambda _: self._pollers.pop(batch_id, None))
+
+    async def _poll(self, record: Dict[str, Any]) -> None:
+        batch_id = record["batchId"]
+        while True:
+            try:
+                batch = await get_async_client().messages.batches.retrieve(batch_id)
+                if batch.processing_status == "ended":
+                    break
+                logger.info(f"Message batch {batch_id} is {batch.processing_status}: {batch.request_counts}")
+            except Exception as e:
+                logger.error(f"Failed to poll message batch {batch_id}: {e}")
+            await asyncio.sleep(settings.bulk_poll_interval)
+
+        # Until the broker confirms every response, the record stays and publishing is retried; published
+        # jobs are marked in it, so neither a retry nor a restart publishes them twice
+        while True:
+            try:
+                if await self._publish_results(record):
+                    break
+            except Exception as e:
+                logger.error(f"Failed to publish results of message batch {batch_id}: {e}")
+            await asyncio.sleep(settings.bulk_poll_interval)
+        self.store.delete(batch_id)
+
+    async def _publish_results(self, record: Dict[str, Any]) -> bool:
+        """True when the responses of all jobs of the batch are published."""
+        answers = {}
+        failures = {}
+        async for entry in await get_async_client().messages.batches.results(record["batchId"]):
+            if entry.result.type == "succeeded":
+                answers[entry.custom_id] = entry.result.message.content[0].text
+            else:
+                failures[entry.custom_id] = entry.result.type
+
+        published = set(record.get("published", []))
+        newly_published = False
+        for job in record["jobs"]:
+            if job["prefix"] not in published and await self._publish_job(job, answers, failures):
+                published.add(job["prefix"])
+                newly_published = True
+        if newly_published:
+            record["published"] = sorted(published)
+            self.store.save(record)
+
+        unpublished = len(record["jobs"]) - len(published)
+        if unpublished:
+            logger.warning(
+                f"{unpublished} tests of message batch {record['batchId']} are not published, "
+                f"retrying in {settings.bulk_poll_interval}s"
+            )
+            return False
+        logger.info(f"Published results of message batch {record['batchId']}")
+        return True
+
+    async def _publish_job(self, job: Dict[str, Any], answers: Dict[str, str], failures: Dict[str, str]) -> bool:
+        custom_ids = [f"{job['prefix']}-q{index}" for index in range(1, job["questionCount"] + 1)]
+        failed = [custom_id for custom_id in custom_ids if custom_id not in answers]
+        if failed:
+            reasons = sorted({failures.get(custom_id, "missing") for custom_id in failed})
+            return await send_error_response(
+                job["fileName"],
+                f"Bulk generation failed for {len(failed)} questions: {', '.join(reasons)}",
+                test_id=job["testId"]
+            )
+
+        parts = job.get("parts") or [None] * len(custom_ids)
+        try:
+            questions = [
+                await self._get_valid_question(index, answers[custom_id], part)
+                for index, (custom_id, part) in enumerate(zip(custom_ids, parts), start=1)
+            ]
+            questions = check_question_count([question for question in questions if question], len(custom_ids))
+        except Exception as e:
+            # Regeneration calls the Messages API; one failed job must not stop publishing the others
+            logger.error(f"Failed to process results of test {job['testId']}: {e}")
+            return await send_error_response(
+                job["fileName"],
+                f"Failed to process test generation request: {e}",
+                test_id=job["testId"]
+            )
+
+        return await send_response(
+            TestGenerationResponse(fileName=job["fileName"], testId=job["testId"], questions=questions)
+        )
+
+    @staticmethod
+    async def _get_valid_question(index: int, text: str, part: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Questions that fail validation are regenerated one by one through the regular Messages API;
+        None when question `index` stays invalid and is left out of the test.
+        """
+        try:
+            return parse_question(text, part)
+        except InvalidQuestion as e:
+            error = e
+        fallback = error.question
+
+        if part is not None:
+            content = get_excerpt_content(part)
+            for attempt in range(2, settings.question_max_attempts + 1):
+                logger.warning(f"Invalid question in batch results ({error}), regenerating it (attempt {attempt})")
+                response = await claude_generate_answer_async(
+                    with_retry_feedback(content, str(error)),
+                    system=get_system_blocks()
+                )
+                try:
+                    return parse_question(response.content[0].text, part)
+                except InvalidQuestion as e:
+                    error = e
+                    fallback = e.question or fallback
+        return keep_fallback(index, error, fallback)
+
+    async def resume(self) -> None:
+        self._stopping = False
+        for record in self.store.load_all():
+            logger.info(f"Resuming message batch {record['batchId']}")
+            self._start_polling(record)
+
+    async def stop(self) -> None:
+        """
+        Called before the consumers drain: jobs waiting for the submit window are sent now, and jobs
+        submitted while draining are sent at once, so their messages can still be acked.
+        """
+        self._stopping = True
+        await self._flush()
+        for task in list(self._pollers.values()):
+            task.cancel()
+        await asyncio.gather(*self._pollers.values(), return_exceptions=True)
+
+
+bulk_generator = Lazy(lambda: BulkGenerator(
+    BulkJobStore(settings.bulk_job_dir or os.path.join(settings.temp_dir, "bulk_jobs"))
+))
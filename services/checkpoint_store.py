@@ -0,0 +1,79 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+def hash_part(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class CheckpointStore:
+    """
+    Questions generated so far, keyed by test id and the content hash of their part.
+
+    A redelivered or retried job looks its parts up here and only generates the missing ones.
+    Entries expire `ttl` seconds after they were written.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                " test_id TEXT NOT NULL,"
+                " part_hash TEXT NOT NULL,"
+                " question TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " PRIMARY KEY (test_id, part_hash))"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS checkpoints_created_at ON checkpoints (created_at)")
+            self._connection = connection
+        return self._connection
+
+    def _load(self, test_id: str, part_hashes: List[str]) -> Dict[str, Any]:
+        with self._lock:
+            connection = self._connect()
+            connection.execute("DELETE FROM checkpoints WHERE created_at < ?", (time.time() - self.ttl,))
+            connection.commit()
+            rows = connection.execute(
+                "SELECT part_hash, question FROM checkpoints WHERE test_id = ?", (test_id,)
+            ).fetchall()
+
+        wanted = set(part_hashes)
+        return {part_hash: json.loads(question) for part_hash, question in rows if part_hash in wanted}
+
+    def _save(self, test_id: str, part_hash: str, question: Dict[str, Any]) -> None:
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO checkpoints (test_id, part_hash, question, created_at) VALUES (?, ?, ?, ?)",
+                (test_id, part_hash, json.dumps(question), time.time())
+            )
+            connection.commit()
+
+    async def load(self, test_id: str, part_hashes: List[str]) -> Dict[str, Any]:
+        return await asyncio.to_thread(self._load, test_id, part_hashes)
+
+    async def save(self, test_id: str, part_hash: str, question: Dict[str, Any]) -> None:
+        try:
+            await asyncio.to_thread(self._save, test_id, part_hash, question)
+        except sqlite3.Error as e:
+            # Losing a checkpoint only costs a regeneration after a crash, never the job itself
+            logger.warning(f"Failed to save checkpoint for test {test_id}: {e}")
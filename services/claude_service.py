@@ -1,26 +1,118 @@
-import os
+from typing import List, Optional, Union
 
 import anthropic
 
-client = anthropic.Anthropic()
+from core.config import settings
+from core.metrics import claude_requests, claude_tokens
+from services.rate_limiter import claude_rate_limiter
 
+MAX_TOKENS = 2000
 
-def claude_generate_answer(prompt: str):
-    response = client.messages.create(
-        model=os.getenv("MODEL_NAME", "claude-3-5-sonnet-20241022"),
-        max_tokens=2000,
-        temperature=0,
-        messages=[
+# Created on first use, or by the application warm-up, and closed with the application
+async_client: Optional[anthropic.AsyncAnthropic] = None
+
+
+def _client_options() -> dict:
+    return {
+        "api_key": settings.anthropic_api_key or None,
+        "base_url": settings.anthropic_base_url or None,
+    }
+
+
+def get_async_client() -> anthropic.AsyncAnthropic:
+    global async_client
+    if async_client is None:
+        # Retries are owned by the rate limiter so that backoff is coordinated across jobs
+        async_client = anthropic.AsyncAnthropic(max_retries=0, **_client_options())
+    return async_client
+
+
+async def close_clients() -> None:
+    global async_client
+    if async_client is not None:
+        await async_client.close()
+        async_client = None
+
+
+class TokenUsage:
+    """Token usage accumulated over the Claude calls of one job."""
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_creation_input_tokens = 0
+        self.cache_read_input_tokens = 0
+
+    def add(self, usage) -> None:
+        self.calls += 1
+        self.input_tokens += usage.input_tokens
+        self.output_tokens += usage.output_tokens
+        self.cache_creation_input_tokens += usage.cache_creation_input_tokens or 0
+        self.cache_read_input_tokens += usage.cache_read_input_tokens or 0
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cache_creation_input_tokens": self.cache_creation_input_tokens,
+            "cache_read_input_tokens": self.cache_read_input_tokens,
+        }
+
+
+def get_model_name() -> str:
+    return settings.claude_model
+
+
+def _build_messages(prompt: Union[str, List[dict]]):
+    if isinstance(prompt, str):
+        prompt = [
             {
-                "role": "user",
-                "content": [
-                    {
-                        "type": "text",
-                        "text": prompt
-                    }
-                ]
+                "type": "text",
+                "text": prompt
             }
         ]
-    )
 
+    return [
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+async def claude_generate_answer_async(
+        prompt: Union[str, List[dict]],
+        system: Optional[List[dict]] = None,
+        max_tokens: int = MAX_TOKENS
+):
+    """`prompt` is either plain text or a list of user content blocks; `system` may carry cache_control blocks."""
+    extra = {"system": system} if system else {}
+
+    try:
+        response = await _create_message(prompt, extra, max_tokens)
+    except Exception:
+        claude_requests.inc(status="error")
+        raise
+
+    claude_requests.inc(status="success")
+    usage = response.usage
+    claude_tokens.inc(usage.input_tokens, kind="input")
+    claude_tokens.inc(usage.output_tokens, kind="output")
+    claude_tokens.inc(usage.cache_read_input_tokens or 0, kind="cache_read")
+    claude_tokens.inc(usage.cache_creation_input_tokens or 0, kind="cache_creation")
     return response
+
+
+async def _create_message(prompt: Union[str, List[dict]], extra: dict, max_tokens: int):
+    return await claude_rate_limiter.run(
+        lambda: get_async_client().messages.create(
+            model=get_model_name(),
+            max_tokens=max_tokens,
+            temperature=0,
+            messages=_build_messages(prompt),
+            **extra
+        ),
+        max_tokens=max_tokens
+    )
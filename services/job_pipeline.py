@@ -0,0 +1,280 @@
+import asyncio
+import contextvars
+import logging
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Awaitable, Callable, List, NamedTuple, Optional, Set
+
+from core.metrics import Gauge, registry
+from services.job_scheduler import FairQueue, Flow, current_flow
+
+logger = logging.getLogger(__name__)
+
+pipeline_queue_depth = registry.register(Gauge(
+    "reader_pipeline_queue_depth",
+    "Jobs waiting for a pipeline stage",
+    ["stage"]
+))
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class PipelineJob:
+    """
+    One unit of work moving through a JobPipeline.
+
+    Stages store their output on the job. Resources entered on `resources` (book leases, buffers)
+    are released by the pipeline once no stage works on the job any more, or earlier by a stage
+    that no longer needs them.
+
+    A job with a `deadline` (Unix time) fails with DeadlineExceeded once it passes: queued jobs are
+    not started on any further stage and the stage running at that moment is cancelled.
+
+    Stages run in the context of the task that submitted the job (e.g. its scheduling flow), not in
+    the context of the pipeline worker, and the stage queues order jobs by that flow.
+    """
+
+    def __init__(self, deadline: Optional[float] = None):
+        self.resources = AsyncExitStack()
+        self.done: Optional[asyncio.Future] = None
+        self.deadline = deadline
+        self.context = contextvars.copy_context()
+        self.flow: Optional[Flow] = self.context.get(current_flow)
+
+    def time_left(self) -> Optional[float]:
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def check_deadline(self, stage: str) -> None:
+        time_left = self.time_left()
+        if time_left is not None and time_left <= 0:
+            raise DeadlineExceeded(f"Deadline exceeded before stage {stage}")
+
+
+class StageQueue:
+    """
+    The bounded queue in front of a stage. Stage workers take the job with the lowest fair queuing tag,
+    whether it is queued or its sender still waits for room, and senders waiting for room get in in the
+    same order, so a small job passes the large ones ahead of it at every stage instead of waiting for
+    them in FIFO order. Disabled, it behaves like asyncio.Queue.
+    """
+
+    def __init__(self, maxsize: int, fair: bool = True):
+        self.maxsize = maxsize
+        self._order = FairQueue(fair)
+        self._queued = 0
+        # Entries of senders waiting for room
+        self._blocked: List[list] = []
+        self._condition = asyncio.Condition()
+
+    def qsize(self) -> int:
+        return len(self._order)
+
+    async def put(self, job: "PipelineJob") -> None:
+        # Each stage is a single visit, so the tag comes from the job's weight alone: the flow's own
+        # finish time belongs to the Claude call queue
+        flow = Flow(job.flow.weight) if job.flow is not None else None
+        async with self._condition:
+            entry = self._order.push(flow, item=job)
+            self._blocked.append(entry)
+            try:
+                await self._condition.wait_for(lambda: not entry[2] or self._can_enter(entry))
+            except BaseException:
+                self._order.remove(entry)
+                raise
+            finally:
+                self._blocked.remove(entry)
+                self._condition.notify_all()
+            if entry[2]:
+                self._queued += 1
+
+    def _can_enter(self, entry: list) -> bool:
+        return self._queued < self.maxsize and entry is min(self._blocked)
+
+    async def get(self) -> "PipelineJob":
+        async with self._condition:
+            await self._condition.wait_for(lambda: len(self._order) > 0)
+            entry = self._order.head()
+            self._order.remove(entry, dispatched=True)
+            if entry not in self._blocked:
+                self._queued -= 1
+            self._condition.notify_all()
+            return entry[3]
+
+    def drain(self) -> List["PipelineJob"]:
+        jobs = []
+        while len(self._order):
+            entry = self._order.head()
+            self._order.remove(entry)
+            jobs.append(entry[3])
+        self._queued = 0
+        return jobs
+
+
+class Stage(NamedTuple):
+    name: str
+    handler: Callable[[Any], Awaitable[None]]
+    workers: int
+    # The handler waits on a fair-scheduled resource (the Claude rate limiter): with fair scheduling the
+    # stage runs every job it gets at once and leaves the order to that scheduler, since a fixed pool
+    # held by large jobs would keep small ones from ever reaching it
+    fair_scheduled: bool = False
+
+
+class JobPipeline:
+    """
+    Runs jobs through consecutive stages, each with its own pool of workers.
+
+    Stages are connected by bounded queues: a stage whose next queue is full stops taking jobs, so a
+    slow stage pushes back on the ones before it while different jobs occupy different stages at the
+    same time, e.g. the next book downloads and extracts while earlier jobs wait on Claude. With `fair`,
+    each stage takes its jobs in fair queuing order of their flows (see StageQueue).
+    """
+
+    def __init__(self, stages: List[Stage], queue_size: int, enabled: bool = True, fair: bool = True):
+        self.stages = stages
+        self.queue_size = queue_size
+        self.enabled = enabled
+        self.fair = fair
+        self._queues: List[StageQueue] = []
+        self._workers: List[asyncio.Task] = []
+        self._jobs: Set[asyncio.Task] = set()
+
+    def _stage_index(self, name: str) -> int:
+        for index, stage in enumerate(self.stages):
+            if stage.name == name:
+                return index
+        raise ValueError(f"Unknown pipeline stage: {name}")
+
+    def start(self) -> None:
+        if self._workers:
+            return
+        self._queues = [StageQueue(max(1, self.queue_size), self.fair) for _ in self.stages]
+        for index, stage in enumerate(self.stages):
+            if self._unbounded(stage):
+                self._workers.append(asyncio.create_task(self._dispatch(index)))
+                continue
+            for _ in range(max(1, stage.workers)):
+                self._workers.append(asyncio.create_task(self._work(index)))
+        logger.info("Job pipeline started: " + ", ".join(
+            f"{stage.name}={'all' if self._unbounded(stage) else max(1, stage.workers)}" for stage in self.stages
+        ))
+
+    def _unbounded(self, stage: Stage) -> bool:
+        return self.fair and stage.fair_scheduled
+
+    async def run(self, job: PipelineJob, start_stage: Optional[str] = None) -> None:
+        """Run `job` from `start_stage` (the first stage by default) to the end, raising on failure."""
+        first = self._stage_index(start_stage) if start_stage else 0
+        if not self.enabled:
+            async with job.resources:
+                for stage in self.stages[first:]:
+                    job.check_deadline(stage.name)
+                    try:
+                        await asyncio.wait_for(stage.handler(job), timeout=job.time_left())
+                    except asyncio.TimeoutError:
+                        raise DeadlineExceeded(f"Deadline exceeded during stage {stage.name}")
+            return
+
+        self.start()
+        job.done = asyncio.get_running_loop().create_future()
+        try:
+            await asyncio.wait_for(self._submit(first, job), timeout=job.time_left())
+        except asyncio.TimeoutError:
+            raise DeadlineExceeded("Deadline exceeded in the job pipeline")
+        finally:
+            if not job.done.done():
+                # The caller gave up; the worker holding the job cancels its stage and releases it
+                job.done.cancel()
+
+    async def _submit(self, index: int, job: PipelineJob) -> None:
+        try:
+            await self._put(index, job)
+        except BaseException:
+            await job.resources.aclose()
+            raise
+        await job.done
+
+    async def _put(self, index: int, job: PipelineJob) -> None:
+        await self._queues[index].put(job)
+        pipeline_queue_depth.set(self._queues[index].qsize(), stage=self.stages[index].name)
+
+    async def _get(self, index: int) -> PipelineJob:
+        job = await self._queues[index].get()
+        pipeline_queue_depth.set(self._queues[index].qsize(), stage=self.stages[index].name)
+        return job
+
+    async def _work(self, index: int) -> None:
+        while True:
+            await self._process(index, await self._get(index))
+
+    async def _dispatch(self, index: int) -> None:
+        while True:
+            task = asyncio.create_task(self._process(index, await self._get(index)))
+            self._jobs.add(task)
+            task.add_done_callback(self._jobs.discard)
+
+    async def _process(self, index: int, job: PipelineJob) -> None:
+        stage = self.stages[index]
+        passed_on = False
+        try:
+            if job.done.done():
+                return
+            job.check_deadline(stage.name)
+            await self._handle(stage, job)
+            if job.done.done():
+                return
+            if index + 1 < len(self.stages):
+                await self._put(index + 1, job)
+                passed_on = True
+            else:
+                job.done.set_result(None)
+        except asyncio.CancelledError:
+            if not job.done.done():
+                job.done.cancel()
+            raise
+        except Exception as e:
+            if not job.done.done():
+                job.done.set_exception(e)
+        finally:
+            if not passed_on:
+                await self._release(job)
+
+    @staticmethod
+    async def _release(job: PipelineJob) -> None:
+        try:
+            await job.resources.aclose()
+        except Exception as e:
+            logger.error(f"Failed to release job resources: {e}")
+
+    @staticmethod
+    async def _handle(stage: Stage, job: PipelineJob) -> None:
+        handler = job.context.run(asyncio.ensure_future, stage.handler(job))
+        try:
+            await asyncio.wait({handler, job.done}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            handler.cancel()
+            await asyncio.gather(handler, return_exceptions=True)
+            raise
+        if not handler.done():
+            logger.info(f"Job cancelled during pipeline stage {stage.name}")
+            handler.cancel()
+            await asyncio.gather(handler, return_exceptions=True)
+            return
+        handler.result()
+
+    async def stop(self) -> None:
+        tasks = self._workers + list(self._jobs)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._jobs.clear()
+
+        for queue in self._queues:
+            for job in queue.drain():
+                if not job.done.done():
+                    job.done.cancel()
+                await self._release(job)
+        self._queues = []
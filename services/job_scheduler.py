@@ -0,0 +1,133 @@
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, List, Optional
+
+from core.config import settings
+
+MAX_PRIORITY = 9
+# Extracting this many pages costs about as much time as one Claude call
+PAGES_PER_CALL = 20
+
+
+class Flow:
+    """A job competing for a shared resource; it gets a share proportional to `weight`."""
+
+    __slots__ = ("weight", "finish")
+
+    def __init__(self, weight: float = 1.0):
+        self.weight = weight
+        self.finish = 0.0
+
+
+# The flow of the job the current task works for; Claude calls are scheduled by it
+current_flow: ContextVar[Optional[Flow]] = ContextVar("current_flow", default=None)
+
+
+class FairQueue:
+    """
+    Self-clocked weighted fair queuing: a request of `cost` from a flow is tagged with a virtual finish
+    time of max(virtual time, the flow's previous finish) + cost / weight, and the waiting request with
+    the lowest tag goes first. Small and high-priority jobs overtake large ones, while the virtual time,
+    which advances with every dispatch, keeps large jobs from starving. Disabled, the order is FIFO.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.virtual_time = 0.0
+        # Entries are [finish, sequence, waiting, item]
+        self._heap: List[list] = []
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return sum(1 for entry in self._heap if entry[2])
+
+    def push(self, flow: Optional[Flow] = None, cost: float = 1.0, item: Any = None) -> list:
+        finish = 0.0
+        if self.enabled:
+            flow = flow or Flow()
+            finish = max(self.virtual_time, flow.finish) + cost / flow.weight
+            flow.finish = finish
+        entry = [finish, next(self._sequence), True, item]
+        heapq.heappush(self._heap, entry)
+        return entry
+
+    def head(self) -> list:
+        while not self._heap[0][2]:
+            heapq.heappop(self._heap)
+        return self._heap[0]
+
+    def is_head(self, entry: list) -> bool:
+        return self.head() is entry
+
+    def remove(self, entry: list, dispatched: bool = False) -> None:
+        if not entry[2]:
+            return
+        entry[2] = False
+        if dispatched:
+            self.virtual_time = max(self.virtual_time, entry[0])
+        while self._heap and not self._heap[0][2]:
+            heapq.heappop(self._heap)
+
+
+class FairSlots:
+    """A semaphore whose waiters are admitted in fair queuing order instead of FIFO."""
+
+    def __init__(self, slots: int, enabled: bool = True):
+        self.slots = slots
+        self.in_use = 0
+        self.queue = FairQueue(enabled)
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self, cost: float = 1.0, weight: float = 1.0) -> AsyncIterator[None]:
+        async with self._condition:
+            entry = self.queue.push(Flow(weight), cost)
+            try:
+                await self._condition.wait_for(lambda: self.in_use < self.slots and self.queue.is_head(entry))
+                self.queue.remove(entry, dispatched=True)
+                self.in_use += 1
+            finally:
+                self.queue.remove(entry)
+                self._condition.notify_all()
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_use -= 1
+                self._condition.notify_all()
+
+
+def job_priority(request: Any) -> int:
+    try:
+        priority = int(request.get("priority") or 0)
+    except (AttributeError, TypeError, ValueError):
+        return 0
+    return max(0, min(MAX_PRIORITY, priority))
+
+
+def priority_weight(priority: int) -> float:
+    return settings.priority_weight ** priority
+
+
+def estimate_job_size(request: Any) -> float:
+    """Relative cost of a test generation request: one Claude call per question plus the extraction."""
+    try:
+        pages = max(1, int(request["endPage"]) - int(request["startPage"]) + 1)
+        questions = max(1, int(request["questionCount"]))
+    except (KeyError, TypeError, ValueError):
+        return 1.0
+    return questions + pages / PAGES_PER_CALL
+
+
+def start_flow(request: Any) -> Flow:
+    """
+    Schedule the Claude calls of the current task, and the tasks it starts, as one job. Its share of
+    the calls is its priority weight over its size, so small jobs are not stuck behind the calls of a
+    large one and finish first, while the large one keeps making progress.
+    """
+    flow = Flow(priority_weight(job_priority(request)) / estimate_job_size(request))
+    current_flow.set(flow)
+    return flow
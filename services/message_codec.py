@@ -0,0 +1,131 @@
+import gzip
+import json
+import logging
+import reprlib
+from typing import Any, Optional, Tuple, Type, Union
+
+from pydantic import BaseModel
+
+from core.config import settings
+from core.lazy import Lazy
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "application/json"
+
+_preview = reprlib.Repr()
+_preview.maxstring = 60
+_preview.maxother = 60
+_preview.maxdict = 8
+_preview.maxlist = 4
+_preview.maxlevel = 3
+
+
+def preview(payload: Any, limit: Optional[int] = None) -> str:
+    """Short form of a message for the logs, built without formatting all of a large payload."""
+    limit = limit or settings.message_log_max_chars
+    if isinstance(payload, (bytes, bytearray)):
+        text = bytes(payload[:limit]).decode("utf-8", "replace")
+        return text if len(payload) <= limit else f"{text}... ({len(payload)} bytes)"
+    text = _preview.repr(payload)
+    return text if len(text) <= limit else text[:limit] + "..."
+
+
+class LazyPreview:
+    """A `preview` built only if the log record is emitted: pass it as a %s argument, not in an f-string."""
+
+    __slots__ = ("payload", "limit")
+
+    def __init__(self, payload: Any, limit: Optional[int] = None):
+        self.payload = payload
+        self.limit = limit
+
+    def __str__(self) -> str:
+        return preview(self.payload, self.limit)
+
+
+def _model_fields(value: Any) -> dict:
+    if isinstance(value, BaseModel):
+        return dict(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class MessageCodec:
+    """
+    Turns message payloads into AMQP bodies and back.
+
+    JSON goes through orjson when it is installed and the standard library otherwise. orjson reads the
+    fields of pydantic models directly, which is several times faster than model_dump_json for a
+    50-question response; the message models have no aliases or custom serializers that would differ.
+    Incoming models are validated by pydantic itself. Bodies of at least `min_size` bytes are compressed
+    with `compression` (gzip, or zstd with the zstandard package), which is recorded in the message's
+    content_encoding. Decoding follows the content_encoding of each message, so senders may mix them.
+    """
+
+    def __init__(self, compression: str = "none", min_size: int = 1024):
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, compressing messages with gzip instead")
+            compression = "gzip"
+        if compression not in ("none", "gzip", "zstd"):
+            raise ValueError(f"Unknown message compression: {compression}")
+        self.compression = compression
+        self.min_size = min_size
+
+    @staticmethod
+    def dumps(payload: Union[BaseModel, Any]) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(payload, default=_model_fields)
+        if isinstance(payload, BaseModel):
+            return payload.model_dump_json().encode()
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+
+    @staticmethod
+    def loads(data: Union[bytes, str], model: Optional[Type[BaseModel]] = None) -> Any:
+        """Raises ValueError on invalid JSON, and pydantic's ValidationError (a ValueError) for `model`."""
+        if model is not None:
+            return model.model_validate_json(data)
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+
+    def encode(self, payload: Union[BaseModel, Any]) -> Tuple[bytes, Optional[str]]:
+        """The body and its content_encoding (None when not compressed)."""
+        body = self.dumps(payload)
+        if self.compression == "none" or len(body) < self.min_size:
+            return body, None
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor().compress(body), "zstd"
+        return gzip.compress(body, compresslevel=6), "gzip"
+
+    @staticmethod
+    def decompress(body: bytes, content_encoding: Optional[str]) -> bytes:
+        if not content_encoding or content_encoding == "identity":
+            return body
+        if content_encoding == "gzip":
+            return gzip.decompress(body)
+        if content_encoding == "zstd":
+            if zstandard is None:
+                raise ValueError("Message is zstd compressed but zstandard is not installed")
+            return zstandard.ZstdDecompressor().decompress(body)
+        raise ValueError(f"Unsupported content encoding: {content_encoding}")
+
+    def decode(
+            self,
+            body: bytes,
+            content_encoding: Optional[str] = None,
+            model: Optional[Type[BaseModel]] = None
+    ) -> Any:
+        return self.loads(self.decompress(body, content_encoding), model)
+
+
+message_codec = Lazy(lambda: MessageCodec(settings.message_compression, settings.message_compression_min_bytes))
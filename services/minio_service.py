@@ -0,0 +1,63 @@
+import asyncio
+import logging
+from tempfile import SpooledTemporaryFile
+from typing import Optional
+
+from minio import Minio
+
+from core.config import settings
+from core.metrics import stage_duration
+
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+minio_client: Optional[Minio] = None
+
+
+def get_minio_client() -> Minio:
+    global minio_client
+    if minio_client is None:
+        minio_client = Minio(
+            settings.minio_endpoint,
+            access_key=settings.minio_access_key,
+            secret_key=settings.minio_secret_key,
+            secure=settings.minio_secure
+        )
+    return minio_client
+
+
+async def ensure_bucket() -> bool:
+    try:
+        exists = await asyncio.to_thread(get_minio_client().bucket_exists, settings.minio_bucket)
+    except Exception as e:
+        logger.error(f"Failed to check MinIO bucket {settings.minio_bucket}: {e}")
+        return False
+
+    if not exists:
+        logger.warning(f"MinIO bucket {settings.minio_bucket} does not exists")
+    return exists
+
+
+def _read_object(file_name: str) -> SpooledTemporaryFile:
+    # Small books stay in memory, larger ones roll over to an anonymous temp file that
+    # disappears with the process, so a crash cannot leave downloads behind
+    buffer = SpooledTemporaryFile(max_size=settings.minio_stream_max_memory_mb * 1024 * 1024, dir=settings.temp_dir)
+    response = get_minio_client().get_object(settings.minio_bucket, file_name)
+    try:
+        for chunk in response.stream(STREAM_CHUNK_SIZE):
+            buffer.write(chunk)
+    except Exception:
+        buffer.close()
+        raise
+    finally:
+        response.close()
+        response.release_conn()
+
+    buffer.seek(0)
+    return buffer
+
+
+async def get_object_buffer(file_name: str) -> SpooledTemporaryFile:
+    with stage_duration.time(stage="minio_download"):
+        return await asyncio.to_thread(_read_object, file_name)
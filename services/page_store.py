@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import mmap
+import os
+import struct
+from typing import Dict, Iterable, List
+
+from PyPDF2 import PdfReader
+
+from core.lazy import DeferredSetup
+from services.pdf_extractor import extract_pages_parallel
+
+logger = logging.getLogger(__name__)
+
+HEADER = struct.Struct("<4sI")  # magic, page count
+RECORD = struct.Struct("<qi")  # offset in the data file, length in bytes (-1 while not extracted)
+MAGIC = b"PGS1"
+MISSING = -1
+
+
+class BookPages:
+    """
+    Extracted text of one book version.
+
+    `<key>.txt` holds page texts appended in extraction order, `<key>.idx` is a fixed-size table of
+    (offset, length) records, one per page, so any page range is read by slicing an mmap of the data file.
+    """
+
+    def __init__(self, store_dir: str, key: str):
+        self.data_path = os.path.join(store_dir, f"{key}.txt")
+        self.index_path = os.path.join(store_dir, f"{key}.idx")
+        self.page_count = 0
+        self._records: List[tuple] = []
+
+    def exists(self) -> bool:
+        return os.path.exists(self.index_path)
+
+    def load(self) -> None:
+        with open(self.index_path, "rb") as index_file:
+            raw = index_file.read()
+        magic, self.page_count = HEADER.unpack_from(raw)
+        if magic != MAGIC:
+            raise ValueError(f"Unexpected page index format in {self.index_path}")
+        self._records = [RECORD.unpack_from(raw, HEADER.size + i * RECORD.size) for i in range(self.page_count)]
+
+    def create(self, page_count: int) -> None:
+        self.page_count = page_count
+        self._records = [(0, MISSING)] * page_count
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "wb") as index_file:
+            index_file.write(HEADER.pack(MAGIC, page_count))
+            for record in self._records:
+                index_file.write(RECORD.pack(*record))
+        open(self.data_path, "ab").close()
+        os.replace(tmp_path, self.index_path)
+
+    def missing(self, pages: Iterable[int]) -> List[int]:
+        return [page for page in pages if self._records[page][1] == MISSING]
+
+    def write(self, texts: Dict[int, str]) -> None:
+        with open(self.data_path, "ab") as data_file, open(self.index_path, "r+b") as index_file:
+            for page, text in sorted(texts.items()):
+                encoded = text.encode("utf-8")
+                offset = data_file.tell()
+                data_file.write(encoded)
+                self._records[page] = (offset, len(encoded))
+            # Data must be on disk before the index points at it
+            data_file.flush()
+            os.fsync(data_file.fileno())
+            for page in texts:
+                index_file.seek(HEADER.size + page * RECORD.size)
+                index_file.write(RECORD.pack(*self._records[page]))
+
+    def read(self, pages: Iterable[int]) -> List[str]:
+        pages = list(pages)
+        if os.path.getsize(self.data_path) == 0:
+            return ["" for _ in pages]
+
+        with open(self.data_path, "rb") as data_file, \
+                mmap.mmap(data_file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            texts = []
+            for page in pages:
+                offset, length = self._records[page]
+                texts.append(data[offset:offset + length].decode("utf-8"))
+            return texts
+
+
+class PageTextStore(DeferredSetup):
+    """
+    Per-book store of extracted page text, keyed by object ETag and page number. Books are removed
+    with their PDF from the book cache, so the cache size bounds the store as well.
+    """
+
+    def __init__(self, store_dir: str, preextract_chunk_size: int = 16):
+        self.store_dir = store_dir
+        self.preextract_chunk_size = preextract_chunk_size
+        self._books: Dict[str, BookPages] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def _setup(self) -> None:
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    def remove(self, key: str) -> None:
+        """Drop the text of a book version; called when its PDF leaves the book cache."""
+        self._books.pop(key, None)
+        self._locks.pop(key, None)
+        book = BookPages(self.store_dir, key)
+        for path in (book.index_path, book.data_path):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def prune(self, keep: Iterable[str]) -> None:
+        """Remove the books whose key is not in `keep`, left by evictions while the service was down."""
+        self.prepare()
+        keep = set(keep)
+        # Keys are ETags, which have no dots
+        for key in {name.split(".", 1)[0] for name in os.listdir(self.store_dir)} - keep:
+            for name in (f"{key}.txt", f"{key}.idx", f"{key}.idx.tmp"):
+                try:
+                    os.remove(os.path.join(self.store_dir, name))
+                except FileNotFoundError:
+                    pass
+            logger.info(f"Removed stored text of book {key}, which is no longer cached")
+
+    def _lock(self, key: str) -> asyncio.Lock:
+        if key not in self._locks:
+            self._locks[key] = asyncio.Lock()
+        return self._locks[key]
+
+    async def _get_book(self, key: str, pdf_path: str) -> BookPages:
+        book = self._books.get(key)
+        if book is not None:
+            return book
+
+        async with self._lock(key):
+            if key in self._books:
+                return self._books[key]
+            self.prepare()
+            book = BookPages(self.store_dir, key)
+            if book.exists():
+                await asyncio.to_thread(book.load)
+            else:
+                page_count = await asyncio.to_thread(lambda: len(PdfReader(pdf_path).pages))
+                await asyncio.to_thread(book.create, page_count)
+            self._books[key] = book
+            return book
+
+    async def _extract_missing(self, book: BookPages, key: str, pdf_path: str, pages: List[int]) -> None:
+        async with self._lock(key):
+            # Another job may have filled some of these pages while we waited for the lock
+            pages = book.missing(pages)
+            if not pages:
+                return
+            texts = await extract_pages_parallel(pdf_path, pages)
+            await asyncio.to_thread(book.write, texts)
+        logger.info(f"Stored text of {len(pages)} pages for book {key}")
+
+    async def get_page_count(self, key: str, pdf_path: str) -> int:
+        return (await self._get_book(key, pdf_path)).page_count
+
+    async def get_pages(self, key: str, pdf_path: str, start_page: int, end_page: int) -> List[str]:
+        """Return the text of pages `start_page..end_page` (1-based, inclusive), extracting only unseen pages."""
+        book = await self._get_book(key, pdf_path)
+        pages = range(start_page - 1, end_page)
+
+        missing = book.missing(pages)
+        if missing:
+            await self._extract_missing(book, key, pdf_path, missing)
+
+        return await asyncio.to_thread(book.read, pages)
+
+    def is_complete(self, key: str) -> bool:
+        book = self._books.get(key)
+        return book is not None and not book.missing(range(book.page_count))
+
+    async def preextract(self, key: str, pdf_path: str) -> None:
+        """Extract every page of the book in small chunks so that concurrent requests can interleave."""
+        book = await self._get_book(key, pdf_path)
+        missing = book.missing(range(book.page_count))
+        for i in range(0, len(missing), self.preextract_chunk_size):
+            await self._extract_missing(book, key, pdf_path, missing[i:i + self.preextract_chunk_size])
+        logger.info(f"Pre-extraction of book {key} completed")
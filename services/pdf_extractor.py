@@ -0,0 +1,115 @@
+import asyncio
+import io
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import BinaryIO, Dict, List, Optional, Union
+
+from PyPDF2 import PdfReader
+
+from core.config import settings
+from core.metrics import stage_duration
+
+logger = logging.getLogger(__name__)
+
+PdfSource = Union[str, bytes, BinaryIO]
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def _open_reader(source: PdfSource) -> PdfReader:
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    return PdfReader(source)
+
+
+def get_page_count(source: PdfSource) -> int:
+    return len(_open_reader(source).pages)
+
+
+def extract_pages(source: PdfSource, pages: List[int]) -> Dict[int, str]:
+    reader = _open_reader(source)
+    return {page: reader.pages[page].extract_text() for page in pages}
+
+
+def get_worker_count() -> int:
+    return settings.pdf_extraction_workers or os.cpu_count() or 1
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        workers = get_worker_count()
+        logger.info(f"Starting PDF extraction pool with {workers} workers")
+        _executor = ProcessPoolExecutor(max_workers=workers)
+    return _executor
+
+
+async def warm_executor() -> None:
+    """Start the pool's worker processes now, so the first job does not wait for them."""
+    executor = get_executor()
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(executor, os.getpid) for _ in range(get_worker_count())))
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _replace_broken_executor(executor: ProcessPoolExecutor) -> None:
+    # Jobs that hit the same broken pool concurrently replace it only once
+    global _executor
+    if _executor is executor:
+        logger.warning("PDF extraction pool is broken, a worker process died; starting a new pool")
+        shutdown_executor()
+
+
+def split_into_chunks(pages: List[int], workers: int, min_chunk_size: int) -> List[List[int]]:
+    chunk_size = max(min_chunk_size, math.ceil(len(pages) / workers))
+    return [pages[i:i + chunk_size] for i in range(0, len(pages), chunk_size)]
+
+
+async def extract_pages_parallel(source: PdfSource, pages: List[int]) -> Dict[int, str]:
+    with stage_duration.time(stage="pdf_extraction"):
+        return await _extract_pages_parallel(source, pages)
+
+
+async def _extract_pages_parallel(source: PdfSource, pages: List[int]) -> Dict[int, str]:
+    """
+    Extract `pages` (0-based) from the PDF, spreading chunks of pages over the process pool.
+
+    Small requests are extracted in a thread of this process, where the pool round trip
+    (pickling, re-opening the PDF in the worker) would cost more than it saves. In-memory
+    sources are read by the thread as they are; the pool gets their bytes.
+    """
+    if len(pages) < settings.pdf_parallel_min_pages:
+        return await asyncio.to_thread(extract_pages, source, pages)
+
+    if not isinstance(source, (str, bytes)):
+        source.seek(0)
+        source = await asyncio.to_thread(source.read)
+
+    loop = asyncio.get_running_loop()
+    chunks = split_into_chunks(pages, get_worker_count(), settings.pdf_parallel_min_pages // 2 or 1)
+    # A worker process killed by a crash or the OOM killer breaks the whole pool: replace it and retry once
+    for attempt in range(2):
+        executor = get_executor()
+        try:
+            results = await asyncio.gather(
+                *(loop.run_in_executor(executor, extract_pages, source, chunk) for chunk in chunks)
+            )
+            break
+        except BrokenProcessPool:
+            _replace_broken_executor(executor)
+            if attempt:
+                raise
+
+    texts = {}
+    for result in results:
+        texts.update(result)
+    return texts
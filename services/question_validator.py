@@ -0,0 +1,145 @@
+import logging
+import re
+from typing import Any, Dict, List, Optional, Union
+
+from pydantic import ValidationError
+
+from models.schemas import Question
+from utils import get_json_from_response
+
+logger = logging.getLogger(__name__)
+
+# A hyphen at a line break in the extracted PDF text: a word split in two, or a hyphenated word
+# (кто-то, по-моему) broken at its own hyphen. Both forms of the word have to match a quote.
+LINE_BREAK_HYPHEN = re.compile(r"(\w)-[ \t]*\n\s*(\w)")
+LINE_BREAK = "\ue000"
+NON_WORD = re.compile(r"[\W_]+")
+NON_WORD_OR_BREAK = re.compile(r"[^\w\ue000]+|_+")
+ELLIPSIS = re.compile(r"\.\.\.|…")
+
+
+class InvalidQuestion(ValueError):
+    def __init__(self, message: str, question: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        # Set when the question matches the format and only its quote was not found in the text
+        self.question = question
+
+
+def normalize_text(text: str, keep_line_breaks: bool = False) -> str:
+    """
+    Case, punctuation, quote marks, dashes and whitespace are ignored when matching quotes. With
+    `keep_line_breaks`, hyphens at line breaks become LINE_BREAK, otherwise the word is joined.
+    """
+    if keep_line_breaks:
+        text = LINE_BREAK_HYPHEN.sub(rf"\1{LINE_BREAK}\2", text)
+        return " ".join(NON_WORD_OR_BREAK.sub(" ", text.casefold()).split())
+    text = LINE_BREAK_HYPHEN.sub(r"\1\2", text)
+    return " ".join(NON_WORD.sub(" ", text.casefold()).split())
+
+
+def _fragment_pattern(fragment: str) -> re.Pattern:
+    """Whole words of `fragment`; a LINE_BREAK in the text matches both the joined and the hyphenated word."""
+    words = [f"{LINE_BREAK}?".join(re.escape(char) for char in word) for word in fragment.split()]
+    boundary = f"[^ {LINE_BREAK}]"
+    return re.compile(f"(?<!{boundary})" + f"[ {LINE_BREAK}]".join(words) + f"(?!{boundary})")
+
+
+def quote_in_text(quote: str, text: str) -> bool:
+    """True if every fragment of `quote` (fragments are separated by an ellipsis) occurs in `text`, in order."""
+    fragments = [normalize_text(fragment) for fragment in ELLIPSIS.split(quote)]
+    fragments = [fragment for fragment in fragments if fragment]
+    if not fragments:
+        return False
+
+    # Most quotes match the text with the words at line breaks joined, which is a plain substring search
+    haystack = f" {normalize_text(text)} "
+    position = 0
+    for fragment in fragments:
+        found = haystack.find(f" {fragment} ", position)
+        if found == -1:
+            break
+        position = found + len(fragment) + 1
+    else:
+        return True
+
+    haystack = normalize_text(text, keep_line_breaks=True)
+    position = 0
+    for fragment in fragments:
+        found = _fragment_pattern(fragment).search(haystack, position)
+        if found is None:
+            return False
+        position = found.end()
+    return True
+
+
+def describe_validation_error(error: ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(location) for location in detail['loc']) or 'question'}: {detail['msg']}"
+        for detail in error.errors()
+    )
+
+
+def validate_question(data: Any, part: Optional[str]) -> Dict[str, Any]:
+    """
+    The question in FORMAT if `data` is a valid question for the text `part`, otherwise InvalidQuestion.
+    Without a `part` the quote is not checked.
+    """
+    try:
+        question = Question.model_validate(data)
+    except ValidationError as e:
+        raise InvalidQuestion(f"Question does not match the format: {describe_validation_error(e)}")
+
+    if part is not None and not quote_in_text(question.quote, part):
+        raise InvalidQuestion(f"Quote is not found in the excerpt: {question.quote[:100]!r}", question.model_dump())
+
+    return question.model_dump()
+
+
+def parse_question(text: str, part: Optional[str]) -> Dict[str, Any]:
+    try:
+        data = get_json_from_response(text)
+    except ValueError as e:
+        raise InvalidQuestion(str(e))
+    return validate_question(data, part)
+
+
+def keep_fallback(
+        index: int,
+        error: Union[InvalidQuestion, str],
+        fallback: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """
+    The question kept for part `index` once it may not be regenerated: the last answer that matched
+    the format, even though its quote was not found, or None to leave the part out of the test.
+    """
+    if fallback is not None:
+        logger.warning(f"Keeping question {index} with an unverified quote: {error}")
+        return fallback
+    logger.error(f"Leaving out question {index}, still invalid: {error}")
+    return None
+
+
+def check_question_count(questions: List[Dict[str, Any]], count: int) -> List[Dict[str, Any]]:
+    """A test is published with the questions that could be generated; it fails only without any."""
+    if not questions:
+        raise InvalidQuestion(f"Failed to generate any valid question for {count} parts")
+    if len(questions) < count:
+        logger.warning(f"Generated {len(questions)} of {count} questions, the others stayed invalid")
+    return questions
+
+
+def describe_failures(failures: Dict[int, str]) -> List[str]:
+    return [f"part {index}: {error}" for index, error in sorted(failures.items())]
+
+
+class RetryBudget:
+    """Regenerations left for one test, shared by all of its parts."""
+
+    def __init__(self, retries: int):
+        self.remaining = retries
+
+    def take(self) -> bool:
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        return True
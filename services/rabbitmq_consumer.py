@@ -1,18 +1,31 @@
 import asyncio
-import json
 import logging
-from typing import Callable, Optional
+import time
+from typing import Any, Callable, Optional, Set
 
 import aio_pika
 from aio_pika.abc import AbstractIncomingMessage
 
 from core.config import settings
+from core.lazy import Lazy
+from core.metrics import consumer_in_flight, consumer_queue_wait, errors
+from services.job_scheduler import FairSlots, estimate_job_size, job_priority, priority_weight
+from services.message_codec import LazyPreview, message_codec
 
 logger = logging.getLogger(__name__)
 
+DEADLINE_HEADER = "x-deadline"
+
 
 class RabbitMQConsumer:
-    def __init__(self):
+    def __init__(self, queue_name: Optional[str] = None, routing_key: Optional[str] = None, exclusive: bool = False):
+        """
+        An `exclusive` consumer gets its own server-named queue that is deleted with the connection,
+        so every instance of the service receives its own copy of the messages for `routing_key`.
+        """
+        self.exclusive = exclusive
+        self.queue_name = "" if exclusive else queue_name or settings.rabbitmq_request_queue
+        self.routing_key = routing_key or settings.rabbitmq_routing_key
         self.connection: Optional[aio_pika.Connection] = None
         self.channel: Optional[aio_pika.Channel] = None
         self.queue: Optional[aio_pika.Queue] = None
@@ -20,7 +33,11 @@ class RabbitMQConsumer:
         self.callback = None
         self._connection_lock = asyncio.Lock()
         self._consuming = False
+        self._accepting = False
         self._connect_task = None
+        self._consumer_tag: Optional[str] = None
+        self._worker_slots = FairSlots(settings.consumer_max_in_flight, enabled=settings.fair_scheduling)
+        self._in_flight: Set[asyncio.Task] = set()
 
     async def connect(self) -> None:
         async with self._connection_lock:
@@ -32,6 +49,7 @@ class RabbitMQConsumer:
                 self.connection = await aio_pika.connect_robust(settings.rabbitmq_url)
 
                 self.channel = await self.connection.channel()
+                await self.channel.set_qos(prefetch_count=settings.rabbitmq_prefetch_count)
 
                 self.exchange = await self.channel.declare_exchange(
                     settings.rabbitmq_exchange,
@@ -39,14 +57,19 @@ class RabbitMQConsumer:
                     durable=True
                 )
 
-                self.queue = await self.channel.declare_queue(
-                    settings.rabbitmq_request_queue,
-                    durable=True
-                )
+                if self.exclusive:
+                    self.queue = await self.channel.declare_queue(exclusive=True, auto_delete=True)
+                else:
+                    arguments = {"x-max-priority": settings.rabbitmq_max_priority} if settings.rabbitmq_max_priority else None
+                    self.queue = await self.channel.declare_queue(
+                        self.queue_name,
+                        durable=True,
+                        arguments=arguments
+                    )
 
                 await self.queue.bind(
                     self.exchange,
-                    routing_key=settings.rabbitmq_routing_key
+                    routing_key=self.routing_key
                 )
 
                 logger.info("Successfully connected to RabbitMQ")
@@ -77,23 +100,66 @@ class RabbitMQConsumer:
                 self.exchange = None
 
     async def process_message(self, message: AbstractIncomingMessage) -> None:
-        async with message.process():
-            try:
-                body = message.body.decode()
-                logger.info(f"Received message: {body}")
-
-                try:
-                    payload = json.loads(body)
-                except json.JSONDecodeError:
-                    payload = body
+        if not self._accepting:
+            await message.nack(requeue=True)
+            return
 
-                if self.callback:
-                    await self.callback(payload)
-                else:
-                    logger.info(f"Processing message: {payload}")
-            except Exception as e:
-                logger.error(f"Error processing message: {e}")
-                raise
+        task = asyncio.current_task()
+        self._in_flight.add(task)
+        consumer_in_flight.inc(queue=self.queue_name)
+        delivered_at = time.perf_counter()
+        try:
+            payload = self.decode_message(message)
+            # Deliveries beyond the worker pool wait here, unacked, up to the prefetch count, and get
+            # the next free worker by priority and size rather than in delivery order
+            async with self._worker_slots.slot(estimate_job_size(payload), priority_weight(job_priority(payload))):
+                consumer_queue_wait.observe(time.perf_counter() - delivered_at)
+                if not self._accepting:
+                    # Shutdown started while this delivery waited for a worker
+                    await message.nack(requeue=True)
+                    return
+                await self.handle_message(payload)
+            await message.ack()
+        except asyncio.CancelledError:
+            logger.warning("Message processing interrupted, returning message to the queue")
+            await message.nack(requeue=True)
+            raise
+        except Exception as e:
+            errors.inc(source="consumer")
+            logger.error(f"Error processing message: {e}")
+            await message.reject(requeue=False)
+        finally:
+            self._in_flight.discard(task)
+            consumer_in_flight.dec(queue=self.queue_name)
+
+    @staticmethod
+    def decode_message(message: AbstractIncomingMessage) -> Any:
+        body = message_codec.decompress(message.body, message.content_encoding)
+        try:
+            payload = message_codec.loads(body)
+        except ValueError:
+            payload = body.decode()
+
+        # The only log line of every delivery, formatted only when INFO is enabled
+        logger.info("Received message (%d bytes): %s", len(message.body), LazyPreview(payload))
+
+        if isinstance(payload, dict):
+            deadline = (message.headers or {}).get(DEADLINE_HEADER)
+            if deadline is not None:
+                payload.setdefault("deadline", deadline)
+            if message.priority:
+                payload.setdefault("priority", message.priority)
+        return payload
+
+    async def handle_message(self, payload: Any) -> None:
+        if self.callback:
+            await self.callback(payload)
+        else:
+            logger.info(f"Processing message: {payload}")
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
 
     async def start_consuming(self, callback: Optional[Callable] = None) -> None:
         if callback:
@@ -103,12 +169,13 @@ class RabbitMQConsumer:
             return
 
         self._consuming = True
+        self._accepting = True
 
         async def connect_and_consume():
             while self._consuming:
                 try:
                     await self.connect()
-                    consumer_tag = await self.queue.consume(self.process_message)
+                    self._consumer_tag = await self.queue.consume(self.process_message)
 
                     while self._consuming and self.connection and not self.connection.is_closed:
                         await asyncio.sleep(1)
@@ -125,7 +192,30 @@ class RabbitMQConsumer:
 
     async def stop_consuming(self) -> None:
         logger.info("Stopping RabbitMQ consumer")
+        self._accepting = False
+
+        if self._consumer_tag and self.queue and self.connection and not self.connection.is_closed:
+            try:
+                await self.queue.cancel(self._consumer_tag)
+            except Exception as e:
+                logger.warning(f"Failed to cancel RabbitMQ consumer: {e}")
+        self._consumer_tag = None
+
+        await self.drain()
         await self.disconnect()
 
+    async def drain(self) -> None:
+        """Wait for in-flight jobs up to the drain timeout, then return the rest to the queue."""
+        if not self._in_flight:
+            return
+
+        logger.info(f"Waiting for {len(self._in_flight)} in-flight messages")
+        _, pending = await asyncio.wait(set(self._in_flight), timeout=settings.consumer_drain_timeout)
+        if pending:
+            logger.warning(f"Requeueing {len(pending)} messages still in flight after the drain timeout")
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
 
-rabbitmq_consumer = RabbitMQConsumer()
\ No newline at end of file
+rabbitmq_consumer = Lazy(RabbitMQConsumer)
\ No newline at end of file
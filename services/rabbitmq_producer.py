@@ -1,6 +1,6 @@
 import asyncio
 import logging
-from typing import Optional
+from typing import List, Optional, Tuple, Union
 
 import aio_pika
 from aio_pika.abc import AbstractChannel, AbstractConnection, AbstractExchange
@@ -10,12 +10,33 @@ from core.config import settings
 logger = logging.getLogger(__name__)
 
 
+class PendingMessage:
+    def __init__(self, exchange_name: str, routing_key: str, message: aio_pika.Message, exchange_type: str):
+        self.exchange_name = exchange_name
+        self.routing_key = routing_key
+        self.message = message
+        self.exchange_type = exchange_type
+        self.confirmed = asyncio.get_running_loop().create_future()
+
+
 class RabbitMQProducer:
+    """
+    Publishes messages through a pool of channels in publisher confirm mode.
+
+    `send_message` puts the message into a bounded buffer and returns once the broker confirmed it.
+    Each channel takes a batch of buffered messages, publishes them without waiting for one another and
+    then waits for all their confirms, so confirms are pipelined instead of one round trip per message.
+    Messages that fail to publish stay buffered and are retried, which absorbs short broker outages.
+    """
+
     def __init__(self):
         self.connection: Optional[AbstractConnection] = None
         self.channel: Optional[AbstractChannel] = None
-        self.exchanges: dict[str, AbstractExchange] = {}
+        self.channels: List[AbstractChannel] = []
+        self.exchanges: dict[Tuple[int, str], AbstractExchange] = {}
         self._connection_lock = asyncio.Lock()
+        self._buffer: Optional[asyncio.Queue] = None
+        self._publishers: List[asyncio.Task] = []
 
     async def connect(self) -> None:
         async with self._connection_lock:
@@ -25,7 +46,12 @@ class RabbitMQProducer:
             logger.info(f"Connecting to RabbitMQ: {settings.rabbitmq_url}")
             try:
                 self.connection = await aio_pika.connect_robust(settings.rabbitmq_url)
-                self.channel = await self.connection.channel()
+                self.channels = [
+                    await self.connection.channel(publisher_confirms=True)
+                    for _ in range(max(1, settings.rabbitmq_publisher_channels))
+                ]
+                self.channel = self.channels[0]
+                self.exchanges = {}
                 logger.info("Successfully connected to RabbitMQ")
             except Exception as e:
                 logger.error(f"Failed to connect to RabbitMQ: {e}")
@@ -34,56 +60,141 @@ class RabbitMQProducer:
                 self.connection = None
                 raise
 
-    async def get_exchange(self, exchange_name: str, exchange_type: str = "direct") -> AbstractExchange:
+            if self._buffer is None:
+                self._buffer = asyncio.Queue(maxsize=settings.rabbitmq_publish_buffer_size)
+            if not self._publishers:
+                self._publishers = [
+                    asyncio.create_task(self._publish_loop(index)) for index in range(len(self.channels))
+                ]
+
+    async def get_exchange(
+            self,
+            exchange_name: str,
+            exchange_type: str = "direct",
+            channel_index: int = 0
+    ) -> AbstractExchange:
+        channel = self.channels[channel_index]
         if not exchange_name:
-            return self.channel.default_exchange
+            return channel.default_exchange
 
-        if exchange_name not in self.exchanges:
-            exchange = await self.channel.declare_exchange(
+        key = (channel_index, exchange_name)
+        if key not in self.exchanges:
+            exchange = await channel.declare_exchange(
                 exchange_name,
                 type=exchange_type,
                 durable=True
             )
-            self.exchanges[exchange_name] = exchange
+            self.exchanges[key] = exchange
 
-        return self.exchanges[exchange_name]
+        return self.exchanges[key]
 
     async def send_message(
             self,
             exchange_name: str,
             routing_key: str,
-            message: str,
-            exchange_type: str = "direct"
+            message: Union[str, bytes],
+            exchange_type: str = "direct",
+            content_type: Optional[str] = None,
+            content_encoding: Optional[str] = None
     ) -> None:
         if not self.connection or self.connection.is_closed:
             await self.connect()
 
-        if not exchange_name:
-            await self.channel.default_exchange.publish(
-                aio_pika.Message(
-                    body=message.encode(),
-                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT
-                ),
-                routing_key=routing_key
-            )
-        else:
-            exchange = await self.get_exchange(exchange_name, exchange_type)
-
-            await exchange.publish(
-                aio_pika.Message(
-                    body=message.encode(),
-                    delivery_mode=aio_pika.DeliveryMode.PERSISTENT
-                ),
-                routing_key=routing_key
-            )
+        pending = PendingMessage(
+            exchange_name,
+            routing_key,
+            aio_pika.Message(
+                body=message.encode() if isinstance(message, str) else message,
+                content_type=content_type,
+                content_encoding=content_encoding,
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT
+            ),
+            exchange_type
+        )
+        # Blocks while the buffer is full, pushing back on the jobs producing responses
+        await self._buffer.put(pending)
+        await pending.confirmed
 
         logger.info(f"Response sent: exchange={exchange_name}, routing_key={routing_key}")
 
+    async def _next_batch(self) -> List[PendingMessage]:
+        batch = [await self._buffer.get()]
+        while len(batch) < settings.rabbitmq_publish_batch_size and not self._buffer.empty():
+            batch.append(self._buffer.get_nowait())
+        return batch
+
+    async def _publish_all(self, channel_index: int, batch: List[PendingMessage]) -> List[tuple]:
+        async def publish(pending: PendingMessage):
+            exchange = await self.get_exchange(pending.exchange_name, pending.exchange_type, channel_index)
+            await exchange.publish(pending.message, routing_key=pending.routing_key)
+
+        results = await asyncio.gather(*(publish(pending) for pending in batch), return_exceptions=True)
+        failed = []
+        for pending, result in zip(batch, results):
+            if isinstance(result, BaseException):
+                failed.append((pending, result))
+            elif not pending.confirmed.done():
+                pending.confirmed.set_result(None)
+        return failed
+
+    async def _publish_batch(self, channel_index: int, batch: List[PendingMessage]) -> None:
+        failed = await self._publish_all(channel_index, batch)
+
+        for attempt in range(1, settings.rabbitmq_publish_max_attempts):
+            if not failed:
+                return
+            logger.warning(f"Failed to publish {len(failed)} messages ({failed[0][1]}), retry {attempt}")
+            await asyncio.sleep(min(0.1 * 2 ** attempt, 5))
+            try:
+                await self.connect()
+            except Exception:
+                continue
+            failed = await self._publish_all(channel_index, [pending for pending, _ in failed])
+
+        for pending, error in failed:
+            if not pending.confirmed.done():
+                pending.confirmed.set_exception(error)
+
+    async def _publish_loop(self, channel_index: int) -> None:
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._publish_batch(channel_index, batch)
+            except asyncio.CancelledError:
+                for pending in batch:
+                    if not pending.confirmed.done():
+                        pending.confirmed.cancel()
+                raise
+            except Exception as e:
+                logger.error(f"Unexpected error while publishing: {e}")
+                for pending in batch:
+                    if not pending.confirmed.done():
+                        pending.confirmed.set_exception(e)
+            finally:
+                for _ in batch:
+                    self._buffer.task_done()
+
     async def close(self) -> None:
+        if self._buffer is not None and self._publishers:
+            try:
+                await asyncio.wait_for(self._buffer.join(), timeout=settings.consumer_drain_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Closing RabbitMQ producer with {self._buffer.qsize()} unpublished messages")
+
+        for task in self._publishers:
+            task.cancel()
+        await asyncio.gather(*self._publishers, return_exceptions=True)
+        self._publishers = []
+
+        while self._buffer is not None and not self._buffer.empty():
+            self._buffer.get_nowait().confirmed.cancel()
+            self._buffer.task_done()
+
         async with self._connection_lock:
             if self.connection and not self.connection.is_closed:
                 logger.info("Closing connection to RabbitMQ")
                 await self.connection.close()
                 self.connection = None
                 self.channel = None
+                self.channels = []
                 self.exchanges = {}
@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import anthropic
+
+from core.config import settings
+from core.lazy import Lazy
+from core.metrics import Gauge, claude_requests, registry, stage_duration
+from services.job_scheduler import FairQueue, current_flow
+
+logger = logging.getLogger(__name__)
+
+TRANSIENT_ERRORS = (
+    anthropic.RateLimitError,
+    anthropic.InternalServerError,
+    anthropic.APIConnectionError,
+    anthropic.APITimeoutError,
+)
+
+
+class TokenBucket:
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.tokens = float(rate_per_minute)
+        self.refill_per_second = rate_per_minute / 60.0
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_second)
+        self.updated_at = now
+
+    def try_take(self, amount: float) -> float:
+        """Take `amount` tokens if available and return 0, otherwise return the seconds to wait."""
+        self._refill()
+        # A single request may need more than the whole bucket; let it through once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            self.tokens -= amount
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def give_back(self, amount: float) -> None:
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class AdaptiveRateLimiter:
+    """
+    Shared scheduler in front of the Claude API.
+
+    Calls are admitted through a request bucket, an output-token bucket and an AIMD concurrency
+    window: the window is halved on 429/529 or retry-after and grows by ~1 per window of successes.
+    Waiting calls are admitted in weighted fair queuing order of their jobs' flows, so a job with
+    many calls queued does not hold up the calls of the jobs that arrive after it.
+    """
+
+    def __init__(
+            self,
+            requests_per_minute: float,
+            output_tokens_per_minute: float,
+            max_concurrency: int,
+            min_concurrency: int = 1,
+            max_retries: int = 5,
+            base_backoff: float = 0.5,
+            max_backoff: float = 30.0,
+            fair: bool = True,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.output_tokens = TokenBucket(output_tokens_per_minute)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.throttled_count = 0
+        self.retry_count = 0
+        self._paused_until = 0.0
+        self._condition = asyncio.Condition()
+        self._queue = FairQueue(fair)
+
+    async def _acquire(self, max_tokens: int) -> None:
+        self.waiting += 1
+        try:
+            async with self._condition:
+                entry = self._queue.push(current_flow.get())
+                try:
+                    while True:
+                        pause = self._paused_until - time.monotonic()
+                        if pause <= 0 and self.in_flight < int(self.concurrency_limit) and self._queue.is_head(entry):
+                            wait = self.requests.try_take(1)
+                            if wait == 0:
+                                wait = self.output_tokens.try_take(max_tokens)
+                                if wait == 0:
+                                    self._queue.remove(entry, dispatched=True)
+                                    self.in_flight += 1
+                                    return
+                                self.requests.give_back(1)
+                            pause = wait
+                        try:
+                            await asyncio.wait_for(self._condition.wait(), timeout=pause if pause > 0 else None)
+                        except asyncio.TimeoutError:
+                            pass
+                finally:
+                    # Wake the call that is next in line now
+                    self._queue.remove(entry)
+                    self._condition.notify_all()
+        finally:
+            self.waiting -= 1
+
+    async def _release(self, unused_tokens: int = 0) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            if unused_tokens > 0:
+                self.output_tokens.give_back(unused_tokens)
+            self._condition.notify_all()
+
+    def _on_success(self) -> None:
+        if self.concurrency_limit < self.max_concurrency:
+            self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+
+    def _on_throttle(self, retry_after: Optional[float]) -> None:
+        self.throttled_count += 1
+        claude_requests.inc(status="throttled")
+        self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+        if retry_after:
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+        logger.warning(
+            f"Claude API throttled, concurrency limit lowered to {int(self.concurrency_limit)}"
+            + (f", pausing for {retry_after:.1f}s" if retry_after else "")
+        )
+
+    def _backoff(self, attempt: int) -> float:
+        # Full jitter: spread retries of many jobs over the whole backoff window
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * 2 ** attempt))
+
+    async def run(self, call: Callable[[], Awaitable[Any]], max_tokens: int) -> Any:
+        """
+        Timed as separate stages: claude_wait for the time in the limiter queue and in retry backoff,
+        claude_call for each call to the API itself.
+        """
+        attempt = 0
+        while True:
+            with stage_duration.time(stage="claude_wait"):
+                await self._acquire(max_tokens)
+            unused_tokens = max_tokens
+            try:
+                with stage_duration.time(stage="claude_call"):
+                    response = await call()
+                usage = getattr(response, "usage", None)
+                if usage is not None:
+                    unused_tokens = max(0, max_tokens - usage.output_tokens)
+                self._on_success()
+                return response
+            except TRANSIENT_ERRORS as e:
+                retry_after = _get_retry_after(e)
+                status_code = getattr(e, "status_code", None)
+                if status_code in (429, 529) or retry_after:
+                    self._on_throttle(retry_after)
+
+                if attempt >= self.max_retries:
+                    logger.error(f"Claude API call failed after {attempt + 1} attempts: {e}")
+                    raise
+                delay = max(retry_after or 0, self._backoff(attempt))
+                attempt += 1
+                self.retry_count += 1
+                logger.warning(f"Transient Claude API error ({e}), retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            finally:
+                await self._release(unused_tokens)
+
+            with stage_duration.time(stage="claude_wait"):
+                await asyncio.sleep(delay)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "concurrency_limit": int(self.concurrency_limit),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "queue_length": self.waiting,
+            "requests_per_minute": self.requests.capacity,
+            "output_tokens_per_minute": self.output_tokens.capacity,
+            "throttled": self.throttled_count,
+            "retries": self.retry_count,
+        }
+
+
+def _get_retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+claude_rate_limiter = Lazy(lambda: AdaptiveRateLimiter(
+    requests_per_minute=settings.llm_requests_per_minute,
+    output_tokens_per_minute=settings.llm_output_tokens_per_minute,
+    max_concurrency=settings.llm_max_concurrency,
+    max_retries=settings.llm_max_retries,
+    fair=settings.fair_scheduling,
+))
+
+registry.register(Gauge(
+    "reader_llm_concurrency_limit",
+    "Current adaptive concurrency limit for Claude calls",
+    function=lambda: int(claude_rate_limiter.concurrency_limit)
+))
+registry.register(Gauge(
+    "reader_llm_in_flight",
+    "Claude calls in flight",
+    function=lambda: claude_rate_limiter.in_flight
+))
+registry.register(Gauge(
+    "reader_llm_queue_length",
+    "Claude calls waiting for the rate limiter",
+    function=lambda: claude_rate_limiter.waiting
+))
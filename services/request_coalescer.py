@@ -0,0 +1,63 @@
+import asyncio
+import copy
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RequestCoalescer:
+    """
+    Singleflight for identical requests.
+
+    Concurrent calls with the same key share one execution of `factory`; with a positive `ttl` the
+    result of a finished execution is also reused for that many seconds. Every caller gets its own
+    copy of the result. The shared execution is cancelled only when every caller waiting on it is.
+    """
+
+    def __init__(self, ttl: float = 0):
+        self.ttl = ttl
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self._waiters: Dict[Hashable, int] = {}
+        self._results: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def _on_done(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if self.ttl > 0 and not task.cancelled() and task.exception() is None:
+            self._results[key] = (time.monotonic() + self.ttl, task.result())
+
+    def _cached(self, key: Hashable):
+        now = time.monotonic()
+        for expired in [k for k, (expires_at, _) in self._results.items() if expires_at <= now]:
+            del self._results[expired]
+        return self._results.get(key)
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        cached = self._cached(key)
+        if cached is not None:
+            logger.info(f"Reusing recent result for identical request {key}")
+            return copy.deepcopy(cached[1])
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._on_done(key, done))
+        else:
+            logger.info(f"Joining in-flight execution of identical request {key}")
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._waiters[key] == 1 and not task.done():
+                task.cancel()
+            raise
+        finally:
+            self._waiters[key] -= 1
+            if not self._waiters[key]:
+                del self._waiters[key]
+
+        return copy.deepcopy(result)
@@ -0,0 +1,78 @@
+import logging
+from typing import Any, Dict, Optional, Union
+
+from pydantic import BaseModel
+
+from core.config import settings
+from core.lazy import Lazy
+from core.metrics import errors, stage_duration
+from services.message_codec import CONTENT_TYPE, message_codec
+from services.rabbitmq_producer import RabbitMQProducer
+
+logger = logging.getLogger(__name__)
+
+rabbitmq_producer = Lazy(RabbitMQProducer)
+
+
+async def send_response(response: Union[Dict[str, Any], BaseModel]) -> bool:
+    """True once the broker has confirmed the message; a failure is logged and counted, not raised."""
+    file_name = response.fileName if isinstance(response, BaseModel) else response['fileName']
+    try:
+        logger.info(f"Sending results for book {file_name}")
+
+        with stage_duration.time(stage="publish"):
+            body, content_encoding = message_codec.encode(response)
+            await rabbitmq_producer.send_message(
+                exchange_name='',
+                routing_key=settings.rabbitmq_response_queue,
+                message=body,
+                content_type=CONTENT_TYPE,
+                content_encoding=content_encoding
+            )
+
+        logger.info(f"Results for book {file_name} sent successfully")
+        return True
+
+    except Exception as e:
+        errors.inc(source="publish")
+        logger.error(f"Failed to send results: {e}")
+        return False
+
+
+async def send_error_response(file_name: str, error_message: str, test_id: Optional[str] = None) -> bool:
+    response = {
+        "fileName": file_name,
+        "error": error_message,
+        "questions": []
+    }
+    if test_id is not None:
+        response["testId"] = test_id
+    return await send_response(response)
+
+
+async def send_question_response(
+        file_name: str,
+        test_id: str,
+        index: int,
+        total: int,
+        question: Dict[str, Any]
+) -> bool:
+    """Streaming mode: one message per question, as soon as it is generated."""
+    return await send_response({
+        "type": "question",
+        "fileName": file_name,
+        "testId": test_id,
+        "index": index,
+        "total": total,
+        "question": question,
+    })
+
+
+async def send_completion_response(file_name: str, test_id: str, total: int) -> bool:
+    """Streaming mode: sent after the last question of the test."""
+    return await send_response({
+        "type": "completed",
+        "fileName": file_name,
+        "testId": test_id,
+        "total": total,
+    })
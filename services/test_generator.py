@@ -1,31 +1,98 @@
+import asyncio
 import json
 import logging
 import os
-from typing import Dict, List, Any, Union
+import itertools
+import time
+from typing import Any, Awaitable, BinaryIO, Callable, Dict, List, Optional, Set, Tuple, Union
 
-from PyPDF2 import PdfReader
-from minio import Minio
 from minio.error import S3Error
+from pydantic import ValidationError
 
 from core.config import settings
-from services.claude_service import claude_generate_answer
-from services.rabbitmq_producer import RabbitMQProducer
-from utils import split_text_into_parts, get_json_from_response
-from utils.prompt_utils import get_prompt
+from core.lazy import Lazy
+from core.metrics import errors, job_duration, stage_duration
+from models.schemas import TestGenerationMessage, TestGenerationResponse
+from services.book_cache import BookCache, CachedBook
+from services.bulk_generator import bulk_generator
+from services.checkpoint_store import CheckpointStore, hash_part
+from services.job_pipeline import DeadlineExceeded, JobPipeline, PipelineJob, Stage
+from services.job_scheduler import start_flow
+from services.minio_service import get_minio_client, get_object_buffer
+from services.page_store import PageTextStore
+from services.pdf_extractor import extract_pages_parallel, get_page_count
+from services.question_validator import (
+    InvalidQuestion,
+    RetryBudget,
+    check_question_count,
+    describe_failures,
+    describe_validation_error,
+    keep_fallback,
+    parse_question,
+    validate_question,
+)
+from services.request_coalescer import RequestCoalescer
+from services.claude_service import TokenUsage, claude_generate_answer_async
+from services.response_publisher import (
+    send_completion_response,
+    send_error_response,
+    send_question_response,
+    send_response,
+)
+from utils import gather_or_cancel, parse_deadline, split_text_into_parts, get_json_from_response
+from utils.prompt_utils import (
+    RETRY_PROMPT,
+    get_batch_content,
+    get_batch_system_blocks,
+    get_document_block,
+    get_document_part_content,
+    get_excerpt_content,
+    get_prompt,
+    get_system_blocks,
+    with_retry_feedback,
+)
 
 logger = logging.getLogger(__name__)
 
-minio_client = Minio(
-    settings.minio_endpoint,
-    access_key=settings.minio_access_key,
-    secret_key=settings.minio_secret_key,
-    secure=settings.minio_secure
-)
+page_store = Lazy(lambda: PageTextStore(os.path.join(settings.temp_dir, "page_store")))
+
+book_cache = Lazy(lambda: BookCache(
+    get_minio_client,
+    bucket=settings.minio_bucket,
+    cache_dir=os.path.join(settings.temp_dir, "book_cache"),
+    max_bytes=settings.book_cache_max_mb * 1024 * 1024,
+    on_evict=page_store.remove
+))
+
+checkpoint_store = Lazy(lambda: CheckpointStore(
+    os.path.join(settings.checkpoint_dir or os.path.join(settings.temp_dir, "checkpoints"), "checkpoints.sqlite3"),
+    ttl=settings.checkpoint_ttl
+))
+
+_preextraction_tasks: Dict[str, asyncio.Task] = {}
+
+request_coalescer = Lazy(lambda: RequestCoalescer(ttl=settings.dedupe_result_ttl))
+
+# Generation tasks by testId, for cancel requests
+_running_tests: Dict[str, Set[asyncio.Task]] = {}
+# Cancelled testIds and when to forget them, so a cancel that overtakes its request still applies
+_cancelled_tests: Dict[str, float] = {}
+CANCELLED_TESTS_TTL = 60 * 60
 
-rabbitmq_producer = RabbitMQProducer()
+QuestionCallback = Callable[[int, int, Dict[str, Any]], Awaitable[None]]
+
+
+class BookTextError(Exception):
+    pass
+
+
+class JobCancelled(Exception):
+    pass
 
 
 async def process_test_generation_request(request: Union[str, Dict[str, Any]]) -> None:
+    started = time.perf_counter()
+    status = "error"
     try:
         if isinstance(request, str):
             try:
@@ -36,121 +103,601 @@ async def process_test_generation_request(request: Union[str, Dict[str, Any]]) -
         else:
             request_data = request
 
-        file_name = request_data.get('fileName')
-        test_id = request_data.get('testId')
-        start_page = request_data.get('startPage')
-        end_page = request_data.get('endPage')
-        question_count = request_data.get('questionCount')
+        if request_data.get('type') == 'cancel':
+            cancel_test(request_data.get('testId'))
+            status = "control"
+            return
 
-        if not file_name or not test_id or not start_page or not end_page or not question_count:
-            logger.error("Missing required parameters in request")
+        try:
+            message = TestGenerationMessage.model_validate(request_data)
+        except ValidationError as e:
+            error = f"Invalid test generation request: {describe_validation_error(e)}"
+            logger.error(error)
+            file_name = request_data.get('fileName')
+            if file_name and isinstance(file_name, str):
+                await send_error_response(file_name, error, test_id=request_data.get('testId'))
             return
 
-        logger.info(f"Processing test generation request for book: {file_name}")
+        file_name = message.fileName
+        test_id = message.testId
+        start_page = message.startPage
+        end_page = message.endPage
+        question_count = message.questionCount
+        deadline = parse_deadline(message.deadline)
+        start_flow(request_data)
 
-        book_text = await get_book_text(file_name, start_page, end_page)
+        if is_cancelled(test_id):
+            raise JobCancelled(f"Test generation cancelled: {test_id}")
+        if deadline is not None and deadline <= time.time():
+            # Dead on arrival: the requester has given up while the message waited in the queue
+            raise DeadlineExceeded(f"Deadline exceeded before processing started: {test_id}")
+
+        logger.info(f"Processing test generation request for book: {file_name}")
 
-        if not book_text:
-            logger.error(f"Failed to get book's text: {file_name}")
-            await send_error_response(file_name, f"Failed to get book's text: {file_name}")
+        if message.mode == 'bulk':
+            book_text = await get_required_book_text(file_name, start_page, end_page)
+            parts = split_text_into_parts(book_text, question_count)
+            await bulk_generator.submit(test_id, file_name, parts)
+            status = "submitted"
             return
 
-        questions = generate_questions(book_text, question_count)
+        stream_response = settings.stream_responses if message.streamResponse is None else message.streamResponse
+        await run_cancellable(test_id, deadline, run_generation_request(
+            file_name, start_page, end_page, question_count, test_id, stream_response, deadline
+        ))
+        status = "success"
+
+    except BookTextError as e:
+        errors.inc(source="book_text")
+        logger.error(str(e))
+        await send_error_response(file_name, str(e), test_id=test_id)
+    except DeadlineExceeded as e:
+        status = "expired"
+        errors.inc(source="deadline")
+        logger.warning(str(e))
+        await send_error_response(file_name, str(e), test_id=test_id)
+    except JobCancelled as e:
+        status = "cancelled"
+        logger.info(str(e))
+        await send_error_response(file_name, str(e), test_id=test_id)
+    except Exception as e:
+        errors.inc(source="job")
+        logger.error(f"Failed to process test generation request: {e}")
+        if 'file_name' in locals() and file_name:
+            await send_error_response(
+                file_name,
+                f"Failed to process test generation request: {str(e)}",
+                test_id=locals().get('test_id')
+            )
+    finally:
+        job_duration.observe(time.perf_counter() - started, status=status)
+
+
+async def run_generation_request(
+        file_name: str,
+        start_page: int,
+        end_page: int,
+        question_count: int,
+        test_id: str,
+        stream_response: bool,
+        deadline: Optional[float]
+) -> None:
+    if stream_response:
+        async def on_question(index: int, total: int, question: Dict[str, Any]) -> None:
+            await send_question_response(file_name, test_id, index, total, question)
+
+        job = GenerationJob(
+            file_name, start_page, end_page, question_count, test_id,
+            on_question=on_question, publish=publish_completion, deadline=deadline
+        )
+        await test_pipeline.run(job)
+    elif settings.dedupe_enabled:
+        # The shared execution has no deadline of its own: it runs while any caller still waits for it
+        job = GenerationJob(
+            file_name, start_page, end_page, question_count, test_id, publish=publish_questions, deadline=deadline
+        )
+        job.questions = await generate_test_coalesced(file_name, start_page, end_page, question_count, test_id)
+        await test_pipeline.run(job, start_stage="publish")
+    else:
+        job = GenerationJob(
+            file_name, start_page, end_page, question_count, test_id, publish=publish_questions, deadline=deadline
+        )
+        await test_pipeline.run(job)
 
-        response = {
-            "fileName": file_name,
-            "testId": test_id,
-            "questions": questions,
-        }
 
-        await send_response(response)
+async def run_cancellable(test_id: str, deadline: Optional[float], work: Awaitable[Any]) -> Any:
+    """
+    Await `work` for test `test_id`, cancelling it (and its outstanding Claude calls) when the
+    deadline passes, raising DeadlineExceeded, or when the test is cancelled, raising JobCancelled.
+    """
+    task = asyncio.ensure_future(work)
+    _running_tests.setdefault(test_id, set()).add(task)
+    try:
+        timeout = None if deadline is None else max(0.0, deadline - time.time())
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+        if not done:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+            raise DeadlineExceeded(f"Deadline exceeded during processing: {test_id}")
+        if task.cancelled():
+            raise JobCancelled(f"Test generation cancelled: {test_id}")
+        return task.result()
+    except asyncio.CancelledError:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        raise
+    finally:
+        tasks = _running_tests.get(test_id)
+        if tasks is not None:
+            tasks.discard(task)
+            if not tasks:
+                del _running_tests[test_id]
+
+
+def cancel_test(test_id: Optional[str]) -> None:
+    """Cancel the running generation of `test_id`; requests for it that arrive later are dropped."""
+    if not test_id:
+        logger.error("Missing testId in cancel request")
+        return
+
+    now = time.monotonic()
+    for expired in [key for key, expires_at in _cancelled_tests.items() if expires_at <= now]:
+        del _cancelled_tests[expired]
+    _cancelled_tests[test_id] = now + CANCELLED_TESTS_TTL
+
+    tasks = _running_tests.get(test_id, set())
+    logger.info(f"Cancelling test {test_id} ({len(tasks)} running)")
+    for task in tasks:
+        task.cancel()
+
+
+def is_cancelled(test_id: str) -> bool:
+    expires_at = _cancelled_tests.get(test_id)
+    return expires_at is not None and expires_at > time.monotonic()
+
+
+class GenerationJob(PipelineJob):
+    """A test generation request on its way through `test_pipeline`; each stage fills in its output."""
+
+    def __init__(
+            self,
+            file_name: str,
+            start_page: int,
+            end_page: int,
+            question_count: int,
+            test_id: Optional[str] = None,
+            on_question: Optional[QuestionCallback] = None,
+            publish: Optional[Callable[["GenerationJob"], Awaitable[None]]] = None,
+            deadline: Optional[float] = None
+    ):
+        super().__init__(deadline)
+        self.file_name = file_name
+        self.start_page = start_page
+        self.end_page = end_page
+        self.question_count = question_count
+        self.test_id = test_id
+        self.on_question = on_question
+        self.publish = publish
+
+        self.book: Optional[CachedBook] = None
+        self.buffer: Optional[BinaryIO] = None
+        self.text = ""
+        self.parts: List[str] = []
+        self.questions: Optional[List[Dict[str, Any]]] = None
+
+
+async def generate_test(
+        file_name: str,
+        start_page: int,
+        end_page: int,
+        question_count: int,
+        test_id: Optional[str] = None,
+        on_question: Optional[QuestionCallback] = None
+) -> List[Dict[str, Any]]:
+    """Full generation for one test: book text, then questions. Raises on failure."""
+    job = GenerationJob(file_name, start_page, end_page, question_count, test_id, on_question)
+    await test_pipeline.run(job)
+    return job.questions
+
+
+async def generate_test_coalesced(
+        file_name: str,
+        start_page: int,
+        end_page: int,
+        question_count: int,
+        test_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """generate_test shared by identical concurrent requests; each caller gets its own copy of the questions."""
+    if not settings.dedupe_enabled:
+        return await generate_test(file_name, start_page, end_page, question_count, test_id)
+    return await request_coalescer.run(
+        (file_name, start_page, end_page, question_count),
+        lambda: generate_test(file_name, start_page, end_page, question_count, test_id)
+    )
+
+
+async def publish_questions(job: GenerationJob) -> None:
+    await send_response(TestGenerationResponse(fileName=job.file_name, testId=job.test_id, questions=job.questions))
+
+
+async def publish_completion(job: GenerationJob) -> None:
+    await send_completion_response(job.file_name, job.test_id, len(job.questions))
+
+
+async def fetch_book(job: GenerationJob) -> None:
+    """Pipeline stage: make the book available locally, as a cached file or an in-memory buffer."""
+    logger.info(f"Loading book {job.file_name} from MinIO")
+    try:
+        if settings.minio_download_mode == "stream":
+            job.buffer = job.resources.enter_context(await get_object_buffer(job.file_name))
+        else:
+            job.book = await job.resources.enter_async_context(book_cache.open(job.file_name))
+    except S3Error as e:
+        logger.error(f"MinIO error while retrieving book {job.file_name}: {e}")
+        raise BookTextError(f"Failed to get book's text: {job.file_name}")
+    except Exception as e:
+        logger.error(f"Failed to process PDF {job.file_name}: {e}")
+        raise BookTextError(f"Failed to get book's text: {job.file_name}")
+
 
+async def extract_book_text(job: GenerationJob) -> None:
+    """Pipeline stage: text of the requested pages; the book itself is released afterwards."""
+    pages = []
+    try:
+        logger.info(f"Retrieving text from pages {job.start_page} - {job.end_page}")
+        if job.buffer is not None:
+            pages = await read_streamed_pages(job.buffer, job.start_page, job.end_page)
+        else:
+            pages = await read_cached_pages(job.book, job.start_page, job.end_page)
     except Exception as e:
-        logger.error(f"Failed to process test generation request: {e}")
-        if 'file_name' in locals() and file_name:
-            await send_error_response(file_name, f"Failed to process test generation request: {str(e)}")
+        logger.error(f"Failed to process PDF {job.file_name}: {e}")
+    finally:
+        await job.resources.aclose()
+
+    if job.book is not None and settings.page_store_preextract:
+        schedule_preextraction(job.file_name, job.book.etag)
+
+    job.text = "".join(page + "\n\n" for page in pages)
+    if not job.text:
+        raise BookTextError(f"Failed to get book's text: {job.file_name}")
+
+
+async def split_book_text(job: GenerationJob) -> None:
+    """Pipeline stage: one part of the text per question."""
+    with stage_duration.time(stage="splitting"):
+        job.parts = split_text_into_parts(job.text, job.question_count)
+
+
+async def generate_job_questions(job: GenerationJob) -> None:
+    """Pipeline stage: one question per part."""
+    usage = TokenUsage()
+    if settings.generation_mode == "sequential" and job.on_question is None:
+        job.questions = await generate_questions_for_parts(job.parts, usage)
+    else:
+        job.questions = await generate_questions_for_parts_async(job.parts, usage, job.on_question, job.test_id)
+    logger.info(f"Token usage for test {job.test_id}: {usage.as_dict()}")
+
+
+async def publish_job(job: GenerationJob) -> None:
+    """Pipeline stage: publish the response, if the job has one."""
+    if job.publish is not None:
+        await job.publish(job)
+
+
+async def get_required_book_text(file_name: str, start_page: int, end_page: int) -> str:
+    job = GenerationJob(file_name, start_page, end_page, question_count=0)
+    async with job.resources:
+        await fetch_book(job)
+        await extract_book_text(job)
+    return job.text
 
 
 async def get_book_text(file_name: str, start_page: int, end_page: int) -> str:
     try:
-        os.makedirs(settings.temp_dir, exist_ok=True)
+        return await get_required_book_text(file_name, start_page, end_page)
+    except BookTextError:
+        return ""
 
-        temp_file_path = os.path.join(settings.temp_dir, f"{file_name}.pdf")
 
-        if not minio_client.bucket_exists(settings.minio_bucket):
-            logger.warning(f"MinIO bucket {settings.minio_bucket} does not exists")
-            await send_error_response(file_name, f"MinIO bucket {settings.minio_bucket} does not exists")
+def clamp_page_range(start_page: int, end_page: int, page_count: int) -> Tuple[int, int]:
+    return max(start_page, 1), min(end_page, page_count)
 
-        logger.info(f"Loading book {file_name} from MinIO")
-        minio_client.fget_object(
-            bucket_name=settings.minio_bucket,
-            object_name=file_name,
-            file_path=temp_file_path
-        )
 
-        logger.info(f"Retrieving text from pages {start_page} - {end_page}")
-        reader = PdfReader(temp_file_path)
+async def read_cached_pages(book: CachedBook, start_page: int, end_page: int) -> List[str]:
+    page_count = await page_store.get_page_count(book.etag, book.path)
+    start_page, end_page = clamp_page_range(start_page, end_page, page_count)
 
-        if start_page < 1:
-            start_page = 1
-        if end_page > len(reader.pages):
-            end_page = len(reader.pages)
+    return await page_store.get_pages(book.etag, book.path, start_page, end_page)
 
-        text = ""
-        for page_num in range(start_page - 1, end_page):
-            page = reader.pages[page_num]
-            text += page.extract_text() + "\n\n"
 
-        os.remove(temp_file_path)
+async def read_streamed_pages(buffer: BinaryIO, start_page: int, end_page: int) -> List[str]:
+    page_count = await asyncio.to_thread(get_page_count, buffer)
+    start_page, end_page = clamp_page_range(start_page, end_page, page_count)
 
-        return text
-    except S3Error as e:
-        logger.error(f"MinIO error while retrieving book {file_name}: {e}")
-        return ""
-    except Exception as e:
-        logger.error(f"Failed to process PDF {file_name}: {e}")
-        return ""
+    page_numbers = list(range(start_page - 1, end_page))
+    texts = await extract_pages_parallel(buffer, page_numbers)
+
+    return [texts[page] for page in page_numbers]
 
 
-def generate_questions(text: str, count: int) -> List[Dict[str, Any]]:
+def schedule_preextraction(file_name: str, etag: str) -> None:
+    if etag in _preextraction_tasks or page_store.is_complete(etag):
+        return
+
+    async def preextract():
+        try:
+            async with book_cache.open(file_name) as book:
+                await page_store.preextract(book.etag, book.path)
+        except Exception as e:
+            logger.error(f"Failed to pre-extract book {file_name}: {e}")
+
+    task = asyncio.create_task(preextract())
+    _preextraction_tasks[etag] = task
+    task.add_done_callback(lambda _: _preextraction_tasks.pop(etag, None))
+
+
+async def generate_questions(text: str, count: int) -> List[Dict[str, Any]]:
+    return await generate_questions_for_parts(split_text_into_parts(text, count))
+
+
+async def generate_questions_for_parts(parts: List[str], usage: Optional[TokenUsage] = None) -> List[Dict[str, Any]]:
+    """Sequential mode: one call at a time with the single original prompt, through the rate limiter."""
     logger.info(f"Starting test generation")
     questions = []
 
-    parts = split_text_into_parts(text, count)
+    budget = RetryBudget(settings.question_retry_budget)
     for index, part in enumerate(parts, start=1):
-        logger.info(f"Generating question {index}/{count}")
+        logger.info(f"Generating question {index}/{len(parts)}")
         prompt = get_prompt(part)
-        response = claude_generate_answer(prompt)
-        json_part = get_json_from_response(response.content[0].text)
-        questions.append(json_part)
+        fallback = None
+        for attempt in itertools.count(1):
+            response = await claude_generate_answer_async(prompt)
+            if usage is not None:
+                usage.add(response.usage)
+            try:
+                json_part = parse_question(response.content[0].text, part)
+                break
+            except InvalidQuestion as e:
+                fallback = e.question or fallback
+                if not check_retry(index, attempt, e, budget):
+                    json_part = keep_fallback(index, e, fallback)
+                    break
+                prompt = f"{get_prompt(part)}\n\n{RETRY_PROMPT.format(e)}"
+        if json_part is not None:
+            questions.append(json_part)
 
     logger.info(f"Test generation completed")
 
-    return questions
+    return check_question_count(questions, len(parts))
+
+
+async def generate_questions_async(
+        text: str,
+        count: int,
+        usage: Optional[TokenUsage] = None,
+        on_question: Optional[QuestionCallback] = None,
+        test_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    with stage_duration.time(stage="splitting"):
+        parts = split_text_into_parts(text, count)
+    return await generate_questions_for_parts_async(parts, usage, on_question, test_id)
+
+
+async def generate_questions_for_parts_async(
+        parts: List[str],
+        usage: Optional[TokenUsage] = None,
+        on_question: Optional[QuestionCallback] = None,
+        test_id: Optional[str] = None
+) -> List[Dict[str, Any]]:
+    """
+    `on_question(index, total, question)` is awaited for every question as soon as it is ready.
+    With a `test_id`, questions are checkpointed and parts already answered for that test are reused.
+    """
+    logger.info(f"Starting concurrent test generation")
+
+    job_semaphore = asyncio.Semaphore(settings.llm_job_concurrency)
+    usage = usage if usage is not None else TokenUsage()
+    budget = RetryBudget(settings.question_retry_budget)
+
+    part_hashes = [hash_part(part) for part in parts]
+    completed: Dict[int, Dict[str, Any]] = {}
+    if test_id and settings.checkpoint_enabled:
+        checkpoints = await checkpoint_store.load(test_id, part_hashes)
+        completed = {
+            index: checkpoints[part_hash]
+            for index, part_hash in enumerate(part_hashes, start=1) if part_hash in checkpoints
+        }
+        if completed:
+            logger.info(f"Resuming test {test_id}: {len(completed)}/{len(parts)} questions restored from checkpoints")
 
+    async def on_ready(index: int, question: Dict[str, Any], restored: bool = False) -> None:
+        completed[index] = question
+        if test_id and settings.checkpoint_enabled and not restored:
+            await checkpoint_store.save(test_id, part_hashes[index - 1], question)
+        if on_question is not None:
+            await on_question(index, len(parts), question)
 
-async def send_response(response: Dict[str, Any]) -> None:
-    try:
-        logger.info(f"Sending results for book {response['fileName']}")
+    for index, question in sorted(completed.items()):
+        await on_ready(index, question, restored=True)
 
-        await rabbitmq_producer.connect()
+    indexed_parts = [(index, part) for index, part in enumerate(parts, start=1) if index not in completed]
 
-        await rabbitmq_producer.send_message(
-            exchange_name='',
-            routing_key=settings.rabbitmq_response_queue,
-            message=json.dumps(response)
-        )
+    batch_size = get_batch_size(len(indexed_parts))
+    if batch_size > 1:
+        await generate_question_batches(indexed_parts, batch_size, job_semaphore, usage, budget, on_ready)
+    else:
+        await generate_single_questions(parts, indexed_parts, job_semaphore, usage, budget, on_ready)
 
-        logger.info(f"Results for book {response['fileName']} sent successfully")
+    logger.info(f"Test generation completed")
 
-    except Exception as e:
-        logger.error(f"Failed to send results: {e}")
+    questions = [completed[index] for index in range(1, len(parts) + 1) if index in completed]
+    return check_question_count(questions, len(parts))
+
+
+async def generate_single_questions(
+        parts: List[str],
+        indexed_parts: List[Tuple[int, str]],
+        job_semaphore: asyncio.Semaphore,
+        usage: TokenUsage,
+        budget: RetryBudget,
+        on_ready: Callable[[int, Dict[str, Any]], Awaitable[None]]
+) -> None:
+    cache_mode = settings.prompt_cache_mode
+    system = get_system_blocks(cache=cache_mode != "off")
+    document = get_document_block(parts) if cache_mode == "document" else None
+
+    async def generate_question(index: int, part: str) -> None:
+        async with job_semaphore:
+            logger.info(f"Generating question {index}/{len(parts)}")
+            if document is not None:
+                content = get_document_part_content(document, index)
+            else:
+                content = get_excerpt_content(part)
+
+            # Only this part is asked again when its question is invalid
+            fallback = None
+            for attempt in itertools.count(1):
+                response = await claude_generate_answer_async(
+                    content if attempt == 1 else with_retry_feedback(content, str(error)),
+                    system=system
+                )
+                usage.add(response.usage)
+                try:
+                    with stage_duration.time(stage="json_parse"):
+                        question = parse_question(response.content[0].text, part)
+                    break
+                except InvalidQuestion as e:
+                    fallback = e.question or fallback
+                    if not check_retry(index, attempt, e, budget):
+                        question = keep_fallback(index, e, fallback)
+                        break
+                    error = e
+
+        if question is not None:
+            await on_ready(index, question)
+
+    if document is not None and indexed_parts:
+        # The cache entry only exists once a call has been answered, so let the first call write it
+        # instead of having every concurrent call pay for creating the same entry
+        await generate_question(*indexed_parts[0])
+        indexed_parts = indexed_parts[1:]
+
+    await gather_or_cancel(*(generate_question(index, part) for index, part in indexed_parts))
+
+
+def check_retry(index: int, attempt: int, error: InvalidQuestion, budget: RetryBudget) -> bool:
+    """Whether question `index` may be regenerated again, after `attempt` invalid answers."""
+    errors.inc(source="validation")
+    if attempt >= settings.question_max_attempts or not budget.take():
+        return False
+    logger.warning(f"Invalid question {index} ({error}), regenerating it (attempt {attempt + 1})")
+    return True
+
+
+def get_batch_size(count: int) -> int:
+    if settings.generation_batch_size > 0:
+        return min(settings.generation_batch_size, max(count, 1))
+    # Auto: as many questions as fit into one answer's output token budget
+    return max(1, min(count, settings.llm_batch_max_tokens // settings.llm_tokens_per_question))
+
+
+async def generate_question_batches(
+        indexed_parts: List[Tuple[int, str]],
+        batch_size: int,
+        job_semaphore: asyncio.Semaphore,
+        usage: TokenUsage,
+        budget: RetryBudget,
+        on_ready: Callable[[int, Dict[str, Any]], Awaitable[None]]
+) -> None:
+    logger.info(f"Generating {len(indexed_parts)} questions in batches of {batch_size}")
+
+    system = get_batch_system_blocks(cache=settings.prompt_cache_mode != "off")
+
+    async def generate_batch(batch: List[Tuple[int, str]]) -> None:
+        async with job_semaphore:
+            questions = await generate_question_batch(batch, system, usage, budget)
+
+        for index, _ in batch:
+            if index in questions:
+                await on_ready(index, questions[index])
+
+    batches = [indexed_parts[i:i + batch_size] for i in range(0, len(indexed_parts), batch_size)]
+    await gather_or_cancel(*(generate_batch(batch) for batch in batches))
+
+
+async def generate_question_batch(
+        batch: List[Tuple[int, str]],
+        system: List[dict],
+        usage: TokenUsage,
+        budget: RetryBudget
+) -> Dict[int, Dict[str, Any]]:
+    pending = dict(batch)
+    questions = {}
+    failures: Dict[int, str] = {}
+    fallbacks: Dict[int, Dict[str, Any]] = {}
+
+    for attempt in range(1, settings.generation_batch_attempts + 1):
+        logger.info(f"Generating questions for parts {list(pending)} (attempt {attempt})")
+        content = get_batch_content(list(pending.items()))
+        if failures:
+            content = with_retry_feedback(content, "; ".join(describe_failures(failures)))
+        response = await claude_generate_answer_async(
+            content,
+            system=system,
+            max_tokens=min(settings.llm_batch_max_tokens, len(pending) * settings.llm_tokens_per_question)
+        )
+        usage.add(response.usage)
+
+        failures = {}
+        try:
+            with stage_duration.time(stage="json_parse"):
+                answer = get_json_from_response(response.content[0].text)
+        except ValueError as e:
+            logger.warning(f"Failed to parse batch answer: {e}")
+            failures = {index: str(e) for index in pending}
+            answer = []
+
+        for question in answer if isinstance(answer, list) else [answer]:
+            if not isinstance(question, dict):
+                continue
+            index = question.pop("part", None)
+            if isinstance(index, str) and index.isdigit():
+                index = int(index)
+            if index not in pending:
+                continue
+            try:
+                questions[index] = validate_question(question, pending[index])
+                del pending[index]
+            except InvalidQuestion as e:
+                errors.inc(source="validation")
+                failures[index] = str(e)
+                if e.question is not None:
+                    fallbacks[index] = e.question
+
+        if not pending:
+            return questions
+        for index in pending:
+            failures.setdefault(index, "the question is missing from the answer")
+        logger.warning(f"Invalid or missing questions in the batch: {describe_failures(failures)}")
+        if attempt == settings.generation_batch_attempts or not budget.take():
+            break
+
+    for index in pending:
+        question = keep_fallback(index, failures[index], fallbacks.get(index))
+        if question is not None:
+            questions[index] = question
+    return questions
 
 
-async def send_error_response(file_name: str, error_message: str) -> None:
-    response = {
-        "fileName": file_name,
-        "error": error_message,
-        "questions": []
-    }
-    await send_response(response)
+test_pipeline = Lazy(lambda: JobPipeline(
+    [
+        Stage("fetch", fetch_book, settings.pipeline_fetch_workers),
+        Stage("extract", extract_book_text, settings.pipeline_extract_workers),
+        Stage("chunk", split_book_text, settings.pipeline_chunk_workers),
+        Stage("generate", generate_job_questions, settings.pipeline_generate_workers, fair_scheduled=True),
+        Stage("publish", publish_job, settings.pipeline_publish_workers),
+    ],
+    queue_size=settings.pipeline_queue_size,
+    enabled=settings.pipeline_enabled,
+    fair=settings.fair_scheduling
+))
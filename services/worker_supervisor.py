@@ -0,0 +1,283 @@
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import queue
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config import settings
+from core.metrics import Counter, Registry
+
+logger = logging.getLogger(__name__)
+
+# A worker that crashes within this many seconds of starting is restarted with a growing delay
+STABLE_RUNTIME = 60
+# On shutdown, workers get this long on top of the consumer drain timeout before they are killed
+SHUTDOWN_GRACE = 15
+
+# Metrics of the supervisor process itself; worker metrics arrive as registry snapshots
+supervisor_registry = Registry()
+worker_restarts = supervisor_registry.register(Counter(
+    "reader_worker_restarts_total",
+    "Worker processes restarted after exiting unexpectedly",
+    ["worker"]
+))
+
+
+def _split_budgets() -> Dict[str, int]:
+    """Totals split evenly between the workers, by the variable that sets each worker's share."""
+    return {
+        "RABBITMQ_PREFETCH_COUNT": settings.rabbitmq_prefetch_count,
+        "CONSUMER_MAX_IN_FLIGHT": settings.consumer_max_in_flight,
+        "LLM_MAX_CONCURRENCY": settings.llm_max_concurrency,
+        "LLM_REQUESTS_PER_MINUTE": settings.llm_requests_per_minute,
+        "LLM_OUTPUT_TOKENS_PER_MINUTE": settings.llm_output_tokens_per_minute,
+        "BOOK_CACHE_MAX_MB": settings.book_cache_max_mb,
+    }
+
+
+def worker_count() -> int:
+    """
+    WORKER_PROCESSES, or one worker per CPU, but no more workers than the smallest budget has units:
+    every worker needs a share of at least one, and more workers would take more than the totals.
+    """
+    requested = settings.worker_processes or os.cpu_count() or 1
+    # A budget of 0 (a prefetch count of 0 is unlimited) is not divided
+    budgets = [(total, name) for name, total in _split_budgets().items() if total > 0]
+    total, name = min(budgets, default=(requested, ""))
+    if requested > total:
+        logger.warning(f"Starting {total} worker processes instead of {requested}: {name} is {total}")
+        return total
+    return requested
+
+
+def _share(total: int, workers: int) -> int:
+    return max(1, total // workers) if total > 0 else total
+
+
+def worker_http_port(index: int) -> int:
+    return (settings.worker_http_base_port or settings.http_port + 1) + index
+
+
+def bulk_job_dir(index: int) -> str:
+    if settings.bulk_job_dir:
+        return os.path.join(settings.bulk_job_dir, f"worker-{index}")
+    return os.path.join(settings.temp_dir, f"worker-{index}", "bulk_jobs")
+
+
+def adopt_bulk_jobs(workers: int) -> None:
+    """
+    Move batch records that no worker would resume to worker 0: those of workers beyond `workers`,
+    left behind when WORKER_PROCESSES went down, and those of a single-process run.
+    """
+    parent = settings.bulk_job_dir or settings.temp_dir
+    sources = [settings.bulk_job_dir or os.path.join(settings.temp_dir, "bulk_jobs")]
+    if os.path.isdir(parent):
+        for name in os.listdir(parent):
+            match = re.fullmatch(r"worker-(\d+)", name)
+            if match and int(match.group(1)) >= workers:
+                sources.append(bulk_job_dir(int(match.group(1))))
+
+    target = bulk_job_dir(0)
+    for source in sources:
+        if not os.path.isdir(source):
+            continue
+        for name in os.listdir(source):
+            if name.endswith(".json"):
+                os.makedirs(target, exist_ok=True)
+                os.replace(os.path.join(source, name), os.path.join(target, name))
+                logger.info(f"Moved batch record {name} from {source} to worker 0")
+
+
+def worker_environment(index: int, workers: int) -> Dict[str, str]:
+    """
+    Settings of one worker process: its share of the prefetch, in-flight, Claude and book cache
+    budgets, so the workers together stay within the configured totals as long as there are no more
+    of them than worker_count() allows, a temp dir and a batch record directory of its own, and the
+    port of its HTTP server. The book cache, page store and bulk job records are not safe to share
+    between processes; checkpoints are. The page store is bounded by the book cache share, as it keeps
+    only the text of cached books.
+    """
+    cpus = os.cpu_count() or 1
+    environment = {name: str(_share(total, workers)) for name, total in _split_budgets().items()}
+    return {
+        **environment,
+        "PDF_EXTRACTION_WORKERS": str(settings.pdf_extraction_workers or _share(cpus, workers)),
+        "WORKER_HTTP_PORT": str(worker_http_port(index)),
+        "TEMP_DIR": os.path.join(settings.temp_dir, f"worker-{index}"),
+        "CHECKPOINT_DIR": settings.checkpoint_dir or os.path.join(settings.temp_dir, "checkpoints"),
+        "BULK_JOB_DIR": bulk_job_dir(index),
+    }
+
+
+class WorkerProcess:
+    def __init__(self, index: int):
+        self.index = index
+        self.process: Optional[multiprocessing.Process] = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.failures = 0
+        self.restart_at: Optional[float] = None
+        self.stats: Optional[Dict[str, Any]] = None
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+
+class WorkerSupervisor:
+    """
+    Runs `target(index, stats_queue)` in `workers` processes, each with its own consumer connection.
+
+    Workers that exit while the supervisor runs are restarted, with an exponential delay when they keep
+    crashing right after start. `stop()` sends SIGTERM so every worker drains its jobs in flight, and
+    kills the ones still running after the drain timeout. Workers report their stats and a metrics
+    snapshot on `stats_queue`; the supervisor keeps the latest report of each. A worker reports once
+    it has started its services and HTTP server, so HTTP requests only go to workers that have.
+    """
+
+    def __init__(self, target: Callable[[int, Any], None], workers: int):
+        self.target = target
+        self.workers = [WorkerProcess(index) for index in range(workers)]
+        self._context = multiprocessing.get_context("spawn")
+        self._stats_queue = self._context.Queue()
+        self._monitor: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._http_turn = itertools.count()
+
+    def start(self) -> None:
+        adopt_bulk_jobs(len(self.workers))
+        for worker in self.workers:
+            self._spawn(worker)
+        self._monitor = asyncio.create_task(self._watch())
+        logger.info(f"Started {len(self.workers)} worker processes")
+
+    def _spawn(self, worker: WorkerProcess) -> None:
+        environment = worker_environment(worker.index, len(self.workers))
+        os.makedirs(environment["TEMP_DIR"], exist_ok=True)
+
+        # Spawned processes inherit the environment, and read their settings from it on import
+        previous = {name: os.environ.get(name) for name in environment}
+        os.environ.update(environment)
+        try:
+            worker.process = self._context.Process(
+                target=self.target,
+                args=(worker.index, self._stats_queue),
+                name=f"reader-worker-{worker.index}",
+            )
+            worker.process.start()
+        finally:
+            for name, value in previous.items():
+                if value is None:
+                    os.environ.pop(name, None)
+                else:
+                    os.environ[name] = value
+
+        worker.started_at = time.monotonic()
+        worker.restart_at = None
+        worker.stats = None
+        logger.info(f"Worker {worker.index} started with pid {worker.process.pid}")
+
+    async def _watch(self) -> None:
+        while not self._stopping:
+            self._read_stats()
+            now = time.monotonic()
+            for worker in self.workers:
+                if worker.alive:
+                    continue
+                if worker.restart_at is None:
+                    if now - worker.started_at >= STABLE_RUNTIME:
+                        worker.failures = 0
+                    delay = min(settings.worker_restart_max_backoff, 0.5 * 2 ** worker.failures)
+                    worker.failures += 1
+                    worker.restart_at = now + delay
+                    logger.error(
+                        f"Worker {worker.index} exited with code {worker.process.exitcode}, "
+                        f"restarting in {delay:.1f}s"
+                    )
+                elif now >= worker.restart_at:
+                    worker.restarts += 1
+                    worker_restarts.inc(worker=str(worker.index))
+                    self._spawn(worker)
+            await asyncio.sleep(0.5)
+
+    def _read_stats(self) -> None:
+        while True:
+            try:
+                stats = self._stats_queue.get_nowait()
+            except queue.Empty:
+                return
+            worker = self.workers[stats["index"]]
+            # Late reports of a process that was already replaced are dropped
+            if worker.process is not None and stats["pid"] == worker.process.pid:
+                worker.stats = stats
+
+    def worker_stats(self) -> List[Dict[str, Any]]:
+        self._read_stats()
+        return [
+            {
+                "index": worker.index,
+                "pid": worker.process.pid if worker.process else None,
+                "alive": worker.alive,
+                "restarts": worker.restarts,
+                "in_flight": worker.stats["in_flight"] if worker.stats and worker.alive else None,
+                "llm": worker.stats["llm"] if worker.stats and worker.alive else None,
+            }
+            for worker in self.workers
+        ]
+
+    def llm_stats(self) -> Dict[str, Any]:
+        """Claude limiter stats summed over the running workers."""
+        self._read_stats()
+        total: Dict[str, Any] = {}
+        for worker in self.workers:
+            if not worker.alive:
+                continue
+            for name, value in (worker.stats or {}).get("llm", {}).items():
+                total[name] = total.get(name, 0) + value
+        return total
+
+    def http_port(self) -> Optional[int]:
+        """Port of the next ready worker in turn, for a forwarded HTTP request; None if none is ready."""
+        self._read_stats()
+        ready = [worker for worker in self.workers if worker.alive and worker.stats]
+        if not ready:
+            return None
+        return worker_http_port(ready[next(self._http_turn) % len(ready)].index)
+
+    def metric_snapshots(self) -> List[Dict[str, dict]]:
+        self._read_stats()
+        snapshots = [worker.stats["metrics"] for worker in self.workers if worker.stats]
+        return snapshots + [supervisor_registry.snapshot()]
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._monitor:
+            self._monitor.cancel()
+            await asyncio.gather(self._monitor, return_exceptions=True)
+
+        logger.info("Stopping worker processes")
+        for worker in self.workers:
+            if worker.alive:
+                worker.process.terminate()
+
+        deadline = time.monotonic() + settings.consumer_drain_timeout + SHUTDOWN_GRACE
+        for worker in self.workers:
+            if worker.process is None:
+                continue
+            await asyncio.to_thread(worker.process.join, max(0.0, deadline - time.monotonic()))
+            if worker.process.is_alive():
+                logger.error(f"Worker {worker.index} did not stop in time, killing it")
+                worker.process.kill()
+                await asyncio.to_thread(worker.process.join)
+
+        self._stats_queue.cancel_join_thread()
+        self._stats_queue.close()
+        logger.info("Worker processes stopped")
+
+
+# Set while supervisor.py runs, so the status and metrics routes report all workers
+active_supervisor: Optional[WorkerSupervisor] = None
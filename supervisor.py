@@ -0,0 +1,52 @@
+import logging
+from contextlib import asynccontextmanager
+
+import uvicorn
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+import worker
+from api.routes import metrics, status, worker_proxy
+from core.config import APP_NAME, settings
+from services import worker_supervisor
+from services.worker_supervisor import WorkerSupervisor, worker_count
+
+# Config logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(processName)s - %(name)s - %(levelname)s - %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    supervisor = WorkerSupervisor(worker.run, worker_count())
+    supervisor.start()
+    worker_supervisor.active_supervisor = supervisor
+
+    yield
+
+    worker_supervisor.active_supervisor = None
+    await supervisor.stop()
+    await worker_proxy.close_client()
+
+
+# Production entry point: consumers and test generation run in the worker processes; this process
+# serves status and metrics and forwards the test generation routes to the workers' HTTP servers
+app = FastAPI(title=APP_NAME, lifespan=lifespan)
+
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+app.include_router(status.router, prefix="/api", tags=["status"])
+app.include_router(metrics.router, prefix="/api", tags=["metrics"])
+app.include_router(worker_proxy.router, prefix="/api", tags=["tests"])
+
+if __name__ == "__main__":
+    uvicorn.run(app, host=settings.http_host, port=settings.http_port)
@@ -0,0 +1,27 @@
+import os
+import tempfile
+
+# Settings are read on first use: the tests never reach a real Anthropic, MinIO or RabbitMQ
+os.environ.setdefault("ANTHROPIC_API_KEY", "fake")
+os.environ.setdefault("TEMP_DIR", tempfile.mkdtemp(prefix="reader-ai-tests-"))
+
+import pytest
+
+from benchmarks.fake_anthropic import FakeAnthropicServer
+from benchmarks.fake_minio import FakeMinio
+
+
+@pytest.fixture
+def fake_anthropic():
+    server = FakeAnthropicServer(latency=0.01, retry_after=0.01).start()
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def fake_minio(monkeypatch):
+    from services import minio_service
+
+    fake = FakeMinio(latency=0)
+    monkeypatch.setattr(minio_service, "minio_client", fake)
+    return fake
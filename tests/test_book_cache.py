@@ -0,0 +1,111 @@
+import asyncio
+import os
+
+import pytest
+from minio.error import S3Error
+
+from services.book_cache import BookCache
+
+BOOK = b"%PDF-1.4 " + bytes(range(256)) * 64
+
+
+def book_cache(fake_minio, cache_dir, max_bytes: int = 10 * 1024 * 1024) -> BookCache:
+    return BookCache(lambda: fake_minio, "books", str(cache_dir), max_bytes)
+
+
+async def read_cached(cache: BookCache, file_name: str) -> bytes:
+    async with cache.open(file_name) as book:
+        with open(book.path, "rb") as file:
+            return file.read()
+
+
+def test_cache_downloads_a_book_once(fake_minio, tmp_path):
+    fake_minio.put("book.pdf", BOOK)
+    cache = book_cache(fake_minio, tmp_path)
+
+    async def main():
+        return [await read_cached(cache, "book.pdf") for _ in range(3)]
+
+    assert asyncio.run(main()) == [BOOK] * 3
+    assert fake_minio.calls["fget_object"] == 1
+    assert fake_minio.calls["stat_object"] == 3
+
+
+def test_cache_downloads_a_changed_book_again(fake_minio, tmp_path):
+    fake_minio.put("book.pdf", BOOK)
+    cache = book_cache(fake_minio, tmp_path)
+
+    async def main():
+        first = await read_cached(cache, "book.pdf")
+        fake_minio.put("book.pdf", BOOK + b"new edition")
+        return first, await read_cached(cache, "book.pdf")
+
+    assert asyncio.run(main()) == (BOOK, BOOK + b"new edition")
+    assert fake_minio.calls["fget_object"] == 2
+
+
+def test_concurrent_opens_share_one_download(fake_minio, tmp_path):
+    fake_minio.latency = 0.05
+    fake_minio.put("book.pdf", BOOK)
+    cache = book_cache(fake_minio, tmp_path)
+
+    async def main():
+        return await asyncio.gather(*(read_cached(cache, "book.pdf") for _ in range(5)))
+
+    assert asyncio.run(main()) == [BOOK] * 5
+    assert fake_minio.calls["fget_object"] == 1
+
+
+def test_cache_evicts_the_least_recently_used_book(fake_minio, tmp_path):
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        fake_minio.put(name, BOOK + name.encode())
+    cache = book_cache(fake_minio, tmp_path, max_bytes=2 * len(BOOK) + 100)
+
+    async def main():
+        for name in ("a.pdf", "b.pdf", "a.pdf", "c.pdf", "a.pdf", "b.pdf"):
+            await read_cached(cache, name)
+
+    asyncio.run(main())
+
+    # b was evicted for c, then c for b again; a stayed as the most recently used
+    assert fake_minio.calls["fget_object"] == 4
+    assert len(os.listdir(tmp_path)) == 2
+
+
+def test_cache_keeps_an_open_book_over_the_limit(fake_minio, tmp_path):
+    fake_minio.put("a.pdf", BOOK + b"a")
+    fake_minio.put("b.pdf", BOOK + b"b")
+    cache = book_cache(fake_minio, tmp_path, max_bytes=len(BOOK) + 1)
+
+    async def main():
+        async with cache.open("a.pdf") as book:
+            await read_cached(cache, "b.pdf")
+            with open(book.path, "rb") as file:
+                return book.etag, file.read()
+
+    etag, data = asyncio.run(main())
+
+    # a is older but was open, so b went instead
+    assert data == BOOK + b"a"
+    assert os.listdir(tmp_path) == [f"{etag}.pdf"]
+
+
+def test_cache_reuses_books_across_restarts(fake_minio, tmp_path):
+    fake_minio.put("book.pdf", BOOK)
+    asyncio.run(read_cached(book_cache(fake_minio, tmp_path), "book.pdf"))
+    (tmp_path / "leftover.0123.part").write_bytes(b"interrupted download")
+
+    cache = book_cache(fake_minio, tmp_path)
+    cache.prepare()
+
+    assert not list(tmp_path.glob("*.part"))
+    assert asyncio.run(read_cached(cache, "book.pdf")) == BOOK
+    assert fake_minio.calls["fget_object"] == 1
+
+
+def test_cache_missing_book(fake_minio, tmp_path):
+    cache = book_cache(fake_minio, tmp_path)
+
+    with pytest.raises(S3Error):
+        asyncio.run(read_cached(cache, "missing.pdf"))
+    assert not os.listdir(tmp_path)
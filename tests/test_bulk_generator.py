@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from core.config import settings
+from services import bulk_generator as bulk_module
+from services import claude_service
+from services.bulk_generator import BulkGenerator, BulkJobStore
+
+PART = "The river ran past the village at dawn. The captain read the letter by the window and kept silent."
+
+
+@pytest.fixture
+def bulk_settings(fake_anthropic, monkeypatch):
+    fake_anthropic.batch_latency = 0.05
+    monkeypatch.setattr(settings, "anthropic_base_url", fake_anthropic.base_url)
+    monkeypatch.setattr(settings, "bulk_submit_delay", 0.05)
+    monkeypatch.setattr(settings, "bulk_poll_interval", 0.05)
+    monkeypatch.setattr(claude_service, "async_client", None)
+
+
+def test_results_are_kept_until_every_response_is_published(bulk_settings, monkeypatch, tmp_path):
+    store = BulkJobStore(str(tmp_path))
+    generator = BulkGenerator(store)
+    broker_down = {"test-1": 3}
+    published = []
+    records_while_down = []
+
+    async def send_response(response):
+        if broker_down.get(response.testId):
+            broker_down[response.testId] -= 1
+            records_while_down.append(store.load_all())
+            return False
+        published.append(response.testId)
+        return True
+
+    monkeypatch.setattr(bulk_module, "send_response", send_response)
+
+    async def main():
+        try:
+            await asyncio.gather(*(generator.submit(f"test-{job}", "book.pdf", [PART, PART]) for job in range(3)))
+            for _ in range(100):
+                if not store.load_all():
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await generator.stop()
+            await claude_service.close_clients()
+
+    asyncio.run(main())
+
+    # test-0 and test-2 went out once, test-1 after the broker came back, and the record went last
+    assert sorted(published) == ["test-0", "test-1", "test-2"]
+    assert len(records_while_down) == 3
+    assert all(len(records) == 1 for records in records_while_down)
+    assert records_while_down[-1][0]["published"] == ["job0", "job2"]
+    assert not store.load_all()
+
+
+def test_unpublished_records_are_resumed(bulk_settings, monkeypatch, tmp_path):
+    store = BulkJobStore(str(tmp_path))
+    published = []
+
+    async def send_response(response):
+        published.append(response.testId)
+        return True
+
+    monkeypatch.setattr(bulk_module, "send_response", send_response)
+
+    async def main():
+        first = BulkGenerator(store)
+        await asyncio.gather(*(first.submit(f"test-{job}", "book.pdf", [PART]) for job in range(2)))
+        await first.stop()
+        record = store.load_all()[0]
+        record["published"] = ["job0"]
+        store.save(record)
+
+        second = BulkGenerator(store)
+        try:
+            await second.resume()
+            await asyncio.gather(*second._pollers.values())
+        finally:
+            await second.stop()
+            await claude_service.close_clients()
+
+    asyncio.run(main())
+
+    assert published == ["test-1"]
+    assert not store.load_all()
@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from benchmarks.chunking import book_text
+from utils.chunking import BOUNDARY, PARAGRAPH_SNAP, _segments, estimate_tokens, split_text_balanced
+
+
+def random_case(seed: int):
+    rng = random.Random(seed)
+    return book_text(rng.randint(1, 30), rng), rng.randint(1, 60)
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_parts_cover_the_text_in_order(seed):
+    text, num_parts = random_case(seed)
+    parts = split_text_balanced(text, num_parts)
+
+    assert len(parts) == num_parts
+    if len(text.split()) >= num_parts:
+        assert all(part.strip() for part in parts)
+        assert " ".join(parts).split() == text.split()
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_parts_are_balanced(seed):
+    text, num_parts = random_case(seed)
+    segments = _segments(text.strip(), BOUNDARY)
+    if len(segments) < num_parts:
+        pytest.skip("fewer sentences than parts, split by words")
+
+    average = estimate_tokens(text) / num_parts
+    # A cut lands on the sentence end nearest its target, or moves up to the snap to a paragraph end
+    allowed = average * PARAGRAPH_SNAP + max(segment.tokens for segment in segments) + 1
+    for part in split_text_balanced(text, num_parts):
+        assert abs(estimate_tokens(part) - average) <= allowed
+
+
+@pytest.mark.parametrize("text", ["", "one", "one two three", "Short. Sentences. Only.", "x" * 50])
+@pytest.mark.parametrize("num_parts", [1, 2, 5])
+def test_short_text_still_gives_every_part(text, num_parts):
+    parts = split_text_balanced(text, num_parts)
+
+    assert len(parts) == num_parts
+    assert all(part in text for part in parts)
+
+
+def test_parts_end_on_sentence_boundaries():
+    text = "First sentence here. Second one follows! Third asks? Fourth ends…\n\nA new paragraph starts. It ends."
+    for num_parts in range(1, 7):
+        for part in split_text_balanced(text, num_parts):
+            assert part[-1] in ".!?…"
+
+
+def test_no_parts():
+    assert split_text_balanced("Some text.", 0) == []
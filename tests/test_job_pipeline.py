@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from services.job_pipeline import JobPipeline, PipelineJob, Stage
+from services.job_scheduler import Flow, current_flow
+
+
+class NamedJob(PipelineJob):
+    def __init__(self, name: str, weight: float):
+        current_flow.set(Flow(weight))
+        super().__init__()
+        self.name = name
+
+
+def run_jobs(pipeline: JobPipeline, jobs, delay: float = 0.0):
+    async def submit(job: NamedJob, index: int):
+        await asyncio.sleep(index * delay)
+        await pipeline.run(job)
+
+    async def main():
+        try:
+            await asyncio.gather(*(submit(job, index) for index, job in enumerate(jobs)))
+        finally:
+            await pipeline.stop()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("fair, small_position", [(True, 1), (False, 5)])
+def test_small_job_passes_queued_large_ones(fair, small_position):
+    order = []
+
+    async def work(job: NamedJob):
+        order.append(job.name)
+        await asyncio.sleep(0.02)
+
+    pipeline = JobPipeline([Stage("work", work, 1)], queue_size=2, enabled=True, fair=fair)
+    # Large jobs fill the worker, the queue and the senders waiting for room before the small one arrives
+    jobs = [NamedJob(f"large-{index}", 0.01) for index in range(5)] + [NamedJob("small", 1.0)]
+
+    run_jobs(pipeline, jobs, delay=0.001)
+
+    assert order.index("small") == small_position
+    assert sorted(order) == sorted(job.name for job in jobs)
+
+
+@pytest.mark.parametrize("fair, most_running", [(True, 4), (False, 1)])
+def test_fair_scheduled_stage_takes_every_job(fair, most_running):
+    running = []
+    observed = []
+
+    async def generate(job: NamedJob):
+        running.append(job)
+        observed.append(len(running))
+        await asyncio.sleep(0.02)
+        running.remove(job)
+
+    pipeline = JobPipeline([Stage("generate", generate, 1, fair_scheduled=True)], queue_size=1, fair=fair)
+
+    run_jobs(pipeline, [NamedJob(f"job-{index}", 1.0) for index in range(4)])
+
+    assert max(observed) == most_running
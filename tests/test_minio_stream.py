@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+from minio.error import S3Error
+
+from core.config import settings
+from services import minio_service
+
+BOOK = b"%PDF-1.4 " + bytes(range(256)) * 64
+
+
+def test_stream_reads_a_small_book_into_memory(fake_minio):
+    fake_minio.put("book.pdf", BOOK)
+
+    buffer = asyncio.run(minio_service.get_object_buffer("book.pdf"))
+
+    with buffer:
+        assert not buffer._rolled
+        assert buffer.read() == BOOK
+    assert "fget_object" not in fake_minio.calls
+
+
+def test_stream_spills_a_large_book_to_disk(fake_minio, monkeypatch):
+    monkeypatch.setattr(settings, "minio_stream_max_memory_mb", 1)
+    book = BOOK * 100
+    fake_minio.put("book.pdf", book)
+
+    buffer = asyncio.run(minio_service.get_object_buffer("book.pdf"))
+
+    with buffer:
+        assert buffer._rolled
+        assert buffer.read() == book
+
+
+def test_stream_missing_book(fake_minio):
+    with pytest.raises(S3Error):
+        asyncio.run(minio_service.get_object_buffer("missing.pdf"))
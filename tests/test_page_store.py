@@ -0,0 +1,42 @@
+import asyncio
+import os
+
+from benchmarks.synthetic_pdf import build_pdf
+from services.book_cache import BookCache
+from services.page_store import PageTextStore
+
+
+def test_text_leaves_with_the_cached_book(fake_minio, tmp_path):
+    books = {name: build_pdf(4, seed=seed) for seed, name in enumerate(("a.pdf", "b.pdf"))}
+    for name, data in books.items():
+        fake_minio.put(name, data)
+    store = PageTextStore(str(tmp_path / "pages"))
+    cache = BookCache(lambda: fake_minio, "books", str(tmp_path / "books"), max(map(len, books.values())),
+                      on_evict=store.remove)
+
+    async def read(name: str):
+        async with cache.open(name) as book:
+            return book.etag, await store.get_pages(book.etag, book.path, 1, 4)
+
+    async def main():
+        return await read("a.pdf"), await read("b.pdf")
+
+    (etag_a, pages_a), (etag_b, pages_b) = asyncio.run(main())
+
+    assert all(pages_a) and all(pages_b)
+    assert sorted(os.listdir(tmp_path / "pages")) == [f"{etag_b}.idx", f"{etag_b}.txt"]
+    assert list(store._books) == [etag_b]
+    assert etag_a not in store._locks
+
+
+def test_prune_removes_books_that_are_not_cached(tmp_path):
+    store = PageTextStore(str(tmp_path))
+    store.prepare()
+    for key in ("kept", "gone"):
+        for suffix in (".txt", ".idx"):
+            (tmp_path / f"{key}{suffix}").write_bytes(b"")
+    (tmp_path / "gone.idx.tmp").write_bytes(b"")
+
+    store.prune(["kept"])
+
+    assert sorted(os.listdir(tmp_path)) == ["kept.idx", "kept.txt"]
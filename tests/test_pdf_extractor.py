@@ -0,0 +1,31 @@
+import asyncio
+import os
+import signal
+
+from benchmarks.synthetic_pdf import build_pdf
+from core.config import settings
+from services import pdf_extractor
+
+
+def test_parallel_extraction_survives_a_dead_worker(monkeypatch):
+    monkeypatch.setattr(settings, "pdf_parallel_min_pages", 4)
+    monkeypatch.setattr(settings, "pdf_extraction_workers", 2)
+    pdf = build_pdf(12)
+
+    async def main():
+        await pdf_extractor.warm_executor()
+        broken = pdf_extractor.get_executor()
+        for pid in list(broken._processes):
+            os.kill(pid, signal.SIGKILL)
+        await asyncio.sleep(0.2)
+        try:
+            texts = await pdf_extractor.extract_pages_parallel(pdf, list(range(12)))
+            return texts, pdf_extractor.get_executor() is not broken
+        finally:
+            pdf_extractor.shutdown_executor()
+
+    texts, replaced = asyncio.run(main())
+
+    assert sorted(texts) == list(range(12))
+    assert all(texts.values())
+    assert replaced
@@ -0,0 +1,157 @@
+import asyncio
+import time
+
+import anthropic
+import pytest
+
+from services.job_scheduler import Flow, current_flow
+from services.rate_limiter import AdaptiveRateLimiter
+
+MAX_TOKENS = 100
+
+
+def limiter(**overrides) -> AdaptiveRateLimiter:
+    options = dict(requests_per_minute=100_000, output_tokens_per_minute=10_000_000, max_concurrency=4,
+                   base_backoff=0.01, max_backoff=0.05)
+    options.update(overrides)
+    return AdaptiveRateLimiter(**options)
+
+
+def run_calls(server, rate_limiter: AdaptiveRateLimiter, count: int, on_call=None):
+    async def main():
+        client = anthropic.AsyncAnthropic(api_key="fake", base_url=server.base_url, max_retries=0)
+
+        async def call():
+            if on_call is not None:
+                on_call()
+            return await client.messages.create(
+                model="fake", max_tokens=MAX_TOKENS, messages=[{"role": "user", "content": "Page text."}])
+
+        try:
+            return await asyncio.gather(*(rate_limiter.run(call, MAX_TOKENS) for _ in range(count)))
+        finally:
+            await client.close()
+
+    return asyncio.run(main())
+
+
+def test_calls_succeed_through_throttling(fake_anthropic):
+    fake_anthropic.throttle_rate = 0.3
+    rate_limiter = limiter(max_retries=30)
+
+    responses = run_calls(fake_anthropic, rate_limiter, 30)
+
+    assert len(responses) == 30
+    assert fake_anthropic.throttled > 0
+    assert rate_limiter.throttled_count == fake_anthropic.throttled
+    assert rate_limiter.retry_count == fake_anthropic.throttled
+    assert rate_limiter.in_flight == 0
+
+
+def test_concurrency_stays_within_the_window(fake_anthropic):
+    rate_limiter = limiter(max_concurrency=3)
+    observed = []
+
+    run_calls(fake_anthropic, rate_limiter, 20, on_call=lambda: observed.append(rate_limiter.in_flight))
+
+    assert max(observed) <= 3
+    assert fake_anthropic.calls == 20
+
+
+def test_throttling_halves_the_window(fake_anthropic):
+    fake_anthropic.throttle_rate = 1.0
+    rate_limiter = limiter(max_concurrency=8, max_retries=0)
+
+    with pytest.raises(anthropic.RateLimitError):
+        run_calls(fake_anthropic, rate_limiter, 1)
+
+    assert rate_limiter.concurrency_limit == 4
+    assert rate_limiter.stats()["throttled"] == 1
+
+
+def test_gives_up_after_max_retries(fake_anthropic):
+    fake_anthropic.overload_rate = 1.0
+    rate_limiter = limiter(max_retries=2)
+
+    with pytest.raises(anthropic.APIStatusError) as error:
+        run_calls(fake_anthropic, rate_limiter, 1)
+
+    assert error.value.status_code == 529
+    assert fake_anthropic.calls == 3
+    assert rate_limiter.retry_count == 2
+
+
+def test_window_grows_back_after_successes(fake_anthropic):
+    rate_limiter = limiter(max_concurrency=4)
+    rate_limiter.concurrency_limit = 1.0
+
+    run_calls(fake_anthropic, rate_limiter, 20)
+
+    assert rate_limiter.concurrency_limit == 4
+
+
+def test_request_bucket_paces_calls(fake_anthropic):
+    # 600 per minute is 10 per second: the first 5 calls take the burst, the next 5 wait ~0.5s
+    rate_limiter = limiter(requests_per_minute=600)
+    rate_limiter.requests.tokens = 5
+
+    started = time.monotonic()
+    run_calls(fake_anthropic, rate_limiter, 10)
+
+    assert time.monotonic() - started >= 0.4
+
+
+def test_small_job_overtakes_a_large_one(fake_anthropic):
+    rate_limiter = limiter(max_concurrency=1)
+    large, small = Flow(), Flow()
+    order = []
+
+    async def main():
+        client = anthropic.AsyncAnthropic(api_key="fake", base_url=fake_anthropic.base_url, max_retries=0)
+
+        async def call():
+            order.append(current_flow.get())
+            return await client.messages.create(
+                model="fake", max_tokens=MAX_TOKENS, messages=[{"role": "user", "content": "Page text."}])
+
+        async def job(flow: Flow, calls: int):
+            current_flow.set(flow)
+            await asyncio.gather(*(rate_limiter.run(call, MAX_TOKENS) for _ in range(calls)))
+
+        try:
+            large_job = asyncio.create_task(job(large, 20))
+            await asyncio.sleep(0.05)
+            await asyncio.gather(large_job, job(small, 2))
+        finally:
+            await client.close()
+
+    asyncio.run(main())
+
+    # Both calls of the small job run within the next few dispatches, not after the large job's 20
+    last_small = max(index for index, flow in enumerate(order) if flow is small)
+    assert last_small < 10
+
+
+def test_sequential_mode_goes_through_the_limiter(fake_anthropic, monkeypatch):
+    from core.config import settings
+    from services import claude_service
+    from services.test_generator import generate_questions_for_parts
+
+    fake_anthropic.throttle_rate = 0.5
+    rate_limiter = limiter(max_retries=30)
+    monkeypatch.setattr(settings, "anthropic_base_url", fake_anthropic.base_url)
+    monkeypatch.setattr(claude_service, "async_client", None)
+    monkeypatch.setattr(claude_service, "claude_rate_limiter", rate_limiter)
+    part = "The river ran past the village at dawn. The captain read the letter by the window and kept silent."
+
+    async def main():
+        try:
+            return await generate_questions_for_parts([part] * 20)
+        finally:
+            await claude_service.close_clients()
+
+    questions = asyncio.run(main())
+
+    assert len(questions) == 20
+    assert fake_anthropic.throttled > 0
+    assert rate_limiter.throttled_count == fake_anthropic.throttled
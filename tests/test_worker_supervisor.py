@@ -0,0 +1,43 @@
+import pytest
+
+from core.config import settings
+from services.worker_supervisor import _split_budgets, adopt_bulk_jobs, bulk_job_dir, worker_count, worker_environment
+
+
+@pytest.mark.parametrize("requested", [1, 3, 8, 64])
+def test_workers_stay_within_the_totals(monkeypatch, requested):
+    monkeypatch.setattr(settings, "worker_processes", requested)
+    monkeypatch.setattr(settings, "llm_max_concurrency", 8)
+    monkeypatch.setattr(settings, "llm_requests_per_minute", 50)
+
+    workers = worker_count()
+    environments = [worker_environment(index, workers) for index in range(workers)]
+
+    assert workers == min(requested, 8)
+    for name, total in _split_budgets().items():
+        shares = [int(environment[name]) for environment in environments]
+        assert min(shares) >= 1
+        assert sum(shares) <= total
+
+
+def test_unlimited_prefetch_is_not_split(monkeypatch):
+    monkeypatch.setattr(settings, "worker_processes", 4)
+    monkeypatch.setattr(settings, "rabbitmq_prefetch_count", 0)
+
+    assert worker_count() == 4
+    assert worker_environment(0, 4)["RABBITMQ_PREFETCH_COUNT"] == "0"
+
+
+def test_worker_zero_adopts_records_of_removed_workers(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "bulk_job_dir", str(tmp_path))
+    for index in (0, 1, 3, 5):
+        (tmp_path / f"worker-{index}").mkdir()
+        (tmp_path / f"worker-{index}" / f"batch-{index}.json").write_text("{}")
+    (tmp_path / "batch-single.json").write_text("{}")
+
+    adopt_bulk_jobs(2)
+
+    assert sorted(p.name for p in (tmp_path / "worker-0").iterdir()) == [
+        "batch-0.json", "batch-3.json", "batch-5.json", "batch-single.json"]
+    assert [p.name for p in (tmp_path / "worker-1").iterdir()] == ["batch-1.json"]
+    assert worker_environment(1, 2)["BULK_JOB_DIR"] == bulk_job_dir(1) == str(tmp_path / "worker-1")
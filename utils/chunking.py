@@ -0,0 +1,122 @@
+import re
+from typing import List, NamedTuple
+
+# A sentence ends at terminal punctuation (optionally followed by closing quotes/brackets) and whitespace;
+# a paragraph ends at a blank line, which is also how pages are joined in get_book_text
+BOUNDARY = re.compile(r'(\n[ \t]*\n\s*)|(?<=[.!?…])["\'»”’)\]]*\s+')
+WORD = re.compile(r'\S+\s*')
+
+PARAGRAPH_SNAP = 0.15  # how far, as a share of the average part, a cut may move to land on a paragraph end
+
+
+class Segment(NamedTuple):
+    start: int
+    end: int
+    tokens: float
+    paragraph_end: bool
+
+
+def estimate_tokens(text: str) -> float:
+    """Rough token count: ~4 characters per token for ASCII, ~2.5 for other scripts (e.g. Cyrillic)."""
+    non_ascii = len(text.encode("utf-8")) - len(text)
+    return (len(text) - non_ascii) / 4 + non_ascii / 2.5
+
+
+def _segments(text: str, pattern: re.Pattern, start: int = 0, end: int = None) -> List[Segment]:
+    end = len(text) if end is None else end
+    segments = []
+    position = start
+    for match in pattern.finditer(text, start, end):
+        if match.end() <= position:
+            continue
+        if text[position:match.end()].strip():
+            is_paragraph = match.group(1) is not None
+            segments.append(Segment(position, match.end(), estimate_tokens(text[position:match.end()]), is_paragraph))
+        position = match.end()
+    if position < end and text[position:end].strip():
+        segments.append(Segment(position, end, estimate_tokens(text[position:end]), True))
+    return segments
+
+
+def _word_segments(text: str, segments: List[Segment]) -> List[Segment]:
+    words = []
+    for segment in segments:
+        pieces = [
+            Segment(match.start(), match.end(), estimate_tokens(match.group()), False)
+            for match in WORD.finditer(text, segment.start, segment.end)
+        ]
+        if pieces:
+            pieces[-1] = pieces[-1]._replace(end=segment.end, paragraph_end=segment.paragraph_end)
+        words.extend(pieces)
+    return words
+
+
+def _choose_cuts(segments: List[Segment], num_parts: int) -> List[int]:
+    """Indices into `segments` where parts start, picked in one forward pass over the prefix sums."""
+    prefix = [0.0]
+    for segment in segments:
+        prefix.append(prefix[-1] + segment.tokens)
+    total = prefix[-1]
+    snap = total / num_parts * PARAGRAPH_SNAP
+
+    cuts = [0]
+    i = 1
+    for k in range(1, num_parts):
+        target = total * k / num_parts
+        lowest = cuts[-1] + 1
+        highest = len(segments) - (num_parts - k)
+
+        i = max(i, lowest)
+        while i < highest and prefix[i] < target:
+            i += 1
+        cut = i if i == lowest or prefix[i] - target <= target - prefix[i - 1] else i - 1
+
+        # Move the cut onto a nearby paragraph end when there is one
+        best = None
+        j = cut
+        while j > lowest and target - prefix[j] <= snap:
+            if segments[j - 1].paragraph_end:
+                best = j
+                break
+            j -= 1
+        j = cut + 1
+        while j <= highest and prefix[j] - target <= snap:
+            if segments[j - 1].paragraph_end:
+                if best is None or prefix[j] - target < target - prefix[best]:
+                    best = j
+                break
+            j += 1
+        if segments[cut - 1].paragraph_end or best is None:
+            best = cut
+
+        cuts.append(min(max(best, lowest), highest))
+        i = cuts[-1]
+    return cuts
+
+
+def split_text_balanced(text: str, num_parts: int) -> List[str]:
+    """
+    Split `text` into exactly `num_parts` consecutive parts of about the same estimated token count.
+
+    Parts end on sentence boundaries, preferably paragraph ones; when the text has fewer sentences
+    than parts, words are used instead. Text too short to give every part its own words is reused
+    from the start, so the number of parts is always `num_parts`. Runs in linear time.
+    """
+    if num_parts <= 0:
+        return []
+
+    text = text.strip()
+    segments = _segments(text, BOUNDARY)
+    if len(segments) < num_parts:
+        segments = _word_segments(text, segments)
+    if not segments:
+        return [text] * num_parts
+    if len(segments) < num_parts:
+        parts = [text[segment.start:segment.end].strip() for segment in segments]
+        return [parts[i % len(parts)] for i in range(num_parts)]
+
+    cuts = _choose_cuts(segments, num_parts) + [len(segments)]
+    return [
+        text[segments[cuts[k]].start:segments[cuts[k + 1] - 1].end].strip()
+        for k in range(num_parts)
+    ]
@@ -65,3 +65,144 @@ Remember, the "quote" field should contain the specific part of the text from wh
 
 def get_prompt(text_part: str):
     return PROMPT.format(text_part, TOPICS, FORMAT)
+
+
+# Prompt split for prompt caching: the static instructions go first (system), the per-call text last,
+# so every call of a job, and every job, shares the same cacheable prefix.
+SYSTEM_PROMPT = '''You are an experienced educational content creator specializing in reading comprehension exercises for children. Your task is to create a single, clear, and specific multiple-choice question based on the book excerpt given by the user.
+
+Review this list of topics that may be relevant to the question you'll create:
+
+<topics_list>
+{}
+</topics_list>
+
+Your goal is to create ONE question for children who have read the excerpt. Follow these guidelines:
+
+1. The question must be closely related to the content of the text.
+2. Generate 4 answer choices, with only 1 correct answer.
+3. Use language and style similar to the text itself.
+4. Avoid creating tricky or intentionally misleading questions or answers.
+5. The question must be in the same language as the book excerpt.
+6. Ensure the question is clear and specific, explicitly mentioning any relevant context from the excerpt.
+
+Before creating your final question, wrap your reasoning process in <question_development> tags. Follow these steps:
+
+1. Identify 2-3 key quotes from the excerpt that could be potential question sources. Write these quotes down verbatim.
+2. List 3-4 relevant topics from the provided topic list that relate to these quotes.
+3. For each potential question:
+   - Formulate a clear and concise question, ensuring it includes specific context.
+   - Write the correct answer and three plausible but incorrect answers.
+   - Evaluate the question based on clarity, relevance, and difficulty level.
+   - Consider the age-appropriateness of the question for children.
+   - Assess how well the question aligns with the provided topics.
+4. Choose the best question based on your evaluation.
+5. Select the relevant quote that corresponds to your chosen question.
+6. Explain why the chosen question is the best option, considering all factors evaluated.
+
+After your question development process, provide the final output as a JSON object in <json_format> wrapper. Here's the required format:
+
+<json_format>
+{}
+</json_format>
+
+Remember, the "quote" field should contain the specific part of the text from which you derived the question.'''
+
+EXCERPT_PROMPT = '''Carefully read the following book excerpt:
+
+<book_excerpt>
+{}
+</book_excerpt>'''
+
+DOCUMENT_PROMPT = '''Here is the book excerpt, split into numbered parts:
+
+<book_excerpt>
+{}
+</book_excerpt>'''
+
+PART_PROMPT = '''Create the question using only part {} of the book excerpt.'''
+
+BATCH_SYSTEM_PROMPT = '''You are an experienced educational content creator specializing in reading comprehension exercises for children. Your task is to create one clear and specific multiple-choice question for each numbered part of the book excerpt given by the user.
+
+Review this list of topics that may be relevant to the questions you'll create:
+
+<topics_list>
+{}
+</topics_list>
+
+Your goal is to create ONE question per part for children who have read the excerpt. Follow these guidelines:
+
+1. Each question must be closely related to the content of its own part only.
+2. Generate 4 answer choices per question, with only 1 correct answer.
+3. Use language and style similar to the text itself.
+4. Avoid creating tricky or intentionally misleading questions or answers.
+5. The questions must be in the same language as the book excerpt.
+6. Ensure every question is clear and specific, explicitly mentioning any relevant context from its part.
+7. Avoid asking the same thing twice across parts.
+
+Before creating your final questions, wrap your reasoning process in <question_development> tags. Keep it brief: for each part, write down 1-2 key quotes verbatim, the relevant topics, and the best question you can build from them.
+
+After your question development process, provide the final output as a JSON array in <json_format> wrapper, with one object per part, in the order of the parts. Every object has the following format, plus an integer "part" field holding the number of the part the question is based on:
+
+<json_format>
+[
+{}
+]
+</json_format>
+
+Remember, the "quote" field should contain the specific part of the text from which you derived the question.'''
+
+BATCH_PROMPT = '''Create one question for each of the {} parts of the following book excerpt:
+
+<book_excerpt>
+{}
+</book_excerpt>'''
+
+RETRY_PROMPT = '''Your previous answer was rejected: {}
+
+Answer again. Make sure every question in the final JSON matches the required format, has exactly 4 answers with exactly 1 correct one, and that its "quote" is copied verbatim from the excerpt.'''
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+
+def _text_block(text: str, cache: bool = False):
+    block = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = CACHE_CONTROL
+    return block
+
+
+def get_system_blocks(cache: bool = True):
+    return [_text_block(SYSTEM_PROMPT.format(TOPICS, FORMAT), cache)]
+
+
+def get_batch_system_blocks(cache: bool = True):
+    return [_text_block(BATCH_SYSTEM_PROMPT.format(TOPICS, FORMAT), cache)]
+
+
+def _format_parts(indexed_parts):
+    return "\n".join(f'<part index="{index}">\n{part}\n</part>' for index, part in indexed_parts)
+
+
+def get_excerpt_content(text_part: str):
+    return [_text_block(EXCERPT_PROMPT.format(text_part))]
+
+
+def get_batch_content(indexed_parts: list):
+    """`indexed_parts` is a list of (part number, text) pairs; numbers are echoed back in the "part" field."""
+    return [_text_block(BATCH_PROMPT.format(len(indexed_parts), _format_parts(indexed_parts)))]
+
+
+def get_document_block(text_parts: list):
+    """The whole page range, cached once per job; each call then only adds a part reference."""
+    document = _format_parts(enumerate(text_parts, start=1))
+    return _text_block(DOCUMENT_PROMPT.format(document), cache=True)
+
+
+def get_document_part_content(document_block: dict, index: int):
+    return [document_block, _text_block(PART_PROMPT.format(index))]
+
+
+def with_retry_feedback(content: list, error: str):
+    """Content of a regeneration call: the original request plus why the previous answer was rejected."""
+    return content + [_text_block(RETRY_PROMPT.format(error))]
@@ -1,48 +1,41 @@
+import asyncio
 import json
-import math
 import re
+from datetime import datetime, timezone
+from typing import Any, Optional
 
-import PyPDF2
+from .chunking import split_text_balanced
 
 
 def remove_extra_newlines(text):
     return re.sub(r'\n+', '\n', text)
 
 def read_pdf(file_path: str):
+    import PyPDF2
+
     try:
         with open(file_path, 'rb') as file:
             reader = PyPDF2.PdfReader(file)
-            text = ""
-            for page_num in range(len(reader.pages)):
-                page = reader.pages[page_num]
-                text += page.extract_text()
-            return text
+            return "".join(page.extract_text() for page in reader.pages)
     except Exception as e:
         print(f"An error occurred: {e}")
         return None
 
 
 def split_text_into_parts(text: str, num_parts: int):
-    paragraphs = re.split('\n', text.strip())
-
-    paragraphs_per_part = math.ceil(len(paragraphs) / (num_parts))
-
-    parts = []
-    current_part = ""
-
-    for i, paragraph in enumerate(paragraphs):
-        current_part += paragraph + "\n"
-        if (i + 1) % paragraphs_per_part == 0 or (i + 1) == len(paragraphs):
-            parts.append(current_part.strip())
-            current_part = ""
-
-    return parts
+    return split_text_balanced(text, num_parts)
 
 def get_json_from_response(text):
-    json_match = re.search(r"<json_format>(.*?)</json_format>", text, re.DOTALL)
-    if json_match:
-        json_str = json_match.group(1).strip()
+    # The answer ends with the JSON, so a single search for the first closing tag finds it; reasoning
+    # before it is not scanned again
+    end = text.find("</json_format>")
+    if end != -1:
+        start = text.rfind("<json_format>", 0, end)
+        json_str = text[start + len("<json_format>"):end].strip() if start != -1 else ""
     else:
+        json_str = ""
+
+    if not json_str:
         markdown_match = re.search(r"```json(.*?)```", text, re.DOTALL)
         if markdown_match:
             json_str = markdown_match.group(1).strip()
@@ -52,4 +45,37 @@ def get_json_from_response(text):
     try:
         return json.loads(json_str)
     except json.JSONDecodeError as e:
-        raise ValueError(f"Ошибка декодирования JSON: {e}")
\ No newline at end of file
+        raise ValueError(f"Ошибка декодирования JSON: {e}")
+
+def parse_deadline(value: Any) -> Optional[float]:
+    """
+    Deadline as Unix time in seconds, from Unix seconds or milliseconds (number or numeric string)
+    or an ISO 8601 timestamp (UTC unless it has an offset). None when missing or unparsable.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, bytes):
+        value = value.decode()
+    try:
+        timestamp = float(value)
+    except (TypeError, ValueError):
+        try:
+            parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+        except ValueError:
+            return None
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+    # Milliseconds, as sent by JavaScript's Date.now()
+    return timestamp / 1000 if timestamp > 1e11 else timestamp
+
+async def gather_or_cancel(*aws):
+    """Like asyncio.gather, but the first failure cancels the remaining awaitables instead of orphaning them."""
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
@@ -0,0 +1,87 @@
+import asyncio
+import contextlib
+import logging
+import multiprocessing
+import os
+import signal
+
+logger = logging.getLogger(__name__)
+
+
+async def report_stats(index: int, stats_queue, stopping: asyncio.Event) -> None:
+    from core.config import settings
+    from core.metrics import registry
+    from services.rabbitmq_consumer import rabbitmq_consumer
+    from services.rate_limiter import claude_rate_limiter
+
+    parent = multiprocessing.parent_process()
+    while not stopping.is_set():
+        stats_queue.put({
+            "index": index,
+            "pid": os.getpid(),
+            "in_flight": rabbitmq_consumer.in_flight,
+            "llm": claude_rate_limiter.stats(),
+            "metrics": registry.snapshot(),
+        })
+        if parent is not None and not parent.is_alive():
+            logger.error("Supervisor exited, stopping worker")
+            stopping.set()
+            return
+        await asyncio.sleep(settings.worker_stats_interval)
+
+
+def http_server(app, port: int):
+    """The worker's uvicorn server for the routes the supervisor forwards; its services run without the lifespan."""
+    import uvicorn
+
+    from core.config import settings
+
+    class WorkerServer(uvicorn.Server):
+        def capture_signals(self):
+            # SIGTERM drains the whole worker, see serve()
+            return contextlib.nullcontext()
+
+    return WorkerServer(uvicorn.Config(
+        app,
+        host="127.0.0.1",
+        port=port,
+        lifespan="off",
+        timeout_graceful_shutdown=settings.consumer_drain_timeout,
+    ))
+
+
+async def serve(index: int, stats_queue) -> None:
+    # Imported here and not at the top: supervisor.py imports this module, and only the worker
+    # processes should create the clients and consumers, with the settings of their environment
+    import main
+    from core.config import settings
+
+    loop = asyncio.get_running_loop()
+    stopping = asyncio.Event()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, stopping.set)
+
+    await main.start_services()
+    server = http_server(main.app, settings.worker_http_port) if settings.worker_http_port else None
+    http_task = asyncio.create_task(server.serve()) if server else None
+    if server:
+        while not server.started and not http_task.done():
+            await asyncio.sleep(0.05)
+    logger.info(f"Worker {index} consuming")
+    reporter = asyncio.create_task(report_stats(index, stats_queue, stopping))
+    try:
+        await stopping.wait()
+    finally:
+        reporter.cancel()
+        await asyncio.gather(reporter, return_exceptions=True)
+        if server:
+            # Requests in progress finish, or are cut off after the drain timeout, before the services stop
+            server.should_exit = True
+            await asyncio.gather(http_task, return_exceptions=True)
+        await main.stop_services()
+        logger.info(f"Worker {index} stopped")
+
+
+def run(index: int, stats_queue) -> None:
+    """Entry point of a worker process started by supervisor.py: consume until SIGTERM, then drain."""
+    asyncio.run(serve(index, stats_queue))